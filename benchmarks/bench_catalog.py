@@ -0,0 +1,132 @@
+"""Compares per-call upgrade filtering with the UpgradeCatalog built once per cycle.
+
+A cycle filters the same payload once for planning and once more after each of `--replans`
+purchases. The baseline below is the per-call filter FarmBot used before UpgradeCatalog, kept
+here for comparison. The catalog's result cache is invalidated before every re-plan, as a
+purchase would, so each call really filters again.
+
+Run from the repository root: python -m benchmarks.bench_catalog
+"""
+import argparse
+import time
+import tracemalloc
+
+from benchmarks.synthetic import make_auth_data
+from bot.catalog import UpgradeCatalog
+
+
+def legacy_filter(upgrades, friends_count, shared_config, now, max_level=0, max_cost=0, min_profit=0):
+    """Per-call filter as FarmBot.filter_available_upgrades implemented it before the catalog."""
+    available_upgrades = []
+    current_time = now
+    upgrade_list = upgrades.get('list', [])
+
+    current_levels = {upgrade['id']: upgrade['level'] for upgrade in upgrade_list}
+    for upgrade_id, upgrade_data in upgrades.get('user', {}).items():
+        if 'level' in upgrade_data:
+            current_levels[upgrade_id] = upgrade_data['level']
+
+    day_limitation_delay = shared_config.get('dayLimitationUpgradeDelay', 3600)
+    upgrade_delays = shared_config.get('upgradeDelay', {})
+
+    for upgrade in upgrade_list:
+        if 'upgradedAt' in upgrade:
+            cooldown_period = day_limitation_delay
+            if not ('dayLimitation' in upgrade and upgrade['dayLimitation'] > 0):
+                upgrade_level = str(upgrade.get('level', 1))
+                if upgrade_level in upgrade_delays:
+                    cooldown_period = upgrade_delays[upgrade_level]
+                elif upgrade['id'] == 'restoreEnergy':
+                    cooldown_period = 3600
+            if current_time - upgrade['upgradedAt'] < cooldown_period:
+                continue
+
+        if 'maxLevel' in upgrade or ('levelsCount' in upgrade and upgrade['level'] >= upgrade['levelsCount']):
+            continue
+
+        if 'condition' in upgrade:
+            condition = upgrade['condition']
+            if condition['kind'] == 'friends' and friends_count < condition['friends']:
+                continue
+            elif condition['kind'] == 'upgrade':
+                required_upgrade_id = condition['upgradeId']
+                if required_upgrade_id in current_levels and current_levels[required_upgrade_id] < condition['level']:
+                    continue
+
+        if max_level > 0 and upgrade['level'] >= max_level:
+            continue
+        if 'next' not in upgrade:
+            continue
+
+        next_price = upgrade['next'].get('price', float('inf'))
+        next_increment = upgrade['next'].get('increment', 0)
+        if max_cost > 0 and next_price > max_cost:
+            continue
+        if min_profit > 0 and next_increment < min_profit:
+            continue
+
+        available_upgrades.append({
+            'id': upgrade['id'],
+            'upgrade': upgrade,
+            'price': next_price,
+            'income_increase': next_increment,
+            'efficiency': next_increment / next_price if next_price > 0 else 0,
+            'roi_hours': next_price / next_increment if next_increment > 0 else float('inf')
+        })
+    return available_upgrades
+
+
+def legacy_cycle(auth_data, friends_count, now, replans):
+    result = legacy_filter(auth_data['upgrades'], friends_count, auth_data['sharedConfig'], now)
+    for _ in range(replans):
+        result = legacy_filter(auth_data['upgrades'], friends_count, auth_data['sharedConfig'], now)
+    return result
+
+
+def catalog_cycle(auth_data, friends_count, now, replans):
+    catalog = UpgradeCatalog(auth_data['upgrades'], auth_data['sharedConfig'])
+    result = catalog.available(friends_count, now)
+    for _ in range(replans):
+        catalog.version += 1
+        result = catalog.available(friends_count, now)
+    return result
+
+
+def measure(func, args, repeat):
+    """Returns (result, best seconds, peak traced bytes) for one cycle."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--replans", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'upgrades':>8} | {'engine':>8} | {'ms/cycle':>9} | {'peak KiB':>9}")
+    for size in args.sizes:
+        auth_data = make_auth_data(size, seed=size)
+        friends_count = auth_data['friends']['friendsCountWithYandexID']
+        cycle_args = (auth_data, friends_count, int(time.time()), args.replans)
+        results = {}
+        for name, func in (("per-call", legacy_cycle), ("catalog", catalog_cycle)):
+            result, seconds, peak = measure(func, cycle_args, args.repeat)
+            results[name] = [(u['id'], u['price'], u['income_increase'], u['efficiency']) for u in result]
+            print(f"{size:>8} | {name:>8} | {seconds * 1000:>9.2f} | {peak / 1024:>9.1f}")
+        assert results["per-call"] == results["catalog"], "catalog and per-call filter disagree"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Compares the old three-pass decoding of auth/start with the single-parse decode layer.
+
+The baseline is what FarmBot.sync did before bot.game_state: the body read as text, parsed by
+is_json only to check it, then parsed again by response.json(), with every field read through
+the full dict on each access. The decode layer parses the bytes once (orjson when installed),
+drops the unused sections and builds the typed GameState. Payloads carry a full upgrade list
+plus leaderboard, tournaments and shop sections sized like real responses.
+
+Run from the repository root: python -m benchmarks.bench_decode --upgrades 200 1000
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+from benchmarks.synthetic import make_auth_data, make_auth_extras
+from bot.game_state import JSON_BACKEND, GameState, decode_body, slim_auth
+
+
+def legacy_decode(raw: bytes) -> dict:
+    """Decoding and field extraction as FarmBot did before the decode layer."""
+    text = raw.decode("utf-8")
+    json.loads(text)
+    data = json.loads(text)
+    for key in ("totalCoins", "currentCoins", "currentEnergy", "maxEnergy", "currentTickets", "minePerHour",
+                "coinsPerTap", "energyPerSec"):
+        int(data["game"][key])
+    return data
+
+
+def single_decode(raw: bytes) -> GameState:
+    """Decoding through bot.game_state."""
+    return GameState(slim_auth(decode_body(raw)))
+
+
+def measure(decode, raw: bytes, repeat: int) -> tuple:
+    """Returns (best milliseconds per decode, bytes kept by the result)."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        decode(raw)
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    result = decode(raw)
+    kept = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return best * 1000, kept
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--upgrades", type=int, nargs="+", default=[200, 1000])
+    parser.add_argument("--leaderboard", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"JSON backend: {JSON_BACKEND}")
+    print(f"{'upgrades':>8} | {'body KiB':>8} | {'variant':<8} | {'ms/decode':>9} | {'kept KiB':>8}")
+    for n_upgrades in args.upgrades:
+        payload = dict(make_auth_data(n_upgrades), **make_auth_extras(n_leaderboard=args.leaderboard))
+        raw = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        for label, decode in (("legacy", legacy_decode), ("single", single_decode)):
+            ms, kept = measure(decode, raw, args.repeat)
+            print(f"{n_upgrades:>8} | {len(raw) / 1024:>8.0f} | {label:<8} | {ms:>9.2f} | {kept / 1024:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Compares the streaming Klyuk extractor with decoding and searching the whole bundle.
+
+Run from the repository root: python -m benchmarks.bench_klyuk_extract
+"""
+import argparse
+import asyncio
+import random
+import re
+import time
+import tracemalloc
+
+from bot.klyuk_extract import DEFAULT_CHUNK_SIZE, KLYUK_PATTERN, search_stream
+
+# Pattern used by the original fetch_klyuk_code on the decoded response text
+LEGACY_PATTERN = r'\.set\("Klyuk",\s*"([01]+)"\)'
+
+
+def make_bundle(size: int, position: float, seed: int = 7) -> tuple:
+    """Builds a synthetic minified bundle of `size` bytes with the Klyuk call at `position` (0..1)."""
+    rnd = random.Random(seed)
+    code = "".join(rnd.choice("01") for _ in range(64))
+    needle = f'e.headers.set("Klyuk", "{code}");'.encode()
+    alphabet = b"abcdefghijklmnopqrstuvwxyz0123456789(){}[];,.=+-*/\"' "
+    filler = bytes(rnd.choice(alphabet) for _ in range(4096))
+    body = (filler * (size // len(filler) + 1))[:size - len(needle)]
+    offset = int(len(body) * position)
+    return body[:offset] + needle + body[offset:], code
+
+
+class ChunkedBody:
+    """In-memory body served in chunks, like aiohttp's StreamReader.iter_chunked."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+    async def iter_chunked(self, n: int):
+        view = memoryview(self.data)
+        for i in range(0, len(view), n):
+            yield bytes(view[i:i + n])
+
+
+async def legacy_extract(body: ChunkedBody) -> str:
+    # Equivalent of response.text() followed by re.search over the full string
+    chunks = [chunk async for chunk in body.iter_chunked(DEFAULT_CHUNK_SIZE)]
+    text = b"".join(chunks).decode("utf-8")
+    return re.search(LEGACY_PATTERN, text).group(1)
+
+
+async def streaming_extract(body: ChunkedBody) -> str:
+    return await search_stream(body.iter_chunked(DEFAULT_CHUNK_SIZE), KLYUK_PATTERN)
+
+
+def measure(func, body: ChunkedBody, repeat: int) -> tuple:
+    """Returns (result, best seconds, peak traced bytes) for one extractor."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = asyncio.run(func(body))
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    asyncio.run(func(body))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=float, default=5.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    size = int(args.size_mb * 1024 * 1024)
+    print(f"Synthetic bundle: {size} bytes, chunk size {DEFAULT_CHUNK_SIZE}")
+    print(f"{'position':>9} | {'extractor':>9} | {'time ms':>9} | {'peak KiB':>10}")
+    for position in (0.1, 0.5, 0.95):
+        data, code = make_bundle(size, position)
+        body = ChunkedBody(data)
+        for name, func in (("legacy", legacy_extract), ("streaming", streaming_extract)):
+            result, seconds, peak = measure(func, body, args.repeat)
+            assert result == code, f"{name} extractor returned a wrong code"
+            print(f"{position:>9.2f} | {name:>9} | {seconds * 1000:>9.2f} | {peak / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
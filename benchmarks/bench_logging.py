@@ -0,0 +1,94 @@
+"""Measures the CPU cost of logging 1,000 account cycles: per-line print() versus bot.log.
+
+The baseline is the print() pattern FarmBot used before bot.log: each line calls time.strftime
+and builds its colorama string eagerly. The facade runs through setup_logging's sinks with the
+console at the STEP level, at the default INFO level, and with the file sink added. Output goes
+to os.devnull; the CPU time includes the console and file writer threads.
+
+Run from the repository root: python -m benchmarks.bench_logging
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from colorama import Fore, Style
+from loguru import logger
+
+from bot.log import SessionLog, close_logging, setup_logging
+
+
+def legacy_cycle(name: str, steps: int, results: int, stream):
+    """One cycle's worth of lines as FarmBot printed them before bot.log."""
+    for i in range(steps):
+        print(f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.CYAN}[{name}]{Style.RESET_ALL} | "
+              f"Scenario greedy: Buying upgrade_{i} at {i * 0.5:.1f}h, NPV impact: -{i * 1234.5:.2f}", file=stream)
+    for i in range(results):
+        print(f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.GREEN}[{name}]{Style.RESET_ALL} | "
+              f"Balance: {Fore.GREEN}{i * 1000}{Style.RESET_ALL} (Mined +{Fore.GREEN}{i}{Style.RESET_ALL})", file=stream)
+
+
+def facade_cycle(log: SessionLog, steps: int, results: int):
+    """The same lines through the SessionLog facade."""
+    for i in range(steps):
+        log.step("Scenario {}: Buying {} at {:.1f}h, NPV impact: -{:.2f}", "greedy", f"upgrade_{i}", i * 0.5,
+                 i * 1234.5)
+    for i in range(results):
+        log.success("Balance: <green>{}</green> (Mined +<green>{}</green>)", i * 1000, i)
+
+
+def measure(run, cycles: int) -> float:
+    start = time.process_time()
+    run(cycles)
+    return time.process_time() - start
+
+
+def measure_facade(cycles: int, accounts: int, steps: int, results: int, level: str, log_dir: str = None) -> float:
+    logs = [SessionLog(f"session_{uid}") for uid in range(accounts)]
+    log_file = os.path.join(log_dir, "bench.log") if log_dir is not None else None
+    with open(os.devnull, "w") as devnull:
+        setup_logging(level, stream=devnull, log_file=log_file, log_level="INFO")
+
+        def run(n):
+            for cycle in range(n):
+                facade_cycle(logs[cycle % accounts], steps, results)
+            # Count the work the background threads still have queued
+            close_logging()
+            logger.complete()
+
+        try:
+            return measure(run, cycles)
+        finally:
+            logger.remove()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cycles", type=int, default=1000)
+    parser.add_argument("--accounts", type=int, default=100)
+    parser.add_argument("--steps", type=int, default=40, help="per-step lines per cycle")
+    parser.add_argument("--results", type=int, default=5, help="result lines per cycle")
+    args = parser.parse_args()
+
+    with open(os.devnull, "w") as devnull:
+        legacy = measure(lambda n: [legacy_cycle(f"session_{cycle % args.accounts}", args.steps, args.results, devnull)
+                                    for cycle in range(n)], args.cycles)
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        rows = [
+            ("print()", legacy),
+            ("facade, STEP", measure_facade(args.cycles, args.accounts, args.steps, args.results, "STEP")),
+            ("facade, INFO", measure_facade(args.cycles, args.accounts, args.steps, args.results, "INFO")),
+            ("facade, INFO + file", measure_facade(args.cycles, args.accounts, args.steps, args.results, "INFO",
+                                                    log_dir)),
+        ]
+
+    scale = 1000 / args.cycles
+    print(f"{args.steps + args.results} lines per cycle, {args.accounts} accounts")
+    print(f"{'mode':>20} | {'CPU s / 1k cycles':>17} | vs print()")
+    for label, seconds in rows:
+        print(f"{label:>20} | {seconds * scale:>17.3f} | {legacy / seconds:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Compares the scalar per-purchase NPV simulation with the batch NumPy engine.
+
+The baseline is the simulation FarmBot ran for each scenario before bot.npv, without its
+per-purchase log lines.
+
+Run from the repository root: python -m benchmarks.bench_npv
+"""
+import argparse
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+
+import numpy as np
+from loguru import logger
+
+from benchmarks.synthetic import make_auth_data
+from bot.core import FarmBot
+from bot.npv import DISCOUNT_RATE, SIMULATION_HOURS, TIME_STEP_MINUTES, batch_scenario_npv, pack_scenarios
+
+
+async def build_scenarios(bot: FarmBot, auth_data: dict, n_scenarios: int, seed: int) -> list:
+    """Returns the four planner scenarios plus shuffled variants up to `n_scenarios`."""
+    game = auth_data["game"]
+    available = await bot.filter_available_upgrades(auth_data["upgrades"],
+                                                    auth_data["friends"]["friendsCountWithYandexID"],
+                                                    auth_data["sharedConfig"])
+    scenarios = await bot.generate_upgrade_scenarios(available, game["currentCoins"], game["minePerHour"])
+    rnd = random.Random(seed)
+    while len(scenarios) < n_scenarios:
+        sequence = list(rnd.choice(scenarios[:4])["sequence"])
+        rnd.shuffle(sequence)
+        scenarios.append({"type": f"shuffled_{len(scenarios)}", "sequence": sequence})
+    return scenarios
+
+
+def scenario_npv(scenario: dict, initial_balance: float, initial_income: float, min_save_balance: float = 0,
+                 simulation_hours: int = SIMULATION_HOURS, time_step_minutes: int = TIME_STEP_MINUTES,
+                 discount_rate: float = DISCOUNT_RATE) -> float:
+    """NPV of one scenario, simulated step by step as FarmBot.calculate_scenario_npv did."""
+    sequence = scenario['sequence']
+    balance = initial_balance
+    income_per_hour = initial_income
+    total_npv = 0
+    upgrade_index = 0
+
+    time_step_hours = time_step_minutes / 60
+    for step in range(int(simulation_hours / time_step_hours)):
+        step_time = step * time_step_hours
+
+        income_this_step = income_per_hour * time_step_hours
+        balance += income_this_step
+        total_npv += income_this_step / (1 + discount_rate * step_time)
+
+        while upgrade_index < len(sequence):
+            upgrade = sequence[upgrade_index]['upgrade']
+            if balance < upgrade['price'] + min_save_balance:
+                break
+            balance -= upgrade['price']
+            income_per_hour += upgrade['income_increase']
+            total_npv -= upgrade['price'] / (1 + discount_rate * step_time)
+            upgrade_index += 1
+    return total_npv
+
+
+def scalar_npv(scenarios: list, balances, incomes, min_save_balance: float) -> np.ndarray:
+    result = np.zeros((len(scenarios), len(balances)))
+    for i, scenario in enumerate(scenarios):
+        for k, (balance, income) in enumerate(zip(balances, incomes)):
+            result[i, k] = scenario_npv(scenario, balance, income, min_save_balance)
+    return result
+
+
+def check_large_prices(n_scenarios: int = 256, length: int = 200, starts: int = 16, seed: int = 7) -> float:
+    """Asserts that the batch engine matches the scalar simulation with prices around 1e12.
+
+    Starting balances sit half a coin above or below a purchase boundary of a random scenario,
+    so any precision lost in the batch search shows up as a different purchase. Returns the
+    largest relative difference.
+    """
+    rnd = np.random.default_rng(seed)
+    prices = rnd.integers(10 ** 11, 10 ** 13, (n_scenarios, length)).astype(float)
+    increments = prices * rnd.uniform(1e-4, 1e-3, (n_scenarios, length))
+    scenarios = [{"type": f"large_{i}",
+                  "sequence": [{"upgrade": {"price": price, "income_increase": increment}}
+                               for price, increment in zip(prices[i], increments[i])]}
+                 for i in range(n_scenarios)]
+    incomes = rnd.uniform(1e9, 1e10, starts)
+    boundaries = [np.cumsum(prices[rnd.integers(n_scenarios)])[rnd.integers(length)] for _ in range(starts)]
+    # The first step adds half an hour of income before buying
+    balances = np.array(boundaries) - incomes * TIME_STEP_MINUTES / 60 + rnd.choice([-0.5, 0.5], starts)
+
+    expected = scalar_npv(scenarios, balances, incomes, 0)
+    packed_prices, packed_increments = pack_scenarios(scenarios)
+    actual = batch_scenario_npv(packed_prices, packed_increments, balances, incomes, 0)
+    assert np.allclose(actual, expected, rtol=1e-9), "batch NPV does not match scalar NPV with large prices"
+    return float((np.abs(actual - expected) / np.abs(expected).clip(1)).max())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 300, 1000])
+    parser.add_argument("--scenarios", type=int, default=32)
+    parser.add_argument("--starts", type=int, default=16)
+    args = parser.parse_args()
+
+    # Scenario generation logs through the session facade; time it with output discarded
+    logger.remove()
+    bot = FarmBot(SimpleNamespace(name="bench"), "android")
+    rnd = np.random.default_rng(3)
+    print(f"{'upgrades':>8} | {'S x K':>7} | {'scalar ms':>10} | {'batch ms':>9} | {'speedup':>7} | max |diff|")
+    for size in args.sizes:
+        auth_data = make_auth_data(size, seed=size)
+        scenarios = asyncio.run(build_scenarios(bot, auth_data, args.scenarios, seed=size))
+        balances = rnd.uniform(1e4, 5e6, args.starts)
+        incomes = rnd.uniform(1e3, 2e5, args.starts)
+
+        start = time.perf_counter()
+        expected = scalar_npv(scenarios, balances, incomes, bot.settings.min_save_balance)
+        scalar_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        prices, increments = pack_scenarios(scenarios)
+        actual = batch_scenario_npv(prices, increments, balances, incomes, bot.settings.min_save_balance)
+        batch_seconds = time.perf_counter() - start
+
+        assert np.allclose(actual, expected, rtol=1e-9, atol=1e-6), "batch NPV does not match scalar NPV"
+        print(f"{size:>8} | {len(scenarios):>3}x{len(balances):<3} | {scalar_seconds * 1000:>10.1f} | "
+              f"{batch_seconds * 1000:>9.1f} | {scalar_seconds / batch_seconds:>6.1f}x | "
+              f"{np.abs(actual - expected).max():.2e}")
+    print(f"large prices, 256 scenarios: max relative |diff| {check_large_prices():.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Benchmark suite for the upgrade planning path.
+
+Times and measures peak memory of each planner stage on seeded synthetic catalogs, and saves the
+results as JSON so runs from different commits can be compared.
+
+Run from the repository root:
+    python -m benchmarks.bench_planner --output bench/planner.json
+    python -m benchmarks.bench_planner --compare bench/planner.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+from loguru import logger
+
+from benchmarks.synthetic import make_auth_data
+from bot.core import FarmBot
+
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def make_stages(bot: FarmBot, auth_data: dict) -> dict:
+    """Returns the planner stages as coroutine factories over one payload."""
+    upgrades = auth_data["upgrades"]
+    shared_config = auth_data["sharedConfig"]
+    friends_count = auth_data["friends"]["friendsCountWithYandexID"]
+    balance = auth_data["game"]["currentCoins"]
+    income = auth_data["game"]["minePerHour"]
+
+    async def generate_upgrade_scenarios():
+        available = await bot.filter_available_upgrades(upgrades, friends_count, shared_config)
+        return await bot.generate_upgrade_scenarios(available, balance, income)
+
+    return {
+        "sort_upgrades": lambda: bot.sort_upgrades(upgrades, friends_count, shared_config, balance, income),
+        "calculate_optimal_upgrade_sequence": lambda: bot.calculate_optimal_upgrade_sequence(
+            upgrades, friends_count, shared_config, balance, income),
+        "generate_upgrade_scenarios": generate_upgrade_scenarios,
+        "sort_upgrades_legacy": lambda: bot.sort_upgrades_legacy(upgrades, friends_count, shared_config, balance),
+    }
+
+
+def run_stage(bot: FarmBot, factory, repeat: int) -> dict:
+    """Runs one stage from a cold catalog and returns its best time and peak memory."""
+    times = []
+    for _ in range(repeat):
+        bot.catalog = None
+        start = time.perf_counter()
+        asyncio.run(factory())
+        times.append(time.perf_counter() - start)
+
+    bot.catalog = None
+    tracemalloc.start()
+    asyncio.run(factory())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    times.sort()
+    return {"best_ms": times[0] * 1000, "median_ms": times[len(times) // 2] * 1000, "peak_kib": peak / 1024}
+
+
+def run_suite(sizes, repeat: int, seed: int) -> dict:
+    bot = FarmBot(SimpleNamespace(name="bench"), "android")
+    results = {}
+    # Planner stages log progress for every account; keep it out of the measurements
+    logger.remove()
+    for size in sizes:
+        auth_data = make_auth_data(size, seed=seed + size)
+        results[str(size)] = {name: run_stage(bot, factory, repeat)
+                              for name, factory in make_stages(bot, auth_data).items()}
+    return {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "seed": seed,
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def print_report(report: dict, baseline: dict = None):
+    print(f"revision {report['revision']}" + (f" vs {baseline['revision']}" if baseline else ""))
+    print(f"{'upgrades':>8} | {'stage':<34} | {'best ms':>9} | {'peak KiB':>9}" + (" | change" if baseline else ""))
+    for size, stages in report["results"].items():
+        for stage, result in stages.items():
+            line = f"{size:>8} | {stage:<34} | {result['best_ms']:>9.2f} | {result['peak_kib']:>9.1f}"
+            previous = (baseline or {}).get("results", {}).get(size, {}).get(stage)
+            if previous:
+                line += f" | {result['best_ms'] / previous['best_ms'] - 1:+.0%} time, " \
+                        f"{result['peak_kib'] / previous['peak_kib'] - 1:+.0%} memory"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    report = run_suite(args.sizes, args.repeat, args.seed)
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.output:
+        directory = os.path.dirname(args.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Measures the time from starting the launcher until every session is scheduled.
+
+"banner" is the startup before headless mode: the banner with its per-line sleeps, colorama, and
+one Pyrogram client created per session. "headless" skips the banner and creates the Pyrogram
+clients only when a session first needs Telegram. Each run is a fresh interpreter in a temporary
+directory with a copy of .conf, so imports are cold and the state store starts empty.
+
+Run from the repository root: python -m benchmarks.bench_startup --sessions 1 1000
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(sessions: int, banner: bool, workdir: str) -> tuple:
+    """Returns (wall seconds including interpreter start, seconds inside the child)."""
+    code = f"""
+import time
+started = time.perf_counter()
+from bot import launcher
+from bot.scheduler import WakeScheduler
+bots = [launcher.create_farm_bot(f"session_{{i}}") for i in range({sessions})]
+if {banner}:
+    launcher.display_banner()
+    for bot in bots:
+        bot.client.get()
+scheduler = WakeScheduler(lambda name: None)
+for bot in bots:
+    scheduler.add(bot.client.name)
+print(f"ready {{time.perf_counter() - started:.6f}}", flush=True)
+"""
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", code], cwd=workdir, env=env, capture_output=True, text=True,
+                            check=True).stdout
+    wall = time.perf_counter() - start
+    inside = float(output.strip().splitlines()[-1].split()[1])
+    return wall, inside
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 1000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        with open(os.path.join(ROOT, ".conf"), encoding="utf-8") as source:
+            conf = source.read()
+        # Pyrogram clients need credentials to be created; they never connect here
+        conf = conf.replace("api_id = \n", "api_id = 1\n").replace("api_hash = \n", "api_hash = 0\n")
+        with open(os.path.join(workdir, ".conf"), "w", encoding="utf-8") as target:
+            target.write(conf)
+        shutil.copy(os.path.join(ROOT, ".ver"), workdir)
+
+        print(f"{'sessions':>8} | {'mode':<8} | {'wall s':>7} | {'in process s':>12}")
+        for sessions in args.sessions:
+            for label, banner in (("banner", True), ("headless", False)):
+                runs = sorted(measure(sessions, banner, workdir) for _ in range(args.repeat))
+                wall, inside = runs[0]
+                print(f"{sessions:>8} | {label:<8} | {wall:>7.3f} | {inside:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""End-to-end load test of the farming request path against the local stand-in API.
+
+Each simulated account runs the network part of a farming cycle, without the human-like sleeps:
+headers with the Klyuk code, auth/start, a tap sync, planning and the upgrade purchases. The
+stand-in server runs in the same process unless --url points at one started separately.
+
+Run from the repository root:
+    python -m benchmarks.load_test --accounts 1000 --concurrency 200 --latency 0.05 --rate-limit 0.01
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from types import SimpleNamespace
+from urllib.parse import urlencode
+
+from loguru import logger
+
+from benchmarks.mock_api import MockApi, TOO_EARLY_MESSAGE, add_option_arguments, parse_options
+from bot import endpoints
+from bot.core import FarmBot
+from bot.http_client import close_http_pool, get_http_pool
+from bot.klyuk_cache import KlyukCache, set_klyuk_cache
+from bot.rate_limit import get_rate_limiter
+
+
+def make_query_id(uid: int) -> str:
+    """Telegram-style web app init data for a simulated account."""
+    return urlencode({
+        "query_id": f"AAH{uid:012d}",
+        "user": json.dumps({"id": uid, "first_name": f"bench{uid}"}),
+        "auth_date": int(time.time()),
+        "hash": f"{uid:064x}",
+    })
+
+
+async def run_account(bot: FarmBot, uid: int, cycles: int, max_upgrades: int, outcomes: Counter,
+                      latencies: list):
+    """Runs `cycles` farming cycles of one account and records their outcomes."""
+    for _ in range(cycles):
+        start = time.perf_counter()
+        async with get_http_pool().acquire(bot.auth.cookie_jar) as session:
+            bot.headers = await bot.gen_headers(bot.platform)
+            auth_data = await bot.login(make_query_id(uid), session)
+            if auth_data is None:
+                outcomes["login failed"] += 1
+                continue
+
+            game = auth_data["game"]
+            friends_count = auth_data["friends"].get("friendsCountWithYandexID", 0)
+            taps = game["currentEnergy"] // max(1, game["coinsPerTap"])
+            sync_data = await bot.sync_gdata(session, game["currentEnergy"] - taps * game["coinsPerTap"], taps)
+            outcomes["sync ok" if sync_data is not None else "sync failed"] += 1
+            balance = sync_data["currentCoins"] if sync_data is not None else game["currentCoins"]
+
+            upgrades = await bot.sort_upgrades(auth_data["upgrades"], friends_count,
+                                               auth_data.get("sharedConfig", {}), balance, game["minePerHour"])
+            for upgrade in upgrades[:max_upgrades]:
+                if upgrade["next"]["price"] > balance:
+                    continue
+                result = await bot.sync_upgrade(session, upgrade["id"])
+                if result is None:
+                    outcomes["upgrade failed"] += 1
+                elif isinstance(result, str) and TOO_EARLY_MESSAGE in result:
+                    outcomes["upgrade too early"] += 1
+                else:
+                    outcomes["upgrade ok"] += 1
+                    balance = result["currentCoins"]
+        latencies.append(time.perf_counter() - start)
+
+
+async def run_load(args) -> dict:
+    api = None
+    url = args.url
+    if url is None:
+        api = MockApi(parse_options(args))
+        url = await api.start()
+    endpoints.configure(url, f"{url}/")
+    # The stand-in server's bundle URL and code must not reach the bot's cache file
+    set_klyuk_cache(KlyukCache(cache_file=None))
+    get_rate_limiter().enabled = not args.no_rate_limit
+    # Bot progress lines for thousands of accounts would dominate the run
+    logger.remove()
+
+    outcomes = Counter()
+    latencies = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def limited(uid):
+        async with semaphore:
+            bot = FarmBot(SimpleNamespace(name=f"load{uid}"), "android")
+            await run_account(bot, uid, args.cycles, args.max_upgrades, outcomes, latencies)
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*[limited(uid) for uid in range(1, args.accounts + 1)])
+        elapsed = time.perf_counter() - start
+        pool_stats = get_http_pool().stats()
+    finally:
+        await close_http_pool()
+        if api is not None:
+            await api.stop()
+
+    latencies.sort()
+    return {
+        "accounts": args.accounts,
+        "cycles": len(latencies),
+        "seconds": elapsed,
+        "cycles_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "cycle_p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+        "cycle_p95_ms": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0,
+        "outcomes": dict(outcomes),
+        "http_pool": pool_stats,
+        "rate_limit": {name: stats for name, stats in get_rate_limiter().stats().items() if stats["granted"]},
+        "server": api.stats() if api is not None else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--accounts", type=int, default=100)
+    parser.add_argument("--cycles", type=int, default=1, help="farming cycles per account")
+    parser.add_argument("--concurrency", type=int, default=100, help="accounts running at the same time")
+    parser.add_argument("--max-upgrades", type=int, default=5, help="purchases attempted per cycle")
+    parser.add_argument("--no-rate-limit", action="store_true", help="send requests without the shared rate limiter")
+    parser.add_argument("--url", help="use an already running stand-in server instead of starting one")
+    add_option_arguments(parser)
+    args = parser.parse_args()
+
+    report = asyncio.run(run_load(args))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
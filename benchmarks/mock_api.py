@@ -0,0 +1,343 @@
+"""Local stand-in for the qlyuker API and website, for end-to-end and load tests without network.
+
+Emulates /auth/start, /game/sync, /upgrades/buy, /tasks/check, /tasks/claim, the web page and the
+JS bundle carrying the Klyuk code. Every account gets a seeded synthetic game with passive mining,
+energy regeneration, upgrade cooldowns and tasks. Latency, server errors, 429s and
+"Слишком рано для улучшения" answers can be injected at configurable rates.
+
+Run from the repository root:
+    python -m benchmarks.mock_api --port 8080 --latency 0.05 --error-rate 0.01 --rate-limit 0.02
+and point the bot at it in .conf:
+    [api]
+    base_url = http://localhost:8080
+    web_url = http://localhost:8080/
+"""
+import argparse
+import asyncio
+import json
+import random
+import secrets
+import time
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+from urllib.parse import parse_qs
+
+from aiohttp import web
+
+from benchmarks.synthetic import make_auth_data
+from bot.catalog import cooldown_period
+
+TOO_EARLY_MESSAGE = "Слишком рано для улучшения"
+SESSION_COOKIE = "qlyuker_session"
+# Offline mining is credited for at most this many hours, as in the game
+MAX_OFFLINE_HOURS = 3
+
+
+@dataclass
+class MockOptions:
+    """Fault injection and game generation settings of the stand-in server."""
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    rate_limit: float = 0.0
+    too_early_rate: float = 0.0
+    upgrades: int = 200
+    bundle_size: int = 1_000_000
+    klyuk_rotate: float = 0.0
+    max_rps: float = 0.0
+    seed: int = 1
+
+
+class MockAccount:
+    """Server-side game state of one account."""
+
+    def __init__(self, uid: int, options: MockOptions):
+        now = int(time.time())
+        self.uid = uid
+        self.data = make_auth_data(options.upgrades, seed=options.seed * 1_000_003 + uid, now=now)
+        self.data["user"]["uid"] = uid
+        self.game = self.data["game"]
+        self.upgrades = {u["id"]: u for u in self.data["upgrades"]["list"]}
+        self.data["tasks"] = [
+            {"id": f"task_{i}", "kind": "link", "completed": False, "time": now - 120 * i,
+             "meta": {"reward": 1000 * (i + 1), "checkDelay": 60}}
+            for i in range(3)
+        ]
+        self.tasks = {task["id"]: task for task in self.data["tasks"]}
+        self.synced_at = now
+
+    def tick(self) -> int:
+        """Credits mining and energy since the last request and returns the coins mined."""
+        now = time.time()
+        elapsed = min(now - self.synced_at, MAX_OFFLINE_HOURS * 3600)
+        mined = int(self.game["minePerHour"] * elapsed / 3600)
+        self.game["currentCoins"] += mined
+        self.game["totalCoins"] += mined
+        self.game["currentEnergy"] = min(self.game["maxEnergy"],
+                                         self.game["currentEnergy"] + int(elapsed * self.game["energyPerSec"]))
+        self.synced_at = now
+        return mined
+
+
+class MockApi:
+    """aiohttp application holding the accounts, the current bundle and request counters."""
+
+    def __init__(self, options: MockOptions = None):
+        self.options = options or MockOptions()
+        self.rnd = random.Random(self.options.seed)
+        self.accounts = {}
+        self.sessions = {}
+        self.requests = Counter()
+        # Start of the current one-second window and requests counted in it, per route
+        self.windows = {}
+        self.rotate_klyuk()
+
+        self.app = web.Application(middlewares=[self.faults_middleware])
+        self.app.add_routes([
+            web.get("/", self.handle_page),
+            web.get("/assets/{name}", self.handle_bundle),
+            web.post("/auth/start", self.handle_auth_start),
+            web.post("/game/sync", self.handle_game_sync),
+            web.post("/upgrades/buy", self.handle_upgrade_buy),
+            web.post("/tasks/check", self.handle_task_check),
+            web.post("/tasks/claim", self.handle_task_claim),
+            web.get("/__stats", self.handle_stats),
+        ])
+
+    def rotate_klyuk(self):
+        """Publishes a new bundle with a new Klyuk code, as a game release does."""
+        self.bundle_name = f"index-{secrets.token_hex(4)}.js"
+        self.klyuk = "".join(self.rnd.choice("01") for _ in range(64))
+        self.klyuk_rotated_at = time.time()
+
+    def stats(self) -> dict:
+        """Request counts by route and status."""
+        return {f"{route} {status}": count for (route, status), count in sorted(self.requests.items())}
+
+    @web.middleware
+    async def faults_middleware(self, request: web.Request, handler):
+        options = self.options
+        if options.latency or options.jitter:
+            await asyncio.sleep(max(0.0, options.latency + self.rnd.uniform(-options.jitter, options.jitter)))
+        if options.klyuk_rotate and time.time() - self.klyuk_rotated_at >= options.klyuk_rotate:
+            self.rotate_klyuk()
+
+        response = None
+        route = request.match_info.route.resource.canonical if request.match_info.route.resource else request.path
+        if request.method == "POST":
+            roll = self.rnd.random()
+            if roll < options.rate_limit or self.over_capacity(route):
+                response = web.json_response({"error": "Too many requests"}, status=429,
+                                             headers={"Retry-After": str(self.rnd.randint(1, 5))})
+            elif roll < options.rate_limit + options.error_rate:
+                response = web.json_response({"error": "Internal server error"},
+                                             status=self.rnd.choice((500, 502, 503)))
+            elif request.headers.get("Klyuk") != self.klyuk:
+                response = web.json_response({"error": "Bad request"}, status=400)
+        if response is None:
+            response = await handler(request)
+        self.requests[(route, response.status)] += 1
+        return response
+
+    def over_capacity(self, route: str) -> bool:
+        """True when the route has already served max_rps requests in the current second."""
+        if not self.options.max_rps:
+            return False
+        now = time.monotonic()
+        started, count = self.windows.get(route, (now, 0))
+        if now - started >= 1.0:
+            started, count = now, 0
+        self.windows[route] = (started, count + 1)
+        return count >= self.options.max_rps
+
+    def account_for(self, request: web.Request):
+        return self.sessions.get(request.cookies.get(SESSION_COOKIE))
+
+    async def handle_page(self, request: web.Request) -> web.Response:
+        html = (f'<!doctype html><html><head><title>Клюкер</title>'
+                f'<script type="module" crossorigin src="/assets/{self.bundle_name}"></script>'
+                f'</head><body><div id="app"></div></body></html>')
+        return web.Response(text=html, content_type="text/html")
+
+    async def handle_bundle(self, request: web.Request) -> web.StreamResponse:
+        if request.match_info["name"] != self.bundle_name:
+            return web.Response(status=404)
+        needle = f'e.headers.set("Klyuk", "{self.klyuk}");'.encode()
+        filler = b"function(a,b){return a+b};var x=[1,2,3].map(function(e){return e*2});" * 64
+        # The code sits in the middle of the bundle, so clients have to stream half of it
+        half = max(0, self.options.bundle_size // 2)
+
+        response = web.StreamResponse(headers={"Content-Type": "application/javascript"})
+        await response.prepare(request)
+        for written in range(0, 2 * half, len(filler)):
+            if written >= half and needle:
+                await response.write(needle)
+                needle = b""
+            await response.write(filler[:2 * half - written])
+        if needle:
+            await response.write(needle)
+        await response.write_eof()
+        return response
+
+    async def handle_auth_start(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        start_data = payload.get("startData")
+        if not start_data:
+            return web.json_response({"error": "startData is required"}, status=400)
+
+        user = parse_qs(start_data).get("user", [None])[0]
+        try:
+            uid = int(json.loads(user)["id"])
+        except (TypeError, ValueError, KeyError):
+            uid = zlib.crc32(start_data.encode())
+        account = self.accounts.get(uid)
+        if account is None:
+            account = self.accounts[uid] = MockAccount(uid, self.options)
+
+        token = secrets.token_hex(16)
+        self.sessions[token] = account
+        account.data["app"] = {"mined": account.tick()}
+        response = web.json_response(account.data)
+        response.set_cookie(SESSION_COOKIE, token)
+        return response
+
+    async def handle_game_sync(self, request: web.Request) -> web.Response:
+        account = self.account_for(request)
+        if account is None:
+            return web.json_response({"error": "Unauthorized"}, status=401)
+        payload = await request.json()
+        account.tick()
+        game = account.game
+        taps = min(max(0, int(payload.get("taps", 0))), game["currentEnergy"] // max(1, game["coinsPerTap"]))
+        game["currentCoins"] += taps * game["coinsPerTap"]
+        game["totalCoins"] += taps * game["coinsPerTap"]
+        game["currentEnergy"] = max(0, min(int(payload.get("currentEnergy", game["currentEnergy"])),
+                                           game["currentEnergy"] - taps * game["coinsPerTap"]))
+        return web.json_response(dict(game))
+
+    async def handle_upgrade_buy(self, request: web.Request) -> web.Response:
+        account = self.account_for(request)
+        if account is None:
+            return web.json_response({"error": "Unauthorized"}, status=401)
+        payload = await request.json()
+        upgrade = account.upgrades.get(payload.get("upgradeId"))
+        if upgrade is None or "next" not in upgrade:
+            return web.json_response({"error": "Upgrade not found"}, status=400)
+
+        account.tick()
+        now = int(time.time())
+        shared_config = account.data["sharedConfig"]
+        if "upgradedAt" in upgrade:
+            cooldown = cooldown_period(upgrade, shared_config.get("dayLimitationUpgradeDelay", 3600),
+                                       shared_config.get("upgradeDelay", {}))
+            if now - upgrade["upgradedAt"] < cooldown:
+                return web.Response(text=TOO_EARLY_MESSAGE)
+        if self.rnd.random() < self.options.too_early_rate:
+            return web.Response(text=TOO_EARLY_MESSAGE)
+
+        game = account.game
+        price = upgrade["next"]["price"]
+        if price > game["currentCoins"]:
+            return web.json_response({"error": "Недостаточно монет"}, status=400)
+
+        game["currentCoins"] -= price
+        game["minePerHour"] += upgrade["next"]["increment"]
+        upgrade["level"] += 1
+        upgrade["upgradedAt"] = now
+        upgrade["next"] = {"price": int(price * 1.35), "increment": max(1, int(upgrade["next"]["increment"] * 1.2))}
+        if upgrade.get("levelsCount") is not None and upgrade["level"] >= upgrade["levelsCount"]:
+            upgrade.pop("next")
+        account.data["upgrades"]["user"][upgrade["id"]] = {"level": upgrade["level"]}
+        return web.json_response(dict(game, upgrade=upgrade))
+
+    async def handle_task_check(self, request: web.Request) -> web.Response:
+        account = self.account_for(request)
+        if account is None:
+            return web.json_response({"error": "Unauthorized"}, status=401)
+        payload = await request.json()
+        task = account.tasks.get(payload.get("taskId"))
+        if task is None:
+            return web.json_response({"error": "Task not found"}, status=400)
+        task["completed"] = True
+        return web.json_response({"task": task})
+
+    async def handle_task_claim(self, request: web.Request) -> web.Response:
+        account = self.account_for(request)
+        if account is None:
+            return web.json_response({"error": "Unauthorized"}, status=401)
+        payload = await request.json()
+        task = account.tasks.get(payload.get("taskId"))
+        if task is None or not task["completed"] or task.get("claimed"):
+            return web.json_response({"error": "Task not completed"}, status=400)
+        task["claimed"] = True
+        reward = task["meta"]["reward"]
+        account.game["currentCoins"] += reward
+        account.game["totalCoins"] += reward
+        return web.json_response({"reward": reward, "currentCoins": account.game["currentCoins"]})
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({"accounts": len(self.accounts), "requests": self.stats()})
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Starts serving in the running loop and returns the base URL."""
+        self.runner = web.AppRunner(self.app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        # aiohttp's CookieJar ignores cookies from IP address hosts, so loopback is named
+        return f"http://{'localhost' if host == '127.0.0.1' else host}:{port}"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+def parse_options(args) -> MockOptions:
+    return MockOptions(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                       rate_limit=args.rate_limit, too_early_rate=args.too_early, upgrades=args.upgrades,
+                       bundle_size=args.bundle_size, klyuk_rotate=args.klyuk_rotate, max_rps=args.max_rps,
+                       seed=args.seed)
+
+
+def add_option_arguments(parser: argparse.ArgumentParser):
+    """Adds the MockOptions flags, shared with the load test driver."""
+    parser.add_argument("--latency", type=float, default=0.0, help="mean response delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="uniform +/- delay added to the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of POSTs answered with 5xx")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="share of POSTs answered with 429")
+    parser.add_argument("--too-early", type=float, default=0.0,
+                        help="share of upgrade purchases answered with the too-early message")
+    parser.add_argument("--upgrades", type=int, default=200, help="upgrades per account")
+    parser.add_argument("--bundle-size", type=int, default=1_000_000, help="JS bundle size in bytes")
+    parser.add_argument("--klyuk-rotate", type=float, default=0.0,
+                        help="publish a new bundle and Klyuk code every N seconds (0 never)")
+    parser.add_argument("--max-rps", type=float, default=0.0,
+                        help="answer 429 once a POST route exceeds this many requests per second (0 no limit)")
+    parser.add_argument("--seed", type=int, default=1)
+
+
+async def serve(host: str, port: int, options: MockOptions):
+    api = MockApi(options)
+    url = await api.start(host, port)
+    print(f"Mock qlyuker API listening on {url} (stats at {url}/__stats)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await api.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    add_option_arguments(parser)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, parse_options(args)))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Seeded generator of synthetic auth/start payloads for planner benchmarks."""
+import random
+import time
+
+CATEGORIES = ("market", "team", "media", "legal", "special")
+
+
+def make_upgrade(rnd: random.Random, index: int, now: int) -> dict:
+    """Builds one upgrade in the shape of auth_data['upgrades']['list']."""
+    level = rnd.randint(0, 25)
+    base_price = rnd.choice((100, 250, 500, 1000, 2500, 5000))
+    price = int(base_price * 1.35 ** level)
+    increment = max(1, int(price * rnd.uniform(0.02, 0.12)))
+    upgrade = {
+        "id": f"{rnd.choice(CATEGORIES)}_{index}",
+        "level": level,
+        "next": {"price": price, "increment": increment},
+    }
+    if rnd.random() < 0.3:
+        upgrade["upgradedAt"] = now - rnd.randint(0, 7200)
+    if rnd.random() < 0.05:
+        upgrade["dayLimitation"] = rnd.randint(1, 5)
+    if rnd.random() < 0.02:
+        upgrade["levelsCount"] = level
+    return upgrade
+
+
+def make_auth_data(n_upgrades: int, seed: int = 1, now: int = None) -> dict:
+    """Builds a realistic auth/start payload with `n_upgrades` upgrades, cooldowns and conditions."""
+    rnd = random.Random(seed)
+    now = int(time.time()) if now is None else now
+    upgrades = [make_upgrade(rnd, i, now) for i in range(n_upgrades)]
+    # The game always ships these two, and the farming loop treats them specially
+    for upgrade_id, upgrade in zip(("coinsPerTap", "restoreEnergy"), upgrades):
+        upgrade["id"] = upgrade_id
+
+    for i, upgrade in enumerate(upgrades):
+        roll = rnd.random()
+        if roll < 0.1:
+            upgrade["condition"] = {"kind": "friends", "friends": rnd.randint(1, 20)}
+        elif roll < 0.35 and i > 0:
+            required = upgrades[rnd.randrange(i)]
+            upgrade["condition"] = {"kind": "upgrade", "upgradeId": required["id"],
+                                    "level": rnd.randint(1, 30)}
+
+    shared_config = {
+        "dayLimitationUpgradeDelay": 3600,
+        "upgradeDelay": {str(level): min(3600, level * 60) for level in range(1, 31)},
+    }
+    return {
+        "app": {"mined": 0},
+        "user": {"uid": seed},
+        "friends": {"friendsCountWithYandexID": rnd.randint(0, 15)},
+        "game": {
+            "totalCoins": 10_000_000,
+            "currentCoins": rnd.randint(10_000, 5_000_000),
+            "currentEnergy": 1000,
+            "maxEnergy": 2000,
+            "currentTickets": 0,
+            "minePerHour": rnd.randint(1_000, 200_000),
+            "coinsPerTap": 1,
+            "energyPerSec": 3,
+        },
+        # Server-side levels override a few list levels, as in real payloads
+        "upgrades": {"list": upgrades,
+                     "user": {u["id"]: {"level": u["level"] + 1} for u in rnd.sample(upgrades, n_upgrades // 20)}},
+        "sharedConfig": shared_config,
+        "tasks": [],
+    }
+
+
+def make_auth_extras(n_leaderboard: int = 500, n_tournaments: int = 20, n_shop: int = 200,
+                     n_tasks: int = 40, seed: int = 1, now: int = None) -> dict:
+    """Builds the auth/start sections the farming loop never reads, sized like real responses."""
+    rnd = random.Random(seed)
+    now = int(time.time()) if now is None else now
+    leaderboard = [{"uid": rnd.randint(1, 10 ** 9), "name": f"player_{i}", "avatar": f"https://t.me/i/userpic/{i}.jpg",
+                    "totalCoins": rnd.randint(10 ** 6, 10 ** 11), "position": i + 1} for i in range(n_leaderboard)]
+    tournaments = [{"id": f"tournament_{i}", "title": f"Tournament {i}", "startsAt": now - 86400, "endsAt": now + 86400,
+                    "prizes": [{"place": place, "coins": 10 ** (7 - place)} for place in range(1, 6)],
+                    "top": leaderboard[:20]} for i in range(n_tournaments)]
+    shop = [{"id": f"item_{i}", "kind": rnd.choice(("skin", "boost", "ticket")), "price": rnd.randint(1, 5000),
+             "title": f"Item {i}", "description": "Ускоряет клюканье " * 4} for i in range(n_shop)]
+    tasks = [{"id": f"task_{i}", "kind": rnd.choice(("subscribe", "visit", "invite")), "completed": rnd.random() < 0.5,
+              "time": now - rnd.randint(0, 3600), "meta": {"reward": rnd.randint(1000, 100000), "checkDelay": 600,
+                                                          "url": f"https://t.me/channel_{i}"}} for i in range(n_tasks)]
+    return {"leaderboard": leaderboard, "tournaments": tournaments, "shop": shop, "tasks": tasks,
+            "team": {"id": 1, "members": leaderboard[:50]}}
@@ -0,0 +1,147 @@
+import copy
+import time
+from typing import Optional
+from urllib.parse import parse_qs
+
+import aiohttp
+from yarl import URL
+from loguru import logger
+from bot.utils import load_config
+from bot.game_state import slim_auth
+
+# Load configurations from the .conf file
+config = load_config()
+
+# Extract auth session settings from the configuration
+WEB_DATA_TTL = config.getint("auth", "web_data_ttl", fallback=21600)
+KEEP_SESSION = config.getboolean("auth", "keep_session", fallback=True)
+
+# Statuses that mean the server no longer accepts the kept session
+SESSION_REJECTED_STATUSES = (401, 403)
+
+
+def web_data_auth_date(query_id: str) -> Optional[int]:
+    """Returns the auth_date of Telegram web app init data, if present."""
+    if not query_id:
+        return None
+    auth_date = parse_qs(query_id).get("auth_date", [None])[0]
+    return int(auth_date) if auth_date and auth_date.isdigit() else None
+
+
+class AuthSession:
+    """Authenticated game state of one account, kept between farming cycles.
+
+    Holds the cookie jar of the login, the last auth/start payload and the time the Telegram
+    web data expires, so ordinary cycles can resume with /game/sync instead of a full handshake.
+    """
+
+    def __init__(self, web_data_ttl: int = WEB_DATA_TTL):
+        self.web_data_ttl = web_data_ttl
+        self._cookie_jar = None
+        self.auth_data = None
+        self.authenticated_at = 0.0
+        self.expires_at = 0.0
+        self.synced_at = 0.0
+        # Cookies of a restored snapshot, added to the jar once it is created
+        self._restored_cookies = []
+
+    @property
+    def cookie_jar(self) -> aiohttp.CookieJar:
+        """Cookie jar of this account, created inside the running loop on first use."""
+        if self._cookie_jar is None:
+            self._cookie_jar = aiohttp.CookieJar()
+            for name, value, domain, path in self._restored_cookies:
+                self._cookie_jar.update_cookies({name: value}, URL.build(scheme="https", host=domain, path=path))
+            self._restored_cookies = []
+        return self._cookie_jar
+
+    def is_valid(self) -> bool:
+        """True when a kept session exists and its web data has not expired."""
+        return KEEP_SESSION and self.auth_data is not None and time.time() < self.expires_at
+
+    def store(self, auth_data: dict, query_id: str):
+        """Keeps the payload of a successful auth/start."""
+        now = time.time()
+        auth_date = web_data_auth_date(query_id) or now
+        self.auth_data = auth_data
+        self.authenticated_at = now
+        self.synced_at = now
+        self.expires_at = auth_date + self.web_data_ttl
+
+    def invalidate(self, reason: str):
+        """Drops the kept session so the next cycle runs the full Telegram + auth handshake."""
+        if self.auth_data is not None:
+            logger.info(f"Auth session invalidated: {reason}")
+        self.auth_data = None
+        self.expires_at = 0.0
+        if self._cookie_jar is not None:
+            self._cookie_jar.clear()
+
+    def snapshot(self) -> Optional[dict]:
+        """Kept session as plain data for the state store, or None when there is none."""
+        if self.auth_data is None:
+            return None
+        cookies = self._restored_cookies
+        if self._cookie_jar is not None:
+            cookies = [(morsel.key, morsel.value, morsel["domain"], morsel["path"] or "/")
+                       for morsel in self._cookie_jar if morsel["domain"]]
+        return {"auth_data": self.auth_data, "authenticated_at": self.authenticated_at,
+                "expires_at": self.expires_at, "synced_at": self.synced_at, "cookies": cookies}
+
+    def restore(self, snapshot: dict) -> bool:
+        """Takes over a snapshot saved by an earlier run; returns whether it is still usable."""
+        if not snapshot or time.time() >= snapshot.get("expires_at", 0):
+            return False
+        self.auth_data = slim_auth(snapshot["auth_data"])
+        self.authenticated_at = snapshot.get("authenticated_at", 0.0)
+        self.expires_at = snapshot["expires_at"]
+        self.synced_at = snapshot.get("synced_at", 0.0)
+        self._restored_cookies = [tuple(cookie) for cookie in snapshot.get("cookies", [])]
+        return True
+
+    def estimated_energy(self) -> int:
+        """Energy restored since the last sync, capped at maxEnergy."""
+        game = self.auth_data["game"]
+        elapsed = max(0.0, time.time() - self.synced_at)
+        energy = int(game["currentEnergy"]) + int(elapsed * int(game["energyPerSec"]))
+        return min(energy, int(game["maxEnergy"]))
+
+    def apply_sync(self, gdata: dict) -> dict:
+        """Merges a /game/sync or upgrades/buy response into the kept game state."""
+        game = self.auth_data["game"]
+        for key, value in gdata.items():
+            if key in game:
+                game[key] = value
+        self.synced_at = time.time()
+        return self.auth_data
+
+    def apply_upgrade(self, upgrade_id: str, r_updates: dict):
+        """Updates the kept upgrade list after a purchase so cooldowns stay correct."""
+        self.apply_sync(r_updates)
+        bought = r_updates.get("upgrade")
+        for i, upgrade in enumerate(self.auth_data["upgrades"].get("list", [])):
+            if upgrade["id"] != upgrade_id:
+                continue
+            if isinstance(bought, dict) and bought.get("id") == upgrade_id:
+                self.auth_data["upgrades"]["list"][i] = bought
+            else:
+                upgrade["level"] = upgrade.get("level", 0) + 1
+                upgrade["upgradedAt"] = int(time.time())
+            break
+
+    def complete_task(self, task_id: str):
+        """Marks a claimed task as completed in the kept payload so resumed cycles skip it."""
+        for task in self.auth_data.get("tasks", []):
+            if task.get("id") == task_id:
+                task["completed"] = True
+                break
+
+    def resume(self, gdata: dict) -> dict:
+        """Returns a copy of the kept payload refreshed with a /game/sync response."""
+        previous_coins = int(self.auth_data["game"]["currentCoins"])
+        self.apply_sync(gdata)
+        auth_data = copy.copy(self.auth_data)
+        # Coins credited since the previous sync stand in for the offline "mined" amount
+        auth_data["app"] = dict(auth_data.get("app", {}),
+                                mined=int(self.auth_data["game"]["currentCoins"]) - previous_coins)
+        return auth_data
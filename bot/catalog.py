@@ -0,0 +1,203 @@
+import bisect
+import time
+from typing import Dict, List, Optional
+
+
+class UpgradeRecord:
+    """Compact, precomputed view of one upgrade from the auth/start payload.
+
+    Supports item access (record['price']) so planner code written against the old per-call
+    dicts keeps working unchanged.
+    """
+    __slots__ = ('index', 'id', 'upgrade', 'level', 'price', 'income_increase', 'efficiency', 'roi_hours',
+                 'cooldown_until', 'required_friends', 'required_id', 'required_level')
+
+    def __init__(self, index: int, upgrade: Dict, level: int, price: float, increment: float,
+                 cooldown_until: float):
+        self.index = index
+        self.id = upgrade['id']
+        self.upgrade = upgrade
+        self.level = level
+        self.cooldown_until = cooldown_until
+        self.required_friends = 0
+        self.required_id = None
+        self.required_level = 0
+        self.set_next(price, increment)
+
+        condition = upgrade.get('condition')
+        if condition is not None:
+            if condition['kind'] == 'friends':
+                self.required_friends = condition['friends']
+            elif condition['kind'] == 'upgrade':
+                self.required_id = condition['upgradeId']
+                self.required_level = condition['level']
+
+    def set_next(self, price: float, increment: float):
+        """Updates the next-level price and income increase with their derived ratios."""
+        self.price = price
+        self.income_increase = increment
+        self.efficiency = increment / price if price > 0 else 0
+        self.roi_hours = price / increment if increment > 0 else float('inf')
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def __repr__(self):
+        return f"UpgradeRecord({self.id!r}, level={self.level}, price={self.price}, income={self.income_increase})"
+
+
+def purchase_delta(record: 'UpgradeRecord', r_updates: Dict, now: int = None) -> Dict:
+    """Extracts the new level, next price/increment and purchase time from an upgrades/buy response."""
+    now = int(time.time()) if now is None else now
+    bought = r_updates.get('upgrade') if isinstance(r_updates.get('upgrade'), dict) else {}
+    next_level = bought.get('next') or {}
+    return {
+        'level': bought.get('level', record.level + 1),
+        'next_price': next_level.get('price'),
+        'next_increment': next_level.get('increment', 0),
+        'upgraded_at': bought.get('upgradedAt', now),
+        'upgrade': bought or None,
+    }
+
+
+def cooldown_period(upgrade: Dict, day_limitation_delay: int, upgrade_delays: Dict) -> int:
+    """Cooldown after a purchase, following the sharedConfig rules used by the game."""
+    if 'dayLimitation' in upgrade and upgrade['dayLimitation'] > 0:
+        return day_limitation_delay
+    upgrade_level = str(upgrade.get('level', 1))
+    if upgrade_level in upgrade_delays:
+        return upgrade_delays[upgrade_level]
+    if upgrade['id'] == 'restoreEnergy':
+        return 3600
+    return day_limitation_delay
+
+
+class UpgradeCatalog:
+    """Upgrades of one auth/start payload, indexed once and shared by both planner paths.
+
+    Static filters (maxed out, no next level, configured level/cost/profit limits) are applied at
+    build time. Cooldown expiries are kept sorted and prerequisites are indexed by the upgrade they
+    depend on, so available() only re-checks what can change between calls and caches its result
+    until the next cooldown expires or levels change.
+    """
+
+    def __init__(self, upgrades: Dict, shared_config: Dict, max_level: int = 0, max_cost: int = 0,
+                 min_profit: int = 0):
+        self.source = upgrades
+        self.max_level = max_level
+        self.max_cost = max_cost
+        self.min_profit = min_profit
+        self.day_limitation_delay = shared_config.get('dayLimitationUpgradeDelay', 3600)
+        self.upgrade_delays = shared_config.get('upgradeDelay', {})
+
+        upgrade_list = upgrades.get('list', [])
+        self.levels = {upgrade['id']: upgrade['level'] for upgrade in upgrade_list}
+        for upgrade_id, upgrade_data in upgrades.get('user', {}).items():
+            if 'level' in upgrade_data:
+                self.levels[upgrade_id] = upgrade_data['level']
+
+        self.records: List[UpgradeRecord] = []
+        self.by_id: Dict[str, UpgradeRecord] = {}
+        self.dependents: Dict[str, List[UpgradeRecord]] = {}
+        for upgrade in upgrade_list:
+            record = self._build_record(len(self.records), upgrade)
+            if record is None:
+                continue
+            self.records.append(record)
+            self.by_id[record.id] = record
+            if record.required_id is not None:
+                self.dependents.setdefault(record.required_id, []).append(record)
+
+        self._expiries = sorted(r.cooldown_until for r in self.records if r.cooldown_until > 0)
+        self.version = 0
+        self._cache_key = None
+        self._cache: List[UpgradeRecord] = []
+
+    def _build_record(self, index: int, upgrade: Dict) -> Optional[UpgradeRecord]:
+        if 'maxLevel' in upgrade or ('levelsCount' in upgrade and upgrade['level'] >= upgrade['levelsCount']):
+            return None
+        if self.max_level > 0 and upgrade['level'] >= self.max_level:
+            return None
+        if 'next' not in upgrade:
+            return None
+
+        price = upgrade['next'].get('price', float('inf'))
+        increment = upgrade['next'].get('increment', 0)
+        if self.max_cost > 0 and price > self.max_cost:
+            return None
+        if self.min_profit > 0 and increment < self.min_profit:
+            return None
+
+        cooldown_until = 0
+        if 'upgradedAt' in upgrade:
+            cooldown_until = upgrade['upgradedAt'] + cooldown_period(upgrade, self.day_limitation_delay,
+                                                                    self.upgrade_delays)
+        return UpgradeRecord(index, upgrade, upgrade.get('level', 0), price, increment, cooldown_until)
+
+    def is_unlocked(self, record: UpgradeRecord, friends_count: int) -> bool:
+        """True when the record's friends/upgrade condition is met."""
+        if friends_count < record.required_friends:
+            return False
+        if record.required_id is not None and record.required_id in self.levels:
+            return self.levels[record.required_id] >= record.required_level
+        return True
+
+    def available(self, friends_count: int, now: float = None) -> List[UpgradeRecord]:
+        """Records that can be bought now, in payload order."""
+        now = int(time.time()) if now is None else now
+        # The result only changes when a cooldown expires, levels change or friends differ
+        expired = bisect.bisect_right(self._expiries, now)
+        key = (friends_count, self.version, expired)
+        if key != self._cache_key:
+            self._cache = [r for r in self.records
+                           if now >= r.cooldown_until and self.is_unlocked(r, friends_count)]
+            self._cache_key = key
+        return self._cache
+
+    def apply_purchase(self, upgrade_id: str, level: int, next_price: float = None, next_increment: float = 0,
+                       upgraded_at: int = None, upgrade: Dict = None) -> List[UpgradeRecord]:
+        """Applies one purchase and returns the records whose availability it may change.
+
+        Only the bought record and the records that depend on it are touched. A bought record
+        without a known next level, or one that now fails the static limits, is parked with an
+        infinite cooldown until the next auth/start rebuilds the catalog.
+        """
+        upgraded_at = int(time.time()) if upgraded_at is None else upgraded_at
+        self.levels[upgrade_id] = level
+        self.version += 1
+
+        record = self.by_id.get(upgrade_id)
+        if record is None:
+            return list(self.dependents.get(upgrade_id, []))
+
+        if upgrade is None:
+            upgrade = dict(record.upgrade, level=level, upgradedAt=upgraded_at)
+            if next_price is not None:
+                upgrade['next'] = {'price': next_price, 'increment': next_increment}
+            else:
+                upgrade.pop('next', None)
+        record.upgrade = upgrade
+        record.level = level
+
+        # Drop the previous expiry so a stale one cannot shift the availability cache key
+        if record.cooldown_until > 0:
+            position = bisect.bisect_left(self._expiries, record.cooldown_until)
+            if position < len(self._expiries) and self._expiries[position] == record.cooldown_until:
+                del self._expiries[position]
+
+        if (next_price is None or (self.max_level > 0 and level >= self.max_level)
+                or (self.max_cost > 0 and next_price > self.max_cost)
+                or (self.min_profit > 0 and next_increment < self.min_profit)):
+            record.cooldown_until = float('inf')
+        else:
+            record.set_next(next_price, next_increment)
+            record.cooldown_until = upgraded_at + cooldown_period(upgrade, self.day_limitation_delay,
+                                                                 self.upgrade_delays)
+            bisect.insort(self._expiries, record.cooldown_until)
+        return [record] + self.dependents.get(upgrade_id, [])
+
+    def next_cooldown_expiry(self, now: float = None) -> Optional[float]:
+        """Earliest time a cooling-down upgrade becomes available again, if any."""
+        now = int(time.time()) if now is None else now
+        position = bisect.bisect_right(self._expiries, now)
+        return self._expiries[position] if position < len(self._expiries) else None
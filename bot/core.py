@@ -1,103 +1,89 @@
-import math
 import random
-import re
 import time
 from typing import Dict, List
 
 import aiohttp
 import asyncio
-from bot.utils import make_request, handle_error, insert_after, load_config, is_json
-from bot.telegram_handler import TelegramHandler
-from loguru import logger
-from colorama import Fore, Style
+from bot.utils import make_request, handle_error, insert_after, load_config
+from bot.http_client import get_http_pool
+from bot.klyuk_cache import get_klyuk_cache, STALE_HEADER_STATUSES
+from bot.auth_session import AuthSession, SESSION_REJECTED_STATUSES
+from bot.npv import SIMULATION_HOURS, best_scenario
+from bot.planner import IncrementalPlan, dynamic_optimal_sequence, search_sequence
+from bot.catalog import UpgradeCatalog
+from bot.rate_limit import get_rate_limiter
+from bot.retry import CircuitOpenError, send_request
+from bot.metrics import get_metrics
+from bot.tracing import get_tracer
+from bot.state_store import STATE_ENABLED, get_state_store
+from bot.settings import settings_for
+from bot.game_state import GameState, Task, read_body, slim_auth
+from bot.task_engine import TaskEngine
+from bot.endpoints import api_url, api_host, web_origin, web_url
+from bot.log import SessionLog
 
 # Load configurations from the .conf file
 config = load_config()
 
-# Extract log settings from the configuration
-TAP_COUNT = config.getint("bot", "tap_count") if config.get("bot", "tap_count") != '' else 0
-RANDOM_TAP_COUNT = config.get("bot", "random_tap_count") if config.get("bot", "random_tap_count") != '' else 0
-SLEEP_PER_TAP = config.getint("bot", "sleep_per_tap") if config.get("bot", "sleep_per_tap") != '' else 0
-RANDOM_SLEEP_PER_TAP = config.get("bot", "random_sleep_per_tap") if config.get("bot", "random_sleep_per_tap") != '' else 0
-MIN_SAVE_ENERGY = config.getint("bot", "min_save_energy") if config.get("bot", "min_save_energy") != '' else 0
-MIN_SAVE_BALANCE = config.getint("bot", "min_save_balance") if config.get("bot", "min_save_balance") != '' else 0
-USE_AUTO_UPGRADES = config.getboolean("bot", "use_auto_upgrades") if config.get("bot", "use_auto_upgrades") != '' else True
-MAX_UPGRADE_LVL = config.getint("bot", "max_upgrade_lvl") if config.get("bot", "max_upgrade_lvl") != '' else 0
-MAX_UPGRADE_COST = config.getint("bot", "max_upgrade_cost") if config.get("bot", "max_upgrade_cost") != '' else 0
-MIN_UPGRADE_PROFIT = config.getint("bot", "min_upgrade_profit") if config.get("bot", "min_upgrade_profit") != '' else 0
-USE_MAX_ENERGY_TAPS = config.getboolean("bot", "use_max_energy_taps") if config.get("bot", "use_max_energy_taps") != '' else False
+# Extract planner search settings from the configuration
+SEARCH_BRANCHING = config.getint("planner", "search_branching", fallback=0)
+SEARCH_DEPTH = config.getint("planner", "search_depth", fallback=2)
+SEARCH_MAX_NODES = config.getint("planner", "search_max_nodes", fallback=256)
+# Seconds before a cycle that failed is retried, doubled for every further failed cycle in a row
+ERROR_RETRY_BASE = config.getint("retry", "error_retry_base", fallback=30)
+ERROR_RETRY_MAX = config.getint("retry", "error_retry_max", fallback=300)
 class FarmBot:
     def __init__(self, client, platform):
         self.client = client
         self.platform = platform
         self.headers = {}
+        self.auth = AuthSession()
+        self.log = SessionLog(client.name)
+        self.settings = settings_for(client.name)
+        self.last_status = None
+        self.catalog = None
+        self.last_error = None
+        self.tasks = TaskEngine(client.name)
+        self.error_streak = 0
 
     def gen_energy_line(self,current,max,min_percent,max_percent):
-        return f"[{Fore.RED if current<=max*min_percent/100 else Fore.GREEN if current>=max*max_percent/100 else Fore.YELLOW }{current}{Style.RESET_ALL}/{Fore.GREEN}{max}{Style.RESET_ALL}]"
-
-    async def fetch_klyuk_code(self, session: aiohttp.ClientSession) -> str:
-        """Fetches the Klyuk binary code from the website."""
-        # Get main page HTML
-        async with session.get("https://qlyuker.io/", headers={
-            "User-Agent": "Mozilla/5.0 (Linux; Android 15; K) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/135.0.7049.100 Mobile Safari/537.36"
-        }) as response:
-            if response.status != 200:
-                raise Exception(f"Failed to fetch main page, status: {response.status}")
-
-            html_content = await response.text()
-
-            # Extract JS file URL using regex
-            js_pattern = r'src="(https://cdn\.qlyuker\.io/assets/index-[^"]+\.js)"'
-            js_match = re.search(js_pattern, html_content)
-
-            if not js_match:
-                raise Exception("JS file URL not found in HTML")
-
-            js_url = js_match.group(1)
-            print(
-                f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{self.client.name}]{Style.RESET_ALL} | Found JS file: {js_url}")
-
-        # Get JS file content
-        async with session.get(js_url, headers={
-            "User-Agent": "Mozilla/5.0 (Linux; Android 15; K) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/135.0.7049.100 Mobile Safari/537.36"
-        }) as response:
-            if response.status != 200:
-                raise Exception(f"Failed to fetch JS file, status: {response.status}")
-
-            js_content = await response.text()
-
-            # Extract Klyuk binary code using regex
-            klyuk_pattern = r'\.set\("Klyuk",\s*"([01]+)"\)'
-            klyuk_match = re.search(klyuk_pattern, js_content)
-
-            if not klyuk_match:
-                raise Exception("Klyuk code not found in JS file")
-
-            klyuk_code = klyuk_match.group(1)
-            print(
-                f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.GREEN}[{self.client.name}]{Style.RESET_ALL} | Successfully extracted Klyuk code: {klyuk_code}")
+        """Energy template colored by how full it is; current and max energy are its two arguments."""
+        color = "red" if current<=max*min_percent/100 else "green" if current>=max*max_percent/100 else "yellow"
+        return f"[<{color}>{{}}</{color}>/<green>{{}}</green>]"
+
+    async def fetch_klyuk_code(self) -> str:
+        """Returns the Klyuk binary code from the shared cache, fetching it from the website when stale."""
+        cache = get_klyuk_cache()
+        klyuk_code = cache.peek()
+        if klyuk_code is not None:
+            cache.hits += 1
             return klyuk_code
 
-    async def gen_headers(self, platform: str, session: aiohttp.ClientSession) -> Dict[str, str]:
+        with get_tracer().span("fetch_klyuk_code", self.client.name):
+            klyuk_code = await cache.get()
+        self.log.success("Klyuk code refreshed from {}: {}", cache.js_url, klyuk_code)
+        return klyuk_code
+
+    async def gen_headers(self, platform: str) -> Dict[str, str]:
         """Generates HTTP headers based on the platform with dynamic Klyuk code."""
         ua = {
             "ios": "Mozilla/5.0 (iPhone; CPU iPhone OS 17_7 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148",
             "android": "Mozilla/5.0 (Linux; Android 15; K) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/135.0.7049.100 Mobile Safari/537.36 Telegram-Android/11.5.3 (Oneplus DE2117; Android 15; SDK 35; AVERAGE)"
         }
 
-        klyuk_code = await self.fetch_klyuk_code(session)
+        klyuk_code = await self.fetch_klyuk_code()
 
         headers = {
             "Accept": "*/*",
             "Accept-Language": "ru,ru-RU;q=0.9,en-US;q=0.8,en;q=0.7",
             "Connection": "keep-alive",
             "content-type": "application/json",
-            "Host": "api.qlyuker.io",
+            "Host": api_host(),
             "Klyuk": klyuk_code,
             "Locale": "ru",
             "Onboarding": "2",
-            "Origin": "https://qlyuker.io",
-            "Referer": "https://qlyuker.io/",
+            "Origin": web_origin(),
+            "Referer": web_url(),
             "Sec-Fetch-Dest": "empty",
             "Sec-Fetch-Mode": "cors",
             "Sec-Fetch-Site": "same-site",
@@ -116,113 +102,38 @@ class FarmBot:
     async def calculate_optimal_upgrade_sequence(self, upgrades, friendsCount, shared_config, current_balance: int,
                                                  current_income_per_hour: int) -> List[Dict]:
         """Advanced dynamic programming algorithm for optimal upgrade sequencing with income forecasting."""
-        print(
-            f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{self.client.name}]{Style.RESET_ALL} | Starting dynamic upgrade optimization")
+        self.log.step("Starting dynamic upgrade optimization")
 
         # Filter and prepare upgrades
         available_upgrades = await self.filter_available_upgrades(upgrades, friendsCount, shared_config)
         if not available_upgrades:
             return []
 
-        # Simulation parameters
-        SIMULATION_HOURS = 24  # Look ahead 24 hours
-        TIME_STEP_MINUTES = 30  # Calculate every 30 minutes
-        DISCOUNT_RATE = 0.01  # 1% per hour discount rate for time value
-
-        print(
-            f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{self.client.name}]{Style.RESET_ALL} | Analyzing {len(available_upgrades)} upgrades over {SIMULATION_HOURS}h")
+        self.log.step("Analyzing {} upgrades over {}h", len(available_upgrades), SIMULATION_HOURS)
 
         # Create upgrade combinations to test
         upgrade_scenarios = await self.generate_upgrade_scenarios(available_upgrades, current_balance,
                                                                   current_income_per_hour)
 
-        best_scenario = None
-        best_npv = -float('inf')
-
-        # Test each scenario
-        for scenario in upgrade_scenarios:
-            npv = await self.calculate_scenario_npv(scenario, current_balance, current_income_per_hour,
-                                                    SIMULATION_HOURS, TIME_STEP_MINUTES, DISCOUNT_RATE)
-
-            if npv > best_npv:
-                best_npv = npv
-                best_scenario = scenario
+        if not upgrade_scenarios:
+            return []
 
-        if best_scenario:
-            print(
-                f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.GREEN}[{self.client.name}]{Style.RESET_ALL} | Optimal scenario NPV: {best_npv:.2f}")
-            return best_scenario['sequence']
+        # Evaluate all scenarios in one vectorized pass
+        best_index, best_npv = best_scenario(upgrade_scenarios, current_balance, current_income_per_hour,
+                                             self.settings.min_save_balance)
+        self.log.success("Optimal scenario {} NPV: {:.2f}", upgrade_scenarios[best_index]['type'], best_npv)
+        return upgrade_scenarios[best_index]['sequence']
 
-        return []
+    def get_catalog(self, upgrades, shared_config) -> UpgradeCatalog:
+        """Returns the catalog built for this upgrades payload, building it on first use."""
+        if self.catalog is None or self.catalog.source is not upgrades:
+            self.catalog = UpgradeCatalog(upgrades, shared_config, self.settings.max_upgrade_lvl,
+                                          self.settings.max_upgrade_cost, self.settings.min_upgrade_profit)
+        return self.catalog
 
     async def filter_available_upgrades(self, upgrades, friendsCount, shared_config) -> List[Dict]:
         """Filter upgrades based on all conditions and prepare upgrade data."""
-        available_upgrades = []
-        current_time = int(time.time())
-        upgrade_list = upgrades.get('list', [])
-
-        current_levels = {upgrade['id']: upgrade['level'] for upgrade in upgrade_list}
-        user_upgrades = upgrades.get('user', {})
-        for upgrade_id, upgrade_data in user_upgrades.items():
-            if 'level' in upgrade_data:
-                current_levels[upgrade_id] = upgrade_data['level']
-
-        day_limitation_delay = shared_config.get('dayLimitationUpgradeDelay', 3600)
-        upgrade_delays = shared_config.get('upgradeDelay', {})
-
-        for upgrade in upgrade_list:
-            # All existing filters from previous algorithm
-            if 'upgradedAt' in upgrade:
-                last_upgrade_time = upgrade['upgradedAt']
-                cooldown_period = day_limitation_delay
-                if 'dayLimitation' in upgrade and upgrade['dayLimitation'] > 0:
-                    cooldown_period = day_limitation_delay
-                else:
-                    upgrade_level = str(upgrade.get('level', 1))
-                    if upgrade_level in upgrade_delays:
-                        cooldown_period = upgrade_delays[upgrade_level]
-                    elif upgrade['id'] == 'restoreEnergy':
-                        cooldown_period = 3600
-
-                if current_time - last_upgrade_time < cooldown_period:
-                    continue
-
-            if 'maxLevel' in upgrade or ('levelsCount' in upgrade and upgrade['level'] >= upgrade['levelsCount']):
-                continue
-
-            if 'condition' in upgrade:
-                condition = upgrade['condition']
-                if condition['kind'] == 'friends' and friendsCount < condition['friends']:
-                    continue
-                elif condition['kind'] == 'upgrade':
-                    required_upgrade_id = condition['upgradeId']
-                    required_level = condition['level']
-                    if required_upgrade_id in current_levels and current_levels[required_upgrade_id] < required_level:
-                        continue
-
-            if MAX_UPGRADE_LVL > 0 and upgrade['level'] >= MAX_UPGRADE_LVL:
-                continue
-            if 'next' not in upgrade:
-                continue
-
-            next_price = upgrade['next'].get('price', float('inf'))
-            next_increment = upgrade['next'].get('increment', 0)
-
-            if MAX_UPGRADE_COST > 0 and next_price > MAX_UPGRADE_COST:
-                continue
-            if MIN_UPGRADE_PROFIT > 0 and next_increment < MIN_UPGRADE_PROFIT:
-                continue
-
-            available_upgrades.append({
-                'id': upgrade['id'],
-                'upgrade': upgrade,
-                'price': next_price,
-                'income_increase': next_increment,
-                'efficiency': next_increment / next_price if next_price > 0 else 0,
-                'roi_hours': next_price / next_increment if next_increment > 0 else float('inf')
-            })
-
-        return available_upgrades
+        return list(self.get_catalog(upgrades, shared_config).available(friendsCount))
 
     async def generate_upgrade_scenarios(self, available_upgrades: List[Dict], current_balance: int,
                                          current_income: int) -> List[Dict]:
@@ -245,68 +156,18 @@ class FarmBot:
         scenario_4 = await self.create_dynamic_optimal_scenario(available_upgrades, current_balance, current_income)
         scenarios.append(scenario_4)
 
+        # Scenario 5: Bounded search over orderings, when enabled
+        if SEARCH_BRANCHING > 0:
+            sequence = search_sequence(available_upgrades, current_balance, current_income, SEARCH_BRANCHING,
+                                       SEARCH_DEPTH, self.settings.min_save_balance, SEARCH_MAX_NODES)
+            scenarios.append({'type': 'searched', 'sequence': sequence})
+
         return scenarios
 
     async def create_dynamic_optimal_scenario(self, available_upgrades: List[Dict], current_balance: int,
                                               current_income: int) -> Dict:
-        """Create scenario using dynamic programming to find optimal sequence."""
-        # Sort by efficiency but consider timing
-        upgrades_copy = available_upgrades.copy()
-
-        sequence = []
-        simulated_balance = current_balance
-        simulated_income = current_income
-        simulated_time = 0
-
-        while upgrades_copy and simulated_time < 24:  # Max 24 hours simulation
-            best_upgrade = None
-            best_value = -1
-            best_wait_time = float('inf')
-
-            for upgrade in upgrades_copy:
-                price = upgrade['price']
-                income_boost = upgrade['income_increase']
-
-                # Calculate when we can afford this upgrade
-                if price <= simulated_balance:
-                    wait_time = 0
-                else:
-                    needed = price - simulated_balance
-                    if simulated_income <= 0:
-                        wait_time = float('inf')
-                    else:
-                        wait_time = needed / (simulated_income / 3600)  # Convert to seconds
-
-                if wait_time == float('inf'):
-                    continue
-
-                # Calculate value: income boost discounted by wait time
-                # Higher income boost is better, shorter wait time is better
-                time_discount = math.exp(-0.01 * (wait_time / 3600))  # Exponential decay
-                value = income_boost * time_discount / (wait_time / 3600 + 1)
-
-                if value > best_value:
-                    best_value = value
-                    best_upgrade = upgrade
-                    best_wait_time = wait_time
-
-            if best_upgrade is None:
-                break
-
-            # Add wait time and purchase
-            simulated_time += best_wait_time / 3600  # Convert to hours
-            simulated_balance += simulated_income * (best_wait_time / 3600)
-            simulated_balance -= best_upgrade['price']
-            simulated_income += best_upgrade['income_increase']
-
-            sequence.append({
-                'upgrade': best_upgrade,
-                'wait_hours': best_wait_time / 3600,
-                'purchase_time': simulated_time
-            })
-
-            upgrades_copy.remove(best_upgrade)
-
+        """Create scenario using the heap planner to find optimal sequence."""
+        sequence = dynamic_optimal_sequence(available_upgrades, current_balance, current_income)
         return {'type': 'dynamic_optimal', 'sequence': sequence}
 
     async def create_greedy_efficiency_scenario(self, available_upgrades: List[Dict], current_balance: int,
@@ -327,8 +188,8 @@ class FarmBot:
     async def create_affordable_first_scenario(self, available_upgrades: List[Dict], current_balance: int,
                                                current_income: int) -> Dict:
         """Create scenario prioritizing affordable upgrades."""
-        affordable = [u for u in available_upgrades if u['price'] <= current_balance - MIN_SAVE_BALANCE]
-        unaffordable = [u for u in available_upgrades if u['price'] > current_balance - MIN_SAVE_BALANCE]
+        affordable = [u for u in available_upgrades if u['price'] <= current_balance - self.settings.min_save_balance]
+        unaffordable = [u for u in available_upgrades if u['price'] > current_balance - self.settings.min_save_balance]
 
         affordable.sort(key=lambda x: x['efficiency'], reverse=True)
         unaffordable.sort(key=lambda x: x['efficiency'], reverse=True)
@@ -337,59 +198,6 @@ class FarmBot:
         return {'type': 'affordable_first',
                 'sequence': [{'upgrade': u, 'wait_hours': 0, 'purchase_time': 0} for u in sequence]}
 
-    async def calculate_scenario_npv(self, scenario: Dict, initial_balance: int, initial_income: int,
-                                     simulation_hours: int, time_step_minutes: int, discount_rate: float) -> float:
-        """Calculate Net Present Value of a scenario using detailed simulation."""
-        sequence = scenario['sequence']
-
-        # Simulate income over time
-        balance = initial_balance
-        income_per_hour = initial_income
-        total_npv = 0
-        current_time = 0
-        upgrade_index = 0
-
-        time_step_hours = time_step_minutes / 60
-
-        for step in range(int(simulation_hours / time_step_hours)):
-            step_time = step * time_step_hours
-
-            # Add income for this time step
-            income_this_step = income_per_hour * time_step_hours
-            balance += income_this_step
-
-            # Discount the income to present value
-            discounted_income = income_this_step / (1 + discount_rate * step_time)
-            total_npv += discounted_income
-
-            # Check if we can buy next upgrade
-            while upgrade_index < len(sequence):
-                next_upgrade = sequence[upgrade_index]
-                upgrade_price = next_upgrade['upgrade']['price']
-
-                if balance >= upgrade_price + MIN_SAVE_BALANCE:
-                    # Buy the upgrade
-                    balance -= upgrade_price
-                    income_per_hour += next_upgrade['upgrade']['income_increase']
-
-                    # Subtract cost from NPV (discounted)
-                    discounted_cost = upgrade_price / (1 + discount_rate * step_time)
-                    total_npv -= discounted_cost
-
-                    print(
-                        f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.CYAN}[{self.client.name}]{Style.RESET_ALL} | "
-                        f"Scenario {scenario['type']}: Buying {next_upgrade['upgrade']['id']} at {step_time:.1f}h, "
-                        f"NPV impact: -{discounted_cost:.2f}")
-
-                    upgrade_index += 1
-                else:
-                    break
-
-        print(f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{self.client.name}]{Style.RESET_ALL} | "
-              f"Scenario {scenario['type']} final NPV: {total_npv:.2f}")
-
-        return total_npv
-
     async def sort_upgrades(self, upgrades, friendsCount, shared_config, current_balance: int,
                             current_income_per_hour: int = None):
         """Main entry point - uses dynamic optimization algorithm."""
@@ -409,194 +217,132 @@ class FarmBot:
             else:
                 result.append(item)
 
-        print(f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.GREEN}[{self.client.name}]{Style.RESET_ALL} | "
-              f"Dynamic algorithm selected {len(result)} upgrades in optimal order")
+        self.log.success("Dynamic algorithm selected {} upgrades in optimal order", len(result))
 
         return result
 
     async def sort_upgrades_legacy(self, upgrades, friendsCount, shared_config, current_balance: int):
         """Legacy algorithm as fallback when income data is not available."""
-        print(
-            f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{self.client.name}]{Style.RESET_ALL} | Using legacy algorithm (no income data)")
-
-        available_upgrades = []
-        current_time = int(time.time())
-        upgrade_list = upgrades.get('list', [])
-
-        if not upgrade_list:
-            return []
-
-        current_levels = {upgrade['id']: upgrade['level'] for upgrade in upgrade_list}
-        user_upgrades = upgrades.get('user', {})
-        for upgrade_id, upgrade_data in user_upgrades.items():
-            if 'level' in upgrade_data:
-                current_levels[upgrade_id] = upgrade_data['level']
-
-        day_limitation_delay = shared_config.get('dayLimitationUpgradeDelay', 3600)
-        upgrade_delays = shared_config.get('upgradeDelay', {})
-
-        for upgrade in upgrade_list:
-            if 'upgradedAt' in upgrade:
-                last_upgrade_time = upgrade['upgradedAt']
-                cooldown_period = day_limitation_delay
-
-                if 'dayLimitation' in upgrade and upgrade['dayLimitation'] > 0:
-                    cooldown_period = day_limitation_delay
-                else:
-                    upgrade_level = str(upgrade.get('level', 1))
-                    if upgrade_level in upgrade_delays:
-                        cooldown_period = upgrade_delays[upgrade_level]
-                    elif upgrade['id'] == 'restoreEnergy':
-                        cooldown_period = 3600
-
-                time_since_upgrade = current_time - last_upgrade_time
-                if time_since_upgrade < cooldown_period:
-                    continue
-
-            if 'maxLevel' in upgrade or ('levelsCount' in upgrade and upgrade['level'] >= upgrade['levelsCount']):
-                continue
-
-            if 'condition' in upgrade:
-                condition = upgrade['condition']
-                if condition['kind'] == 'friends' and friendsCount < condition['friends']:
-                    continue
-                elif condition['kind'] == 'upgrade':
-                    required_upgrade_id = condition['upgradeId']
-                    required_level = condition['level']
-                    if required_upgrade_id in current_levels and current_levels[required_upgrade_id] < required_level:
-                        continue
-
-            if MAX_UPGRADE_LVL > 0 and upgrade['level'] >= MAX_UPGRADE_LVL:
-                continue
-
-            if 'next' not in upgrade:
-                continue
-
-            next_price = upgrade['next'].get('price', float('inf'))
-            next_increment = upgrade['next'].get('increment', 0)
-
-            if MAX_UPGRADE_COST > 0 and next_price > MAX_UPGRADE_COST:
-                continue
-            if MIN_UPGRADE_PROFIT > 0 and next_increment < MIN_UPGRADE_PROFIT:
-                continue
-
-            efficiency = next_increment / next_price if next_price > 0 else 0
-            affordable = next_price <= current_balance - MIN_SAVE_BALANCE
-
-            available_upgrades.append({
-                'upgrade': upgrade,
-                'price': next_price,
-                'profit': next_increment,
-                'efficiency': efficiency,
-                'affordable': affordable
-            })
+        self.log.step("Using legacy algorithm (no income data)")
 
+        available_upgrades = self.get_catalog(upgrades, shared_config).available(friendsCount)
         if not available_upgrades:
             return []
 
         # Separate affordable and unaffordable, sort by efficiency
-        affordable = [u for u in available_upgrades if u['affordable']]
-        unaffordable = [u for u in available_upgrades if not u['affordable']]
+        affordable = [u for u in available_upgrades if u.price <= current_balance - self.settings.min_save_balance]
+        unaffordable = [u for u in available_upgrades if u.price > current_balance - self.settings.min_save_balance]
 
-        affordable.sort(key=lambda x: x['efficiency'], reverse=True)
-        unaffordable.sort(key=lambda x: x['efficiency'], reverse=True)
+        affordable.sort(key=lambda x: x.efficiency, reverse=True)
+        unaffordable.sort(key=lambda x: x.efficiency, reverse=True)
 
         final_upgrades = affordable + unaffordable
-        return [u['upgrade'] for u in final_upgrades]
+        return [u.upgrade for u in final_upgrades]
 
     async def login(self, query_id, session):
         """Handles login to the service using Telegram web data."""
         try:
-            print(
-                f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{self.client.name}]{Style.RESET_ALL} | Attempting login with query_id: {query_id[:15]}...")
-            res = await make_request(session, "POST", "https://api.qlyuker.io/auth/start", {"startData": query_id},
-                                     "auth/start", self.headers)
-
-            status_code = res.status
-            print(
-                f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{self.client.name}]{Style.RESET_ALL} | Login response status code: {status_code}")
-
-            if status_code != 200:
-                print(
-                    f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.RED}[{self.client.name}]{Style.RESET_ALL} | Login failed with status code {status_code}")
+            self.log.step("Attempting login with query_id: {}...", query_id[:15])
+            res = await make_request(session, "POST", api_url("/auth/start"), {"startData": query_id},
+                                     "auth/start", self.headers, self.client.name)
+            if res is None:
                 return None
 
-            data = await res.json()
+            async with res:
+                status_code = res.status
+                self.log.step("Login response status code: {}", status_code)
 
-            if "game" not in data:
-                print(
-                    f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.RED}[{self.client.name}]{Style.RESET_ALL} | Failed to find game data in the response")
+                if status_code != 200:
+                    self.log.error("Login failed with status code {}", status_code)
+                    if status_code in STALE_HEADER_STATUSES:
+                        get_klyuk_cache().invalidate(self.headers.get("Klyuk"))
+                    return None
+
+                data = await read_body(res)
+
+            if not isinstance(data, dict) or "game" not in data:
+                self.log.error("Failed to find game data in the response")
                 return None
 
-            print(
-                f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.GREEN}[{self.client.name}]{Style.RESET_ALL} | Login successful for user: {data['user']['uid']}")
-            return data
+            self.log.success("Login successful for user: {}", data['user']['uid'])
+            # Sections the cycle never reads are dropped before the payload is kept
+            return slim_auth(data)
+        except CircuitOpenError:
+            raise
         except Exception as error:
-            print(
-                f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.RED}[{self.client.name}]{Style.RESET_ALL} | Exception during login: {str(error)}")
+            self.log.error("Exception during login: {}", str(error))
             await handle_error(error, "", "getting Access Token")
             return None
 
-    async def sync(self, url, payload, session):
+    async def sync(self, url, payload, session=None):
         """Sends a sync request to the specified URL."""
+        if session is None:
+            session = get_http_pool().session()
         try:
-            print(
-                f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{self.client.name}]{Style.RESET_ALL} | Sending sync request to {url}")
+            self.log.step("Sending sync request to {}", url)
 
-            async with session.post(url, json=payload, headers=self.headers) as res:
+            res = await send_request(session, "POST", url, self.client.name, json=payload, headers=self.headers)
+            async with res:
                 status_code = res.status
-                print(
-                    f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{self.client.name}]{Style.RESET_ALL} | Sync response status code: {status_code}")
+                self.last_status = status_code
+                self.log.step("Sync response status code: {}", status_code)
 
                 if status_code != 200:
-                    print(
-                        f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.RED}[{self.client.name}]{Style.RESET_ALL} | Sync request failed with status code {status_code}")
+                    self.log.error("Sync request failed with status code {}", status_code)
+                    if status_code in STALE_HEADER_STATUSES and url.endswith("/game/sync"):
+                        get_klyuk_cache().invalidate(self.headers.get("Klyuk"))
                     return None
 
-                response_text = await res.text()
-
-                if is_json(response_text):
-                    response_json = await res.json()
-                    return response_json
-
-                print(
-                    f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{self.client.name}]{Style.RESET_ALL} | Received non-JSON response")
-                return response_text
+                # One pass over the body: JSON when it parses, the text otherwise
+                body = await read_body(res)
+                if isinstance(body, str):
+                    self.log.step("Received non-JSON response")
+                return body
+        except CircuitOpenError:
+            raise
         except Exception as e:
-            print(
-                f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.RED}[{self.client.name}]{Style.RESET_ALL} | Exception during sync request to {url}: {str(e)}")
+            self.log.error("Exception during sync request to {}: {}", url, str(e))
             return None
 
     async def sync_gdata(self, session, current_energy, taps):
         """Synchronizes game data."""
         try:
-            print(
-                f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{self.client.name}]{Style.RESET_ALL} | Syncing game data with energy: {current_energy}, taps: {taps}")
+            self.log.step("Syncing game data with energy: {}, taps: {}", current_energy, taps)
 
             gdata = await self.sync(
-                "https://api.qlyuker.io/game/sync",
+                api_url("/game/sync"),
                 {"clientTime": int(time.time()), "currentEnergy": current_energy, "taps": taps},
                 session,
             )
 
             if not gdata:
-                print(
-                    f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.RED}[{self.client.name}]{Style.RESET_ALL} | Sync error: No response data received")
+                self.log.error("Sync error: No response data received")
                 return None
 
             if 'currentCoins' not in gdata:
-                print(
-                    f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.RED}[{self.client.name}]{Style.RESET_ALL} | Sync error: Invalid response format")
+                self.log.error("Sync error: Invalid response format")
                 return None
 
-            print(
-                f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.GREEN}[{self.client.name}]{Style.RESET_ALL} | Game data sync successful. Current coins: {gdata['currentCoins']}, Energy: {gdata['currentEnergy']}")
+            self.log.success("Game data sync successful. Current coins: {}, Energy: {}", gdata['currentCoins'], gdata['currentEnergy'])
             return gdata
+        except CircuitOpenError:
+            raise
         except Exception as e:
-            print(
-                f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.RED}[{self.client.name}]{Style.RESET_ALL} | Error syncing game data: {str(e)}")
+            self.log.error("Error syncing game data: {}", str(e))
             return None
 
+    async def resume_session(self, session):
+        """Refreshes the kept game state with /game/sync instead of a full Telegram + auth handshake."""
+        self.log.step("Resuming kept game session")
+        gdata = await self.sync_gdata(session, self.auth.estimated_energy(), 0)
+        if gdata is None:
+            if self.last_status in SESSION_REJECTED_STATUSES:
+                self.auth.invalidate(f"{self.client.name} | server rejected session ({self.last_status})")
+            else:
+                self.auth.invalidate(f"{self.client.name} | resume sync failed")
+            return None
+        return self.auth.resume(gdata)
+
     # async def sync_claim_daily(self, session):
     #     """Claims daily rewards."""
     #     try:
@@ -609,314 +355,329 @@ class FarmBot:
     #     except Exception as e:
     #         logger.exception(f"Error claiming daily rewards: {e}")
     #         return None
-    async def process_tasks(self, session, tasks):
-        """Automatically complete available tasks."""
-        print(
-            f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{self.client.name}]{Style.RESET_ALL} | Processing {len(tasks)} tasks")
-
-        for task in tasks:
-            if task.get('completed', False):
-                continue
-
-            task_id = task['id']
-            task_kind = task['kind']
-            reward = task.get('meta', {}).get('reward', 0)
-
-            print(
-                f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{self.client.name}]{Style.RESET_ALL} | Processing task: {task_id} ({task_kind}) - Reward: {reward}")
-
-            # Проверяем задания с проверкой времени
-            if 'time' in task and 'checkDelay' in task.get('meta', {}):
-                current_time = int(time.time())
-                check_delay = task['meta']['checkDelay']
-                time_since_action = current_time - task['time']
-
-                if time_since_action >= check_delay:
-                    # Можно проверить выполнение задания
-                    result = await self.sync(
-                        "https://api.qlyuker.io/tasks/check",
-                        {"taskId": task_id},
-                        session
-                    )
-                    if result:
-                        print(
-                            f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.GREEN}[{self.client.name}]{Style.RESET_ALL} | Task {task_id} completed! Reward: +{reward}")
-
-            await asyncio.sleep(random.randint(2, 5))
+    async def process_tasks(self, session, tasks: List[Task]) -> int:
+        """Checks and claims the tasks that are due now or within the wait horizon; returns how many were claimed."""
+        self.tasks.update(tasks)
+        self.log.step("Tracking {} unfinished tasks", len(self.tasks))
+        claimed = await self.tasks.run(lambda task: self.check_task(session, task),
+                                       lambda task: self.claim_task(session, task))
+        if claimed:
+            self.log.success("Claimed {} tasks", claimed)
+        return claimed
+
+    async def check_task(self, session, task: Task):
+        """Asks the server to verify a task whose check delay has passed."""
+        self.log.step("Checking task: {} ({}) - Reward: {}", task.id, task.kind, task.reward)
+        result = await self.sync(api_url("/tasks/check"), {"taskId": task.id}, session)
+        if result:
+            self.log.success("Task {} completed! Reward: +{}", task.id, task.reward)
+        return result
+
+    async def claim_task(self, session, task: Task):
+        """Claims the reward of a checked task and records it in the kept game state."""
+        result = await self.claim_task_reward(session, task.id)
+        if not result:
+            self.log.error("Failed to claim reward of task {}", task.id)
+            return None
+        if isinstance(result, dict) and self.auth.auth_data is not None:
+            self.auth.apply_sync(result)
+            self.auth.complete_task(task.id)
+        get_metrics().coins_earned.inc(task.reward, source="tasks")
+        self.log.success("Claimed task {} reward: +{}", task.id, task.reward)
+        return result
 
     async def claim_task_reward(self, session, task_id):
         """Claim reward for completed task."""
         try:
             result = await self.sync(
-                "https://api.qlyuker.io/tasks/claim",
+                api_url("/tasks/claim"),
                 {"taskId": task_id},
                 session
             )
             return result
+        except CircuitOpenError:
+            raise
         except Exception as e:
-            print(
-                f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.RED}[{self.client.name}]{Style.RESET_ALL} | Error claiming task reward: {e}")
+            self.log.error("Error claiming task reward: {}", e)
             return None
     async def sync_upgrade(self, session, upgrade_id):
         """Attempts to buy an upgrade."""
         try:
-            print(
-                f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{self.client.name}]{Style.RESET_ALL} | Attempting to buy upgrade: {upgrade_id}")
+            self.log.step("Attempting to buy upgrade: {}", upgrade_id)
 
             upgrade = await self.sync(
-                "https://api.qlyuker.io/upgrades/buy",
+                api_url("/upgrades/buy"),
                 {"upgradeId": upgrade_id},
                 session,
             )
 
             if not upgrade:
-                print(
-                    f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.RED}[{self.client.name}]{Style.RESET_ALL} | Upgrade sync error: No response data received")
+                self.log.error("Upgrade sync error: No response data received")
                 return None
 
             if isinstance(upgrade, str):
-                print(
-                    f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{self.client.name}]{Style.RESET_ALL} | Upgrade response is a string: {upgrade}")
+                self.log.step("Upgrade response is a string: {}", upgrade)
                 return upgrade
 
             if 'currentCoins' not in upgrade:
-                print(
-                    f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.RED}[{self.client.name}]{Style.RESET_ALL} | Upgrade sync error: Invalid response format")
+                self.log.error("Upgrade sync error: Invalid response format")
                 return None
 
-            print(
-                f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.GREEN}[{self.client.name}]{Style.RESET_ALL} | Upgrade {upgrade_id} purchased successfully. New balance: {upgrade['currentCoins']}")
+            self.log.success("Upgrade {} purchased successfully. New balance: {}", upgrade_id, upgrade['currentCoins'])
             return upgrade
+        except CircuitOpenError:
+            raise
         except Exception as e:
-            print(
-                f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.RED}[{self.client.name}]{Style.RESET_ALL} | Error buying upgrade: {str(e)}")
+            self.log.error("Error buying upgrade: {}", str(e))
             return None
 
-    async def farming(self):
-        """Main farming loop with enhanced functionality."""
+    async def run_cycle(self) -> int:
+        """Runs one farming cycle and returns the seconds to wait before the next one.
+
+        WakeScheduler is the only driver of cycles: it applies the start delay and sleeps between them.
+        """
+        with get_tracer().span("cycle", self.client.name, cat="cycle") as span:
+            self.last_error = None
+            sleep_time = await self.farm_cycle()
+            span.set(next_cycle_in=sleep_time)
+        self.save_state(sleep_time)
+        return sleep_time
+
+    def restore_state(self, state: dict):
+        """Resumes from the state an earlier run saved; a kept session skips the next full login."""
+        if state and self.auth.restore(state.get("auth")):
+            self.log.step("Restored kept game session from the state store")
+
+    def save_state(self, sleep_time: float):
+        """Queues this account's session, next wake time and last error for the state store."""
+        if not STATE_ENABLED:
+            return
+        now = time.time()
+        fields = {"auth": self.auth.snapshot(), "next_wake_at": now + sleep_time, "last_error": self.last_error}
+        if self.last_error is not None:
+            fields["last_error_at"] = now
+        get_state_store().update(self.client.name, **fields)
+
+    async def farm_cycle(self) -> int:
+        """Body of run_cycle; each phase is traced as a span of this account."""
         session_name = self.client.name
-        start_sleep = random.choice(range(12, 120))
-        print(
-            f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{session_name}]{Style.RESET_ALL} | Starting enhanced farming with random sleep {start_sleep} seconds")
-        await asyncio.sleep(start_sleep)
-
-        while True:
-            try:
-                async with aiohttp.ClientSession() as session:
-                    self.headers = await self.gen_headers(self.platform, session)
-
-                    print(
-                        f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{session_name}]{Style.RESET_ALL} | Initializing Telegram handler")
+        tracer = get_tracer()
+        # Picks up changes of .conf or this account's override file since the last cycle
+        self.settings = settings_for(session_name)
+        metrics = get_metrics()
+        started = time.perf_counter()
+        try:
+            async with get_http_pool().acquire(self.auth.cookie_jar) as session:
+                with tracer.span("gen_headers", session_name):
+                    self.headers = await self.gen_headers(self.platform)
+
+                # Ordinary cycles resume the kept session; the full handshake runs only when it is gone
+                auth_data = None
+                if self.auth.is_valid():
+                    with tracer.span("resume_session", session_name):
+                        auth_data = await self.resume_session(session)
+
+                if auth_data is None:
+                    self.log.step("Initializing Telegram handler")
+                    # Imported here so Pyrogram only loads once a session needs Telegram
+                    from bot.telegram_handler import TelegramHandler
                     tg_handler = TelegramHandler(self.client, session_name, self.platform)
 
-                    print(
-                        f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{session_name}]{Style.RESET_ALL} | Getting Telegram web data")
-                    _, query_id = await tg_handler.get_tg_web_data()
+                    self.log.step("Getting Telegram web data")
+                    with tracer.span("get_tg_web_data", session_name):
+                        _, query_id = await tg_handler.get_tg_web_data()
 
-                    print(
-                        f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{session_name}]{Style.RESET_ALL} | Attempting login")
-                    auth_data = await self.login(query_id, session)
+                    self.log.step("Attempting login")
+                    with tracer.span("login", session_name):
+                        auth_data = await self.login(query_id, session)
                     if auth_data is None:
-                        print(
-                            f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.RED}[{session_name}]{Style.RESET_ALL} | Login failed, retrying next cycle")
-                        await asyncio.sleep(60)
-                        continue
-
-                    # Extract data from the new API structure
-                    print(
-                        f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{session_name}]{Style.RESET_ALL} | Extracting data from API response")
-                    mined = int(auth_data["app"]["mined"])
-                    upgrades = auth_data['upgrades']
-                    shared_config = auth_data.get('sharedConfig', {})
-                    friendsCount = auth_data['friends'].get('friendsCountWithYandexID', 0)
-                    totalCoins = int(auth_data["game"]["totalCoins"])
-                    currentCoins = int(auth_data["game"]["currentCoins"])
-                    currentEnergy = int(auth_data["game"]["currentEnergy"])
-                    currentTickets = int(auth_data["game"]["currentTickets"])
-                    minePerHour = int(auth_data["game"]["minePerHour"])
-                    uid = auth_data["user"]['uid']
-                    maxEnergy = int(auth_data["game"]["maxEnergy"])
-                    coinsPerTap = int(auth_data["game"]["coinsPerTap"])
-                    energyPerSec = int(auth_data["game"]["energyPerSec"])
-
-                    # New data sections
-                    tasks = auth_data.get('tasks', [])
-                    shop_items = auth_data.get('shop', [])
-                    tournaments = auth_data.get('tournaments', [])
-                    team_info = auth_data.get('team', {})
-                    leaderboard = auth_data.get('leaderboard', [])
-
-                    print(f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.GREEN}[{session_name}]{Style.RESET_ALL} | "
-                          f"Balance: {Fore.GREEN}{currentCoins}{Style.RESET_ALL} "
-                          f"(Mined +{Fore.GREEN}{mined}{Style.RESET_ALL}) | "
-                          f"Energy: {self.gen_energy_line(currentEnergy, maxEnergy, 25, 75)} | "
-                          f"Tickets: {Fore.YELLOW}{currentTickets}{Style.RESET_ALL}")
-
-                    # Process tasks automatically
-                    if tasks:
-                        print(
-                            f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{session_name}]{Style.RESET_ALL} | Processing {len(tasks)} available tasks")
+                        self.log.error("Login failed, retrying next cycle")
+                        self.last_error = "login failed"
+                        metrics.observe_cycle(started, "login_failed")
+                        # A FloodWait too long to wait out in the Telegram queue delays the next try
+                        return max(60, int(tg_handler.ready_in()) + 1)
+                    self.auth.store(auth_data, query_id)
+
+                # Extract data from the new API structure
+                self.log.step("Extracting data from API response")
+                state = GameState(auth_data)
+                mined = state.mined
+                upgrades = state.upgrades
+                shared_config = state.shared_config
+                # Index the upgrades once per cycle; both planner paths share it
+                self.catalog = UpgradeCatalog(upgrades, shared_config, self.settings.max_upgrade_lvl,
+                                              self.settings.max_upgrade_cost, self.settings.min_upgrade_profit)
+                friendsCount = state.friends_count
+                currentCoins = state.game.current_coins
+                currentEnergy = state.game.current_energy
+                currentTickets = state.game.current_tickets
+                minePerHour = state.game.mine_per_hour
+                maxEnergy = state.game.max_energy
+                coinsPerTap = state.game.coins_per_tap
+                energyPerSec = state.game.energy_per_sec
+                tasks = state.tasks
+
+                metrics.set_account(session_name, auth_data["game"])
+                metrics.coins_earned.inc(mined, source="mine")
+                self.log.success("Balance: <green>{}</green> (Mined +<green>{}</green>) | Energy: " + self.gen_energy_line(currentEnergy, maxEnergy, 25, 75) + " | Tickets: <yellow>{}</yellow>", currentCoins, mined, currentEnergy, maxEnergy, currentTickets)
+
+                # Check and claim tasks as their check delays pass
+                if tasks or self.tasks:
+                    self.log.step("Processing {} available tasks", len(tasks))
+                    with tracer.span("process_tasks", session_name, tasks=len(tasks)):
                         await self.process_tasks(session, tasks)
 
-                    # Sort upgrades for auto-upgrading
-                    print(
-                        f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{session_name}]{Style.RESET_ALL} | Sorting upgrades with dynamic algorithm")
+                # Sort upgrades for auto-upgrading
+                self.log.step("Sorting upgrades with dynamic algorithm")
+                with tracer.span("sort_upgrades", session_name):
                     g_upgrades = await self.sort_upgrades(upgrades, friendsCount, shared_config, currentCoins,
                                                           minePerHour)
 
-                    # Calculate taps based on energy and coins per tap
-                    print(
-                        f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{session_name}]{Style.RESET_ALL} | Checking if tapping is needed (energy: {currentEnergy}, min save: {MIN_SAVE_ENERGY})")
-                    if currentEnergy > MIN_SAVE_ENERGY:
-                        tap_count = TAP_COUNT
-
-                        # Если включена опция максимального использования энергии
-                        if USE_MAX_ENERGY_TAPS:
-                            # Используем всю доступную энергию, учитывая минимальный запас
-                            tap_count = int((currentEnergy - MIN_SAVE_ENERGY) / coinsPerTap)
-                            print(
-                                f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{session_name}]{Style.RESET_ALL} | Using maximum energy taps: {tap_count}")
-                        elif RANDOM_TAP_COUNT:
-                            try:
-                                tap_range = RANDOM_TAP_COUNT.split("-")
-                                tap_count = random.randint(int(tap_range[0]), int(tap_range[1]))
-                                print(
-                                    f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{session_name}]{Style.RESET_ALL} | Random tap count selected: {tap_count} from range {RANDOM_TAP_COUNT}")
-                            except Exception as e:
-                                print(
-                                    f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.RED}[{session_name}]{Style.RESET_ALL} | Error parsing random_tap_count: {e}")
-                                print(
-                                    f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{session_name}]{Style.RESET_ALL} | Using default tap count: {tap_count}")
-
-                        print(
-                            f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{session_name}]{Style.RESET_ALL} | Final tap count: {tap_count}")
-
-                        if tap_count > 0:
-                            # Limit taps to available energy
-                            taps = min(tap_count, int(currentEnergy / coinsPerTap))
-                            new_energy = max(0, currentEnergy - taps * coinsPerTap)
-                            print(
-                                f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{session_name}]{Style.RESET_ALL} | Will perform {taps} taps, energy will drop from {currentEnergy} to {new_energy}")
-
-                            # Всегда используем массовые тапы для максимальной эффективности
-                            print(
-                                f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{session_name}]{Style.RESET_ALL} | Using bulk taps (count: {taps})")
+                # Calculate taps based on energy and coins per tap
+                self.log.step("Checking if tapping is needed (energy: {}, min save: {})", currentEnergy, self.settings.min_save_energy)
+                if currentEnergy > self.settings.min_save_energy:
+                    tap_count = self.settings.tap_count
+
+                    # Если включена опция максимального использования энергии
+                    if self.settings.use_max_energy_taps:
+                        # Используем всю доступную энергию, учитывая минимальный запас
+                        tap_count = int((currentEnergy - self.settings.min_save_energy) / coinsPerTap)
+                        self.log.step("Using maximum energy taps: {}", tap_count)
+                    elif self.settings.random_tap_count:
+                        tap_count = random.randint(*self.settings.random_tap_count)
+                        self.log.step("Random tap count selected: {} from range {}-{}", tap_count,
+                                      *self.settings.random_tap_count)
+
+                    self.log.step("Final tap count: {}", tap_count)
+
+                    if tap_count > 0:
+                        # Limit taps to available energy
+                        taps = min(tap_count, int(currentEnergy / coinsPerTap))
+                        new_energy = max(0, currentEnergy - taps * coinsPerTap)
+                        self.log.step("Will perform {} taps, energy will drop from {} to {}", taps, currentEnergy, new_energy)
+
+                        # Всегда используем массовые тапы для максимальной эффективности
+                        self.log.step("Using bulk taps (count: {})", taps)
+                        with tracer.span("tap_sync", session_name, taps=taps):
                             sync_data = await self.sync_gdata(session, new_energy, taps)
 
-                            if sync_data is not None:
-                                gained_coins = taps * coinsPerTap
-                                currentCoins = sync_data['currentCoins']
-                                print(
-                                    f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.GREEN}[{session_name}]{Style.RESET_ALL} | "
-                                    f"Successful qlyuk! | Energy: {self.gen_energy_line(new_energy, maxEnergy, 25, 75)} | "
-                                    f"Balance: {Fore.GREEN}{currentCoins}{Style.RESET_ALL} (+{Fore.GREEN}{gained_coins}{Style.RESET_ALL})")
-                            else:
-                                print(
-                                    f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.RED}[{session_name}]{Style.RESET_ALL} | Tapping failed, no valid response data")
+                        if sync_data is not None:
+                            self.auth.apply_sync(sync_data)
+                            gained_coins = taps * coinsPerTap
+                            currentCoins = sync_data['currentCoins']
+                            metrics.set_account(session_name, sync_data)
+                            metrics.coins_earned.inc(gained_coins, source="taps")
+                            self.log.success("Successful qlyuk! | Energy: " + self.gen_energy_line(new_energy, maxEnergy, 25, 75) + " | Balance: <green>{}</green> (+<green>{}</green>)", new_energy, maxEnergy, currentCoins, gained_coins)
                         else:
-                            print(
-                                f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{session_name}]{Style.RESET_ALL} | No taps to perform (tap_count = {tap_count})")
+                            self.log.error("Tapping failed, no valid response data")
                     else:
-                        print(
-                            f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{session_name}]{Style.RESET_ALL} | Not enough energy for taps: {currentEnergy} <= {MIN_SAVE_ENERGY}")
-
-                    # Handle auto-upgrades if enabled
-                    if USE_AUTO_UPGRADES:
-                        print(
-                            f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{session_name}]{Style.RESET_ALL} | Auto-upgrades enabled, processing {len(g_upgrades)} available upgrades")
-                        upgrade_delay = random.randint(8, 34)
-                        print(
-                            f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{session_name}]{Style.RESET_ALL} | Waiting {upgrade_delay} seconds before upgrades")
+                        self.log.step("No taps to perform (tap_count = {})", tap_count)
+                else:
+                    self.log.step("Not enough energy for taps: {} <= {}", currentEnergy, self.settings.min_save_energy)
+
+                # Handle auto-upgrades if enabled
+                if self.settings.use_auto_upgrades:
+                    self.log.step("Auto-upgrades enabled, processing {} available upgrades", len(g_upgrades))
+                    upgrade_delay = random.randint(8, 34)
+                    self.log.step("Waiting {} seconds before upgrades", upgrade_delay)
+                    with tracer.span("upgrade_delay", session_name):
                         await asyncio.sleep(upgrade_delay)
 
-                        upgrade_count = 0
-                        for u in g_upgrades:
-                            if u['id'] == 'coinsPerTap':
-                                print(
-                                    f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{session_name}]{Style.RESET_ALL} | Skipping coinsPerTap upgrade")
-                                continue
-
-                            if u['id'] == 'restoreEnergy':
-                                if 'upgradedAt' not in u or time.time() - u['upgradedAt'] >= 3600:
-                                    print(
-                                        f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{session_name}]{Style.RESET_ALL} | restoreEnergy upgrade available (last upgrade > 1 hour)")
-                                    pass
-                                else:
-                                    print(
-                                        f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{session_name}]{Style.RESET_ALL} | Skipping restoreEnergy upgrade (too soon)")
-                                    continue
-
-                            # Check if we can afford the upgrade
-                            if 'next' in u:
-                                next_price = u['next']['price']
-                                if next_price > currentCoins:
-                                    print(
-                                        f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{session_name}]{Style.RESET_ALL} | Cannot afford upgrade {u['id']} - price: {next_price}, balance: {currentCoins}")
-                                    continue
-                                if MIN_SAVE_BALANCE >= currentCoins - next_price:
-                                    print(
-                                        f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{session_name}]{Style.RESET_ALL} | Not enough balance after upgrade {u['id']} - remain: {currentCoins - next_price}, min save: {MIN_SAVE_BALANCE}")
-                                    continue
-                                print(
-                                    f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{session_name}]{Style.RESET_ALL} | Attempting to buy upgrade {u['id']} for {next_price} coins")
+                    # Purchases update the plan in place, so newly unlocked upgrades join this cycle
+                    plan = IncrementalPlan(self.catalog,
+                                           [self.catalog.by_id[u['id']] for u in g_upgrades
+                                            if u['id'] in self.catalog.by_id],
+                                           friendsCount, currentCoins, minePerHour)
+                    upgrade_count = 0
+                    for u in plan:
+                        if u['id'] == 'coinsPerTap':
+                            self.log.step("Skipping coinsPerTap upgrade")
+                            continue
+
+                        if u['id'] == 'restoreEnergy':
+                            if 'upgradedAt' not in u or time.time() - u['upgradedAt'] >= 3600:
+                                self.log.step("restoreEnergy upgrade available (last upgrade > 1 hour)")
+                                pass
                             else:
-                                print(
-                                    f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{session_name}]{Style.RESET_ALL} | Upgrade {u['id']} has no next level data")
+                                self.log.step("Skipping restoreEnergy upgrade (too soon)")
                                 continue
 
-                            # Try to buy the upgrade
-                            r_updates = await self.sync_upgrade(session, u['id'])
-                            if r_updates is None:
-                                print(
-                                    f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.RED}[{session_name}]{Style.RESET_ALL} | Failed to buy upgrade {u['id']}")
+                        # Check if we can afford the upgrade
+                        if 'next' in u:
+                            next_price = u['next']['price']
+                            if next_price > currentCoins:
+                                self.log.step("Cannot afford upgrade {} - price: {}, balance: {}", u['id'], next_price, currentCoins)
                                 continue
-
-                            if isinstance(r_updates, str) and "Слишком рано для улучшения" in r_updates:
-                                print(
-                                    f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{session_name}]{Style.RESET_ALL} | Too early for upgrade {u['id']}: {r_updates}")
-                                continue
-
-                            # Update variables from response
-                            try:
-                                currentCoins = r_updates['currentCoins']
-                                upgrade_mine_diff = r_updates['minePerHour'] - minePerHour
-                                print(
-                                    f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.GREEN}[{session_name}]{Style.RESET_ALL} | "
-                                    f"Successful update! | Mining: {Fore.GREEN}{minePerHour}{Style.RESET_ALL} "
-                                    f"(+{Fore.GREEN}{upgrade_mine_diff}{Style.RESET_ALL}) | "
-                                    f"Balance: {Fore.GREEN}{currentCoins}{Style.RESET_ALL}")
-
-                                # Update variables for next iteration
-                                minePerHour = r_updates['minePerHour']
-                                maxEnergy = r_updates['maxEnergy']
-                                currentEnergy = r_updates['currentEnergy']
-                                upgrade_count += 1
-                            except KeyError as e:
-                                print(
-                                    f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.RED}[{session_name}]{Style.RESET_ALL} | Missing key in upgrade response: {e}")
+                            if self.settings.min_save_balance >= currentCoins - next_price:
+                                self.log.step("Not enough balance after upgrade {} - remain: {}, min save: {}", u['id'], currentCoins - next_price, self.settings.min_save_balance)
                                 continue
+                            self.log.step("Attempting to buy upgrade {} for {} coins", u['id'], next_price)
+                        else:
+                            self.log.step("Upgrade {} has no next level data", u['id'])
+                            continue
 
-                            # Sleep a bit between upgrades
-                            await asyncio.sleep(random.choice(range(1, 3)))
-
-                        print(
-                            f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.GREEN}[{session_name}]{Style.RESET_ALL} | Completed upgrades: {upgrade_count} out of {len(g_upgrades)} available")
-                    else:
-                        print(
-                            f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.YELLOW}[{session_name}]{Style.RESET_ALL} | Auto-upgrades disabled")
-
-                    # Calculate sleep time before next loop
-                    sleep_time = min(10800, int(maxEnergy / energyPerSec) if energyPerSec > 0 else 10800)  # 3 hours max
-                    print(f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.GREEN}[{session_name}]{Style.RESET_ALL} | "
-                          f"Sleep {Fore.CYAN}{sleep_time}{Style.RESET_ALL} seconds")
-
-                    # Sleep before next cycle
-                    await asyncio.sleep(sleep_time)
-
-            except Exception as e:
-                print(f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] | {Fore.RED}[{session_name}]{Style.RESET_ALL} | "
-                      f"Error during farming process: {str(e)}")
-                # Wait before retrying
-                await asyncio.sleep(300)
-
-        return
\ No newline at end of file
+                        # Try to buy the upgrade
+                        with tracer.span("buy_upgrade", session_name, upgrade=u['id']):
+                            r_updates = await self.sync_upgrade(session, u['id'])
+                        if r_updates is None:
+                            self.log.error("Failed to buy upgrade {}", u['id'])
+                            continue
+
+                        if isinstance(r_updates, str) and "Слишком рано для улучшения" in r_updates:
+                            self.log.step("Too early for upgrade {}: {}", u['id'], r_updates)
+                            continue
+
+                        # Update variables from response
+                        try:
+                            currentCoins = r_updates['currentCoins']
+                            upgrade_mine_diff = r_updates['minePerHour'] - minePerHour
+                            self.log.success("Successful update! | Mining: <green>{}</green> (+<green>{}</green>) | Balance: <green>{}</green>", minePerHour, upgrade_mine_diff, currentCoins)
+
+                            # Update variables for next iteration
+                            minePerHour = r_updates['minePerHour']
+                            maxEnergy = r_updates['maxEnergy']
+                            currentEnergy = r_updates['currentEnergy']
+                            self.auth.apply_upgrade(u['id'], r_updates)
+                            metrics.set_account(session_name, r_updates)
+                            plan.apply_purchase(u['id'], r_updates)
+                            upgrade_count += 1
+                        except KeyError as e:
+                            self.log.error("Missing key in upgrade response: {}", e)
+                            continue
+
+                        # Sleep a bit between upgrades
+                        await asyncio.sleep(random.choice(range(1, 3)))
+
+                    self.log.success("Completed upgrades: {} out of {} available", upgrade_count, len(g_upgrades))
+                else:
+                    self.log.step("Auto-upgrades disabled")
+
+                # Calculate sleep time before next loop
+                sleep_time = min(10800, int(maxEnergy / energyPerSec) if energyPerSec > 0 else 10800)  # 3 hours max
+                # Wake up early when a task becomes due before the energy is full
+                sleep_time = self.tasks.wake_delay(sleep_time)
+                self.log.success("Sleep <cyan>{}</cyan> seconds", sleep_time)
+
+                self.log.debug("HTTP pool stats: {}", get_http_pool().stats())
+                self.log.debug("Rate limit stats: {}", get_rate_limiter().stats())
+
+                metrics.observe_cycle(started, "ok")
+                self.error_streak = 0
+                return sleep_time
+
+        except CircuitOpenError as e:
+            # The API is down for every account; the kept session stays valid for when it is back
+            self.log.warning("Skipping cycle: {}", str(e))
+            self.last_error = str(e)
+            metrics.observe_cycle(started, "circuit_open")
+            # Spread the wake-ups so the accounts do not all return together after the probe
+            return int(e.retry_in + random.uniform(1, max(2.0, e.retry_in)))
+        except Exception as e:
+            self.log.error("Error during farming process: {}", str(e))
+            self.last_error = str(e)
+            self.auth.invalidate(f"{session_name} | farming error")
+            metrics.observe_cycle(started, "error")
+            # Wait before retrying, longer after each failed cycle in a row
+            self.error_streak += 1
+            delay = min(ERROR_RETRY_MAX, ERROR_RETRY_BASE * 2 ** (self.error_streak - 1))
+            return int(random.uniform(delay / 2, delay))
@@ -0,0 +1,40 @@
+from urllib.parse import urljoin, urlparse
+
+from bot.utils import load_config
+
+# Load configurations from the .conf file
+config = load_config()
+
+# Extract game server settings from the configuration
+API_BASE_URL = config.get("api", "base_url", fallback="https://api.qlyuker.io")
+WEB_URL = config.get("api", "web_url", fallback="https://qlyuker.io/")
+
+
+def configure(api_base_url: str = None, web_url: str = None):
+    """Points all requests at another game server, such as the local stand-in in benchmarks/mock_api.py."""
+    global API_BASE_URL, WEB_URL
+    if api_base_url is not None:
+        API_BASE_URL = api_base_url
+    if web_url is not None:
+        WEB_URL = web_url
+
+
+def api_url(path: str) -> str:
+    """Absolute URL of an API endpoint, e.g. api_url("/game/sync")."""
+    return f"{API_BASE_URL.rstrip('/')}/{path.lstrip('/')}"
+
+
+def api_host() -> str:
+    """Host header value of the API server."""
+    return urlparse(API_BASE_URL).netloc
+
+
+def web_url(path: str = "") -> str:
+    """Absolute URL on the game's website; relative bundle paths are resolved against it."""
+    return urljoin(WEB_URL, path)
+
+
+def web_origin() -> str:
+    """Origin header value of the game's website."""
+    parsed = urlparse(WEB_URL)
+    return f"{parsed.scheme}://{parsed.netloc}"
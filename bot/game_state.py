@@ -0,0 +1,98 @@
+import json
+from typing import Dict, List, Optional
+
+try:
+    import orjson
+except ImportError:  # optional; the standard library parser is used without it
+    orjson = None
+
+# Name of the JSON parser in use, for logs and benchmarks
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+
+# Sections of the auth/start payload the farming cycle reads; the rest (leaderboard, tournaments,
+# shop, ...) is dropped right after decoding so it is neither kept between cycles nor persisted
+AUTH_SECTIONS = ("app", "user", "friends", "game", "upgrades", "sharedConfig", "tasks")
+
+# Attribute of Game -> key of the game section
+GAME_FIELDS = (
+    ("total_coins", "totalCoins"),
+    ("current_coins", "currentCoins"),
+    ("current_energy", "currentEnergy"),
+    ("max_energy", "maxEnergy"),
+    ("current_tickets", "currentTickets"),
+    ("mine_per_hour", "minePerHour"),
+    ("coins_per_tap", "coinsPerTap"),
+    ("energy_per_sec", "energyPerSec"),
+)
+
+
+def loads(raw):
+    """Parses JSON from bytes or str with the fastest available backend."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def decode_body(raw: bytes):
+    """Parses a response body once: its JSON value, or its text when the body is not JSON."""
+    try:
+        return loads(raw)
+    except ValueError:
+        return raw.decode("utf-8", errors="replace")
+
+
+async def read_body(response):
+    """Reads and decodes the body of an aiohttp response in a single pass."""
+    return decode_body(await response.read())
+
+
+def slim_auth(data: Dict) -> Dict:
+    """Keeps only the sections of an auth/start payload that the farming cycle uses."""
+    return {key: data[key] for key in AUTH_SECTIONS if key in data}
+
+
+class Game:
+    """Numeric game state of an account, converted once from the game section."""
+    __slots__ = tuple(attribute for attribute, _ in GAME_FIELDS)
+
+    def __init__(self, game: Dict):
+        for attribute, key in GAME_FIELDS:
+            setattr(self, attribute, int(game[key]))
+
+    def __repr__(self):
+        return f"Game(coins={self.current_coins}, energy={self.current_energy}/{self.max_energy})"
+
+
+class Task:
+    """One entry of the tasks section, with the fields process_tasks needs."""
+    __slots__ = ("id", "kind", "completed", "reward", "time", "check_delay")
+
+    def __init__(self, task: Dict):
+        meta = task.get("meta") or {}
+        self.id = task.get("id")
+        self.kind = task.get("kind")
+        self.completed = bool(task.get("completed", False))
+        self.reward = meta.get("reward", 0)
+        self.time: Optional[int] = task.get("time")
+        self.check_delay: Optional[int] = meta.get("checkDelay")
+
+    def __repr__(self):
+        return f"Task({self.id!r}, kind={self.kind!r}, completed={self.completed})"
+
+
+class GameState:
+    """Typed view of an auth/start (or resumed) payload for one farming cycle.
+
+    Upgrades stay the payload's own dict: the kept session updates it after purchases and
+    UpgradeCatalog indexes it into UpgradeRecords once per cycle.
+    """
+    __slots__ = ("game", "upgrades", "shared_config", "friends_count", "uid", "mined", "tasks")
+
+    def __init__(self, auth_data: Dict):
+        self.game = Game(auth_data["game"])
+        self.upgrades: Dict = auth_data["upgrades"]
+        self.shared_config: Dict = auth_data.get("sharedConfig", {})
+        self.friends_count: int = auth_data["friends"].get("friendsCountWithYandexID", 0)
+        self.uid = auth_data["user"]["uid"]
+        self.mined = int(auth_data["app"]["mined"])
+        self.tasks: List[Task] = [Task(task) for task in auth_data.get("tasks", [])]
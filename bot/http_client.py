@@ -0,0 +1,142 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import aiohttp
+from aiohttp.abc import AbstractCookieJar
+from loguru import logger
+from bot.utils import load_config
+
+# Load configurations from the .conf file
+config = load_config()
+
+# Extract HTTP pool settings from the configuration
+POOL_LIMIT = config.getint("http", "pool_limit", fallback=100)
+POOL_LIMIT_PER_HOST = config.getint("http", "pool_limit_per_host", fallback=30)
+DNS_CACHE_TTL = config.getint("http", "dns_cache_ttl", fallback=300)
+KEEPALIVE_TIMEOUT = config.getint("http", "keepalive_timeout", fallback=60)
+
+
+class HttpPool:
+    """Long-lived aiohttp connection pool shared by all FarmBot instances.
+
+    Accounts get their own lightweight ClientSession (and cookie jar) on top of the shared
+    connector, so keep-alive connections are pooled while login cookies stay per account.
+    """
+
+    def __init__(self, limit: int = POOL_LIMIT, limit_per_host: int = POOL_LIMIT_PER_HOST,
+                 dns_cache_ttl: int = DNS_CACHE_TTL, keepalive_timeout: int = KEEPALIVE_TIMEOUT):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self._session = None
+        self._connector = None
+        self._trace_config = None
+        self.requests = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.dns_hits = 0
+        self.dns_misses = 0
+
+    async def _on_request_start(self, session, ctx, params):
+        self.requests += 1
+
+    async def _on_connection_create(self, session, ctx, params):
+        self.connections_created += 1
+
+    async def _on_connection_reuse(self, session, ctx, params):
+        self.connections_reused += 1
+
+    async def _on_dns_hit(self, session, ctx, params):
+        self.dns_hits += 1
+
+    async def _on_dns_miss(self, session, ctx, params):
+        self.dns_misses += 1
+
+    def connector(self) -> aiohttp.TCPConnector:
+        """Returns the shared connector, creating it on first use inside the running loop."""
+        if self._connector is None or self._connector.closed:
+            self._trace_config = aiohttp.TraceConfig()
+            self._trace_config.on_request_start.append(self._on_request_start)
+            self._trace_config.on_connection_create_end.append(self._on_connection_create)
+            self._trace_config.on_connection_reuseconn.append(self._on_connection_reuse)
+            self._trace_config.on_dns_cache_hit.append(self._on_dns_hit)
+            self._trace_config.on_dns_cache_miss.append(self._on_dns_miss)
+
+            self._connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                use_dns_cache=True,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            logger.info(f"HTTP pool opened (limit={self.limit}, per_host={self.limit_per_host}, "
+                        f"dns_ttl={self.dns_cache_ttl}s)")
+        return self._connector
+
+    def new_session(self, cookie_jar: AbstractCookieJar = None) -> aiohttp.ClientSession:
+        """Creates a ClientSession on the shared connector; closing it keeps the pool open."""
+        connector = self.connector()
+        return aiohttp.ClientSession(connector=connector, connector_owner=False, cookie_jar=cookie_jar,
+                                     trace_configs=[self._trace_config])
+
+    def session(self) -> aiohttp.ClientSession:
+        """Returns the shared cookie-less session for requests that carry no account state."""
+        if self._session is None or self._session.closed:
+            self._session = self.new_session(aiohttp.DummyCookieJar())
+        return self._session
+
+    @asynccontextmanager
+    async def acquire(self, cookie_jar: AbstractCookieJar = None):
+        """Yields a session for one account cycle; with a cookie jar the session is private to it."""
+        if cookie_jar is None:
+            yield self.session()
+            return
+        session = self.new_session(cookie_jar)
+        try:
+            yield session
+        finally:
+            await session.close()
+
+    def stats(self) -> dict:
+        """Returns connection reuse counters for the pool."""
+        acquired = self.connections_created + self.connections_reused
+        return {
+            "requests": self.requests,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "reuse_ratio": self.connections_reused / acquired if acquired else 0.0,
+            "dns_hits": self.dns_hits,
+            "dns_misses": self.dns_misses,
+        }
+
+    async def close(self):
+        """Closes the shared session and releases all pooled connections."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        if self._connector is not None and not self._connector.closed:
+            await self._connector.close()
+            # Give SSL transports a moment to shut down cleanly
+            await asyncio.sleep(0.25)
+            logger.info(f"HTTP pool closed | {self.stats()}")
+        self._session = None
+        self._connector = None
+
+
+_pool = None
+
+
+def get_http_pool() -> HttpPool:
+    """Returns the process-wide HTTP pool."""
+    global _pool
+    if _pool is None:
+        _pool = HttpPool()
+    return _pool
+
+
+async def close_http_pool():
+    """Closes the process-wide HTTP pool if it was opened."""
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
@@ -0,0 +1,183 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import Optional
+
+import aiohttp
+from loguru import logger
+from bot.utils import load_config
+from bot.endpoints import web_url
+from bot.http_client import get_http_pool
+from bot.retry import send_request
+from bot.klyuk_extract import JS_URL_PATTERN, KLYUK_PATTERN, DEFAULT_CHUNK_SIZE, search_stream
+
+# Load configurations from the .conf file
+config = load_config()
+
+# Extract Klyuk cache settings from the configuration
+KLYUK_CACHE_TTL = config.getint("klyuk", "cache_ttl", fallback=1800)
+KLYUK_CACHE_FILE = config.get("klyuk", "cache_file", fallback="cache/klyuk.json")
+# Minimum age of a cached code before a failing request may invalidate it
+KLYUK_MIN_INVALIDATE_AGE = config.getint("klyuk", "min_invalidate_age", fallback=60)
+
+# Statuses from auth/start and game/sync that point to a stale Klyuk header
+STALE_HEADER_STATUSES = (400, 401, 403)
+
+BROWSER_UA = "Mozilla/5.0 (Linux; Android 15; K) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/135.0.7049.100 Mobile Safari/537.36"
+
+
+async def fetch_bundle_url(session: aiohttp.ClientSession) -> str:
+    """Fetches the game's web page and returns the absolute URL of the index-*.js bundle."""
+    response = await send_request(session, "GET", web_url(), headers={"User-Agent": BROWSER_UA})
+    async with response:
+        if response.status != 200:
+            raise Exception(f"Failed to fetch main page, status: {response.status}")
+
+        js_url = await search_stream(response.content.iter_chunked(DEFAULT_CHUNK_SIZE), JS_URL_PATTERN)
+        if js_url is None:
+            raise Exception("JS file URL not found in HTML")
+        return web_url(js_url)
+
+
+async def fetch_bundle_klyuk(session: aiohttp.ClientSession, js_url: str) -> str:
+    """Downloads the JS bundle and extracts the Klyuk binary code from it."""
+    response = await send_request(session, "GET", js_url, headers={"User-Agent": BROWSER_UA})
+    async with response:
+        if response.status != 200:
+            raise Exception(f"Failed to fetch JS file, status: {response.status}")
+
+        # Stops reading the bundle as soon as the code is found; the connection is released on exit
+        klyuk_code = await search_stream(response.content.iter_chunked(DEFAULT_CHUNK_SIZE), KLYUK_PATTERN)
+        if klyuk_code is None:
+            raise Exception("Klyuk code not found in JS file")
+        return klyuk_code
+
+
+class KlyukCache:
+    """Process-wide, single-flight cache of the bundle URL and the Klyuk code keyed by bundle URL."""
+
+    def __init__(self, ttl: int = KLYUK_CACHE_TTL, cache_file: str = KLYUK_CACHE_FILE,
+                 min_invalidate_age: int = KLYUK_MIN_INVALIDATE_AGE):
+        self.ttl = ttl
+        self.cache_file = cache_file
+        self.min_invalidate_age = min_invalidate_age
+        self.js_url = None
+        self.checked_at = 0.0
+        self.codes = {}
+        self._inflight: Optional[asyncio.Future] = None
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    def load(self):
+        """Restores the cache from disk so restarts start warm."""
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.js_url = data.get("js_url")
+            self.checked_at = float(data.get("checked_at", 0))
+            self.codes = dict(data.get("codes", {}))
+        except (OSError, ValueError) as error:
+            logger.warning(f"Failed to load Klyuk cache from {self.cache_file}: {error}")
+
+    def save(self):
+        """Writes the cache to disk atomically."""
+        if not self.cache_file:
+            return
+        tmp_file = None
+        try:
+            directory = os.path.dirname(self.cache_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # A temporary file of its own, so worker processes saving at once never replace each
+            # other's half-written output
+            with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=directory or ".", delete=False,
+                                             prefix=f"{os.path.basename(self.cache_file)}.", suffix=".tmp") as f:
+                tmp_file = f.name
+                json.dump({"js_url": self.js_url, "checked_at": self.checked_at, "codes": self.codes}, f)
+            os.replace(tmp_file, self.cache_file)
+        except OSError as error:
+            logger.warning(f"Failed to save Klyuk cache to {self.cache_file}: {error}")
+            if tmp_file is not None and os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
+    def peek(self) -> Optional[str]:
+        """Returns the cached code if it is still fresh, otherwise None."""
+        if self.js_url in self.codes and time.time() - self.checked_at < self.ttl:
+            return self.codes[self.js_url]
+        return None
+
+    async def get(self) -> str:
+        """Returns the Klyuk code, collapsing concurrent refreshes into one fetch."""
+        code = self.peek()
+        if code is not None:
+            self.hits += 1
+            return code
+
+        self.misses += 1
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._refresh())
+            self._inflight.add_done_callback(self._clear_inflight)
+        return await asyncio.shield(self._inflight)
+
+    def _clear_inflight(self, future: asyncio.Future):
+        self._inflight = None
+        # Mark the exception as retrieved when no caller is left waiting on it
+        if not future.cancelled():
+            future.exception()
+
+    async def _refresh(self) -> str:
+        # Shared by every waiting account, so it runs on the pool's shared session rather than on
+        # the private session of the account that asked first, which closes with its cycle
+        session = get_http_pool().session()
+        js_url = await fetch_bundle_url(session)
+        if js_url not in self.codes:
+            logger.info(f"Klyuk cache: downloading bundle {js_url}")
+            self.codes = {js_url: await fetch_bundle_klyuk(session, js_url)}
+        self.js_url = js_url
+        self.checked_at = time.time()
+        self.save()
+        return self.codes[js_url]
+
+    def invalidate(self, klyuk_code: str = None):
+        """Drops the cached code after a stale-header failure.
+
+        Only the code that was actually sent is invalidated, and only once it is older than
+        min_invalidate_age, so a burst of failing accounts triggers a single re-download.
+        """
+        if self.js_url not in self.codes:
+            return
+        if klyuk_code is not None and self.codes[self.js_url] != klyuk_code:
+            return
+        if time.time() - self.checked_at < self.min_invalidate_age:
+            return
+        logger.warning(f"Klyuk cache: invalidating code for {self.js_url}")
+        self.codes.pop(self.js_url, None)
+        self.checked_at = 0.0
+        self.save()
+
+    def stats(self) -> dict:
+        """Returns hit and miss counters for the cache."""
+        return {"hits": self.hits, "misses": self.misses, "js_url": self.js_url}
+
+
+_cache = None
+
+
+def get_klyuk_cache() -> KlyukCache:
+    """Returns the process-wide Klyuk cache."""
+    global _cache
+    if _cache is None:
+        _cache = KlyukCache()
+    return _cache
+
+
+def set_klyuk_cache(cache: KlyukCache) -> KlyukCache:
+    """Replaces the process-wide Klyuk cache, e.g. with one that is never written to disk."""
+    global _cache
+    _cache = cache
+    return cache
@@ -0,0 +1,43 @@
+import re
+from typing import AsyncIterator, Optional
+
+# Precompiled byte patterns, so chunks are searched without decoding them
+JS_URL_PATTERN = re.compile(rb'src="([^"]*/assets/index-[^"]+\.js)"')
+KLYUK_PATTERN = re.compile(rb'\.set\("Klyuk",\s*"([01]+)"\)')
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+# Longest match that is guaranteed to be found across a chunk boundary
+DEFAULT_OVERLAP = 4096
+
+
+class StreamSearcher:
+    """Searches a byte stream chunk by chunk, keeping only a small overlap window between chunks."""
+
+    def __init__(self, pattern: re.Pattern, overlap: int = DEFAULT_OVERLAP):
+        self.pattern = pattern
+        self.overlap = overlap
+        self.tail = b""
+        self.bytes_read = 0
+
+    def feed(self, chunk: bytes) -> Optional[str]:
+        """Feeds the next chunk and returns the first capture group once the pattern matches."""
+        self.bytes_read += len(chunk)
+        window = self.tail + chunk
+        match = self.pattern.search(window)
+        if match:
+            self.tail = b""
+            return match.group(1).decode("ascii")
+        # Any match of at most `overlap` bytes that starts in this window is still fully retained
+        self.tail = window[-self.overlap:]
+        return None
+
+
+async def search_stream(chunks: AsyncIterator[bytes], pattern: re.Pattern,
+                        overlap: int = DEFAULT_OVERLAP) -> Optional[str]:
+    """Returns the first capture group of `pattern` in the stream, stopping as soon as it matches."""
+    searcher = StreamSearcher(pattern, overlap)
+    async for chunk in chunks:
+        result = searcher.feed(chunk)
+        if result is not None:
+            return result
+    return None
@@ -1,17 +1,22 @@
 import os
+import sys
 import time
 import asyncio
-import glob
 import threading
 import random
 from bot.utils import load_config, load_version
-from colorama import init, Fore, Style
 from loguru import logger
-from pyrogram import Client
+from bot.log import setup_logging
 from bot.core import FarmBot
-
-# Initialize colorama for colored console output
-init()
+from bot.http_client import close_http_pool, get_http_pool
+from bot.metrics import METRICS_ENABLED, METRICS_PORT, get_metrics
+from bot.tracing import close_tracer
+from bot.state_store import STATE_ENABLED, get_state_store
+from bot.session_registry import SESSIONS_DIR, WATCH_INTERVAL, SessionRegistry, list_session_names
+from bot.rate_limit import get_rate_limiter
+from bot.retry import get_retry_registry
+from bot.telegram_coordinator import get_telegram_coordinator
+from bot.workers import WORKER_STATS_INTERVAL, supervise_workers
 
 # Load version from the .ver file
 ver = load_version()
@@ -22,18 +27,14 @@ config = load_config()
 # Extract version
 VER = ver.get("version", "v")
 
-# Extract log settings from the configuration
-LOG_FILE = config.get("settings", "log_file")
-LOG_ROTATION = config.get("settings", "log_rotation")
-LOG_RETENTION = config.get("settings", "log_retention")
-LOG_LEVEL = config.get("settings", "log_level")
+# Headless mode skips the banner and the console title spinner
+HEADLESS = config.getboolean("settings", "headless", fallback=False)
 
-# Configure the logger
-logger.remove()
-logger.add(LOG_FILE, rotation=LOG_ROTATION, retention=LOG_RETENTION, level=LOG_LEVEL)
+# Configure the console and file logs
+setup_logging()
 
 # Banner to display at the start
-BANNER = f"""{Style.DIM}{Fore.MAGENTA}
+BANNER = """
     █████   ██▓   ▓██   ██▓ █    ██  ██ ▄█▀▓█████  ██▀███   ▄▄▄▄    ▒█████  ▄▄▄█████▓
   ▒██▓  ██▒▓██▒    ▒██  ██▒ ██  ▓██▒ ██▄█▒ ▓█   ▀ ▓██ ▒ ██▒▓█████▄ ▒██▒  ██▒▓  ██▒ ▓▒
   ▒██▒  ██░▒██░     ▒██ ██░▓██  ▒██░▓███▄░ ▒███   ▓██ ░▄█ ▒▒██▒ ▄██▒██░  ██▒▒ ▓██░ ▒░
@@ -48,13 +49,18 @@ BANNER = f"""{Style.DIM}{Fore.MAGENTA}
 
 
 def dun_title():
+    """Animates the console window title; `title` only exists on Windows."""
     while True:
         for x in ["\\", "∣", "/", "–"]:
             time.sleep(0.2)
             os.system(f"title qlyuker_bot {x} v{VER} {x} github.com/bitwiresys/qlyuker_bot")
 def display_banner():
     """Display the banner with a small delay for each line for effect."""
-    threading.Thread(target=dun_title, args=()).start()
+    from colorama import init, Fore, Style
+    # Initialize colorama for colored console output
+    init()
+    if os.name == "nt":
+        threading.Thread(target=dun_title, args=(), daemon=True).start()
     for line in BANNER.split("\n"):
         print(Style.DIM + Fore.MAGENTA + line + Style.RESET_ALL)
         time.sleep(0.2)
@@ -67,39 +73,108 @@ def display_banner():
 
 def get_session_names():
     """Return a list of session names from the 'sessions/' directory."""
-    return [
-        os.path.splitext(os.path.basename(file))[0]
-        for file in glob.glob("sessions/*.session")
-    ]
+    return sorted(list_session_names())
 
 
-async def start_farm_process(session_name):
-    """Initialize the Telegram client and start the farming process."""
-    api_id = config.getint("telegram", "api_id")
-    api_hash = config.get("telegram", "api_hash")
+class LazyClient:
+    """Pyrogram client of a session, created on first use.
 
-    # Initialize the Telegram client with the session
-    client = Client(session_name, api_id=api_id, api_hash=api_hash,workdir="sessions/")
-    farm_bot = FarmBot(client,random.choice(["ios", "android"]))
+    Pyrogram is only imported when a session first needs Telegram, so startup does not wait for it
+    and sessions resumed from the state store may never load it. The session name and workdir are
+    available without creating the client.
+    """
+
+    def __init__(self, name: str, workdir: str = "sessions/"):
+        self.name = name
+        self.workdir = workdir
+        self._client = None
 
-    # Start the farming process
-    await farm_bot.farming()
+    def get(self):
+        """Returns the Pyrogram client, creating it on the first call."""
+        if self._client is None:
+            from pyrogram import Client
+            api_id = config.getint("telegram", "api_id")
+            api_hash = config.get("telegram", "api_hash")
+            self._client = Client(self.name, api_id=api_id, api_hash=api_hash, workdir=self.workdir)
+        return self._client
 
+    def __getattr__(self, item):
+        # Private names are never forwarded, so a half-built proxy cannot recurse into get()
+        if item.startswith("_"):
+            raise AttributeError(item)
+        return getattr(self.get(), item)
 
-async def launch_process():
+
+def create_farm_bot(session_name):
+    """Initialize the Telegram client and the farm bot of a session."""
+    # Initialize the Telegram client with the session
+    client = LazyClient(session_name, workdir=SESSIONS_DIR)
+    return FarmBot(client,random.choice(["ios", "android"]))
+
+
+async def run_sessions(accept=None, report_stats=None, metrics_port=METRICS_PORT):
+    """Runs the farming process for the sessions `accept` selects (all by default) until cancelled."""
+    store = get_state_store() if STATE_ENABLED else None
+    # The registry follows the sessions directory; its scheduler wakes each session when its next
+    # cycle is due, on a bounded pool of workers
+    registry = SessionRegistry(create_farm_bot, accept=accept, store=store)
+    registry.load()
+    scheduler = registry.scheduler
+
+    metrics = get_metrics()
+    metrics.active_accounts.set_function(lambda: len(scheduler))
+    metrics.running_accounts.set_function(lambda: scheduler.running)
+    if METRICS_ENABLED:
+        await metrics.start(port=metrics_port)
+
+    reporter = None
+    if report_stats is not None:
+        async def report_loop():
+            while True:
+                report_stats({"sessions": len(registry), "scheduler": scheduler.stats(),
+                              "http": get_http_pool().stats(), "rate_limit": get_rate_limiter().stats(),
+                              "retry": get_retry_registry().stats(), "telegram": get_telegram_coordinator().stats()})
+                await asyncio.sleep(WORKER_STATS_INTERVAL)
+        reporter = asyncio.create_task(report_loop())
+    flusher = asyncio.create_task(store.run()) if store is not None else None
+
+    try:
+        await registry.run()
+    finally:
+        if reporter is not None:
+            reporter.cancel()
+        if flusher is not None:
+            flusher.cancel()
+            store.close()
+        await metrics.stop()
+        close_tracer()
+        # Release pooled connections shared by all sessions
+        await close_http_pool()
+        # Telegram clients only exist when a session needed one
+        telegram_handler = sys.modules.get("bot.telegram_handler")
+        if telegram_handler is not None:
+            await telegram_handler.client_pool.close()
+
+
+async def launch_process(workers: int = 1, headless: bool = HEADLESS):
     """Main entry point for launching the farming process for all sessions."""
     # Display the banner at the start
-    display_banner()
+    if not headless:
+        display_banner()
 
     # Get all session names from the 'sessions/' folder
     session_names = get_session_names()
 
     if not session_names:
-        logger.error("No sessions found!")
-        print(f"{Fore.RED}No sessions found!{Style.RESET_ALL}")
+        if WATCH_INTERVAL <= 0:
+            logger.error("No sessions found!")
+            return
+        logger.warning("No sessions found, waiting for session files in {}/", SESSIONS_DIR)
+
+    if workers > 1:
+        logger.success("Starting farm process for {} sessions in {} worker processes...", len(session_names), workers)
+        await supervise_workers(workers)
         return
 
-    print(f" → [{time.strftime('%Y-%m-%d %H:%M:%S')}] {Fore.GREEN}Starting farm process for {len(session_names)} sessions...{Style.RESET_ALL}")
-
-    # Run the farming process for all available sessions asynchronously
-    await asyncio.gather(*[start_farm_process(session_name) for session_name in session_names])
\ No newline at end of file
+    logger.success("Starting farm process for {} sessions...", len(session_names))
+    await run_sessions()
@@ -0,0 +1,366 @@
+import atexit
+import glob
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+
+from loguru import logger
+from bot.utils import load_config
+
+# Load configurations from the .conf file
+config = load_config()
+
+# Extract log settings from the configuration
+LOG_FILE = config.get("settings", "log_file", fallback="logs/qlyuker_bot.log")
+LOG_ROTATION = config.get("settings", "log_rotation", fallback="1 day")
+LOG_RETENTION = config.get("settings", "log_retention", fallback="7 days")
+LOG_LEVEL = config.get("settings", "log_level", fallback="INFO")
+CONSOLE_LEVEL = config.get("settings", "console_level", fallback="INFO")
+# Quiet mode keeps results and errors on the console and drops the per-step progress lines
+QUIET = config.getboolean("settings", "quiet", fallback=False)
+CONSOLE_FLUSH_INTERVAL = config.getfloat("settings", "console_flush_interval", fallback=0.2)
+
+# Per-step progress of a farming cycle, below INFO so file logs and quiet consoles skip it cheaply
+STEP_LEVEL = "STEP"
+logger.level(STEP_LEVEL, no=15, color="<yellow>")
+logger.level("SUCCESS", color="<green>")
+logger.level("ERROR", color="<red>")
+
+# Formats of loguru's own records; loguru ends each line and adds tracebacks
+CONSOLE_FORMAT = " → [{time:%Y-%m-%d %H:%M:%S}] <level>{message}</level>"
+FILE_FORMAT = "{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {name}:{function}:{line} - {message}"
+
+# ANSI codes of the color tags SessionLog templates may use; any other <...> is left as text
+COLOR_CODES = {
+    "red": "\033[31m",
+    "green": "\033[32m",
+    "yellow": "\033[33m",
+    "cyan": "\033[36m",
+    "lr": "\033[91m",
+}
+COLOR_RESET = "\033[0m"
+COLOR_TAG = re.compile(r"<(/?)(%s)>" % "|".join(COLOR_CODES))
+
+# Number and console color of each level SessionLog writes, as loguru shows them
+LEVELS = {
+    "DEBUG": (10, "\033[34m\033[1m"),
+    STEP_LEVEL: (15, COLOR_CODES["yellow"]),
+    "INFO": (20, "\033[1m"),
+    "SUCCESS": (25, COLOR_CODES["green"]),
+    "WARNING": (30, "\033[33m\033[1m"),
+    "ERROR": (40, COLOR_CODES["red"]),
+}
+
+# Seconds of each unit accepted by log_rotation and log_retention, and bytes of each size unit
+INTERVAL_UNITS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400, "week": 604800}
+SIZE_UNITS = {"b": 1, "kb": 1024, "mb": 1024 ** 2, "gb": 1024 ** 3}
+
+
+def parse_rotation(value: str, key: str = "log_rotation"):
+    """Parses "1 day" or "500 MB" into ("interval", seconds) or ("size", bytes)."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([A-Za-z]+?)s?\s*", value or "")
+    if match is not None:
+        amount, unit = float(match.group(1)), match.group(2).lower()
+        if unit in INTERVAL_UNITS and amount > 0:
+            return "interval", amount * INTERVAL_UNITS[unit]
+        if unit in SIZE_UNITS and amount > 0:
+            return "size", amount * SIZE_UNITS[unit]
+    raise ValueError(f"{key} must be a positive interval such as \"1 day\" or a size such as \"500 MB\", "
+                     f"got {value!r}")
+
+
+def parse_retention(value: str, key: str = "log_retention"):
+    """Parses "7 days" into ("interval", seconds), or "10" into ("count", 10) rotated files."""
+    if value and value.strip().isdigit():
+        return "count", int(value)
+    kind, amount = parse_rotation(value, key)
+    if kind != "interval":
+        raise ValueError(f"{key} must be an interval such as \"7 days\" or a number of files, got {value!r}")
+    return kind, amount
+
+
+def worker_log_file(path: str, index: int) -> str:
+    """Log file of worker process `index`: "logs/bot.log" becomes "logs/bot-1.log"."""
+    root, ext = os.path.splitext(path)
+    return f"{root}-{index}{ext}"
+
+
+def render_colors(template: str):
+    """Returns the template with its color tags turned into ANSI codes, and with them stripped."""
+    if COLOR_TAG.search(template) is None:
+        return template, template
+    colored = COLOR_TAG.sub(lambda m: COLOR_RESET if m.group(1) else COLOR_CODES[m.group(2)], template)
+    return colored, COLOR_TAG.sub("", template)
+
+
+# Rendered (colored, plain) versions of every SessionLog template
+_templates = {}
+_clock_second = None
+_clock_text = ""
+
+
+def clock(now: float) -> str:
+    """Local time of `now` to the second; strftime only runs once per second."""
+    global _clock_second, _clock_text
+    second = int(now)
+    if second != _clock_second:
+        _clock_text = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second))
+        _clock_second = second
+    return _clock_text
+
+
+class BatchedWriter:
+    """Sink that hands lines to a background thread, which writes them in batches.
+
+    Logging calls only append the formatted line to a deque; every `interval` seconds the thread
+    joins everything appended since its last write into writes of up to `max_batch` lines.
+    Subclasses set up their target before calling this constructor, which starts the thread.
+    """
+
+    def __init__(self, name: str, interval: float = CONSOLE_FLUSH_INTERVAL, max_batch: int = 1000):
+        self.interval = interval
+        self.max_batch = max_batch
+        self.lines = deque()
+        self.closed = False
+        self._stopping = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    def write(self, message: str):
+        self.lines.append(message)
+
+    def _run(self):
+        lines = self.lines
+        while True:
+            # close() wakes the thread early for the last batches
+            stopping = self._stopping.wait(self.interval)
+            while lines:
+                batch = [lines.popleft() for _ in range(min(len(lines), self.max_batch))]
+                try:
+                    self.write_batch("".join(batch))
+                except (OSError, ValueError) as error:
+                    sys.stderr.write(f"Failed to write log lines in {self.thread.name}: {error}\n")
+            if stopping:
+                self.stop()
+                return
+
+    def write_batch(self, text: str):
+        raise NotImplementedError
+
+    def stop(self):
+        """Runs in the writer thread after its last batch."""
+
+    def close(self):
+        """Writes out everything queued so far and stops the writer thread."""
+        if self.closed:
+            return
+        self.closed = True
+        self._stopping.set()
+        self.thread.join(timeout=5)
+
+
+class BatchedConsole(BatchedWriter):
+    """Console sink whose writer thread writes and flushes each batch at once."""
+
+    def __init__(self, stream=None, interval: float = CONSOLE_FLUSH_INTERVAL, max_batch: int = 1000):
+        self.stream = stream if stream is not None else sys.stdout
+        super().__init__("console-writer", interval, max_batch)
+
+    def write_batch(self, text: str):
+        self.stream.write(text)
+        self.stream.flush()
+
+
+class BatchedFile(BatchedWriter):
+    """Log file sink whose writer thread appends each batch and rotates the file.
+
+    The file is renamed to "<name>.<time>.<ext>" once it is older than the rotation interval or
+    larger than the rotation size; rotated files beyond the retention age or count are deleted.
+    Only this thread touches the file, so every process needs a file of its own.
+    """
+
+    def __init__(self, path: str, rotation: str = LOG_ROTATION, retention: str = LOG_RETENTION,
+                 interval: float = CONSOLE_FLUSH_INTERVAL, max_batch: int = 1000):
+        self.path = path
+        self.rotation = parse_rotation(rotation)
+        self.retention = parse_retention(retention) if retention else None
+        self.file = None
+        self.opened_at = 0.0
+        super().__init__("log-file-writer", interval, max_batch)
+
+    def write_batch(self, text: str):
+        if self.file is None:
+            self._open()
+        elif self._should_rotate(len(text)):
+            self._rotate()
+        self.file.write(text)
+        self.file.flush()
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(self.path, "a", encoding="utf-8")
+        # An existing file keeps its age across restarts
+        self.opened_at = os.path.getctime(self.path) if self.file.tell() else time.time()
+
+    def _should_rotate(self, incoming: int) -> bool:
+        kind, limit = self.rotation
+        if kind == "interval":
+            return time.time() - self.opened_at >= limit
+        return self.file.tell() > 0 and self.file.tell() + incoming > limit
+
+    def _rotate(self):
+        self.file.close()
+        root, ext = os.path.splitext(self.path)
+        os.replace(self.path, f"{root}.{time.strftime('%Y-%m-%d_%H-%M-%S')}_{time.time_ns() % 10 ** 9:09d}{ext}")
+        self._apply_retention(root, ext)
+        self._open()
+
+    def _apply_retention(self, root: str, ext: str):
+        if self.retention is None:
+            return
+        rotated = sorted(glob.glob(f"{glob.escape(root)}.*{glob.escape(ext)}"), key=os.path.getmtime)
+        kind, limit = self.retention
+        if kind == "count":
+            expired = rotated[:max(0, len(rotated) - limit)]
+        else:
+            expired = [path for path in rotated if time.time() - os.path.getmtime(path) > limit]
+        for path in expired:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stop(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class SessionLog:
+    """Leveled console/file logging of one session with lazy, brace-style formatting.
+
+    Messages are templates such as log.step("Syncing energy: {}, taps: {}", energy, taps); they
+    are only formatted when a sink accepts the level. Color tags like <green>{}</green> are
+    allowed in templates, while arguments are inserted verbatim. Each template's tags are
+    rendered once; the console gets the ANSI version and the log file the plain one.
+
+    Once setup_logging() has run, lines are formatted here and handed straight to the batched
+    writers, without building a loguru record; before that they go through loguru.
+    """
+
+    __slots__ = ("name", "_logger", "_prefixes", "_heads", "_heads_stamp")
+
+    def __init__(self, name: str):
+        self.name = name
+        # depth=2 attributes records to the caller instead of this facade
+        self._logger = logger.bind(session=name).opt(depth=2)
+        self._prefixes = {level: f"] | {color}[{name}]{COLOR_RESET} | " for level, (_, color) in LEVELS.items()}
+        # Console line starts of the current second, by level
+        self._heads = {}
+        self._heads_stamp = None
+
+    def _log(self, level: str, no: int, message: str, args, kwargs):
+        rendered = _templates.get(message)
+        if rendered is None:
+            rendered = _templates[message] = render_colors(message)
+        colored, plain = rendered
+        if args or kwargs:
+            plain = plain.format(*args, **kwargs)
+            colored = plain if rendered[0] is rendered[1] else colored.format(*args, **kwargs)
+        if _console is None:
+            # The text is already formatted; "{}" keeps loguru from formatting braces in the arguments
+            self._logger.log(level, "{}", plain)
+            return
+        now = time.time()
+        stamp = _clock_text if int(now) == _clock_second else clock(now)
+        if no >= _console_level_no:
+            if stamp is not self._heads_stamp:
+                self._heads = {}
+                self._heads_stamp = stamp
+            head = self._heads.get(level)
+            if head is None:
+                head = self._heads[level] = f" → [{stamp}{self._prefixes[level]}"
+            _console_put(head + colored + "\n")
+        if _file is not None and no >= _file_level_no:
+            # The caller of debug(), step(), ...
+            frame = sys._getframe(2)
+            _file.write(f"{stamp}.{int(now * 1000) % 1000:03d} | {level: <8} | "
+                        f"{frame.f_globals.get('__name__')}:{frame.f_code.co_name}:{frame.f_lineno} - "
+                        f"{self.name} | {plain}\n")
+
+    def debug(self, message: str, *args, **kwargs):
+        if _min_level_no <= 10:
+            self._log("DEBUG", 10, message, args, kwargs)
+
+    def step(self, message: str, *args, **kwargs):
+        if _min_level_no <= 15:
+            self._log(STEP_LEVEL, 15, message, args, kwargs)
+
+    def info(self, message: str, *args, **kwargs):
+        if _min_level_no <= 20:
+            self._log("INFO", 20, message, args, kwargs)
+
+    def success(self, message: str, *args, **kwargs):
+        if _min_level_no <= 25:
+            self._log("SUCCESS", 25, message, args, kwargs)
+
+    def warning(self, message: str, *args, **kwargs):
+        if _min_level_no <= 30:
+            self._log("WARNING", 30, message, args, kwargs)
+
+    def error(self, message: str, *args, **kwargs):
+        if _min_level_no <= 40:
+            self._log("ERROR", 40, message, args, kwargs)
+
+
+_console = None
+# append() of the console's line deque, saving a call per line
+_console_put = None
+_file = None
+# Lowest level number each sink, and any sink, accepts; SessionLog drops lower lines without formatting them
+_console_level_no = 0
+_file_level_no = 0
+_min_level_no = 0
+
+
+def setup_logging(console_level: str = None, quiet: bool = QUIET, stream=None, log_file: str = LOG_FILE,
+                  log_level: str = LOG_LEVEL):
+    """Replaces loguru's default handler with the batched console sink and the batched, rotating file sink.
+
+    Passing log_file=None leaves the file sink out.
+    """
+    global _console, _console_put, _file, _console_level_no, _file_level_no, _min_level_no
+    if console_level is None:
+        console_level = "INFO" if quiet else CONSOLE_LEVEL
+
+    logger.remove()
+    close_logging()
+    _console = BatchedConsole(stream)
+    _console_put = _console.lines.append
+    logger.add(_console, level=console_level, format=CONSOLE_FORMAT, colorize=True)
+    _console_level_no = logger.level(console_level).no
+    _min_level_no = _console_level_no
+    if log_file is not None:
+        _file = BatchedFile(log_file)
+        logger.add(_file, level=log_level, format=FILE_FORMAT, colorize=False)
+        _file_level_no = logger.level(log_level).no
+        _min_level_no = min(_min_level_no, _file_level_no)
+
+
+def close_logging():
+    """Writes out the queued console and file lines; called on exit."""
+    global _console, _file, _min_level_no
+    # Lines logged from now on go through loguru's remaining handlers
+    _min_level_no = 0
+    for sink in (_console, _file):
+        if sink is not None:
+            sink.close()
+    _console = _file = None
+
+
+atexit.register(close_logging)
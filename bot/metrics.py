@@ -0,0 +1,219 @@
+import math
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from aiohttp import web
+from loguru import logger
+from bot.utils import load_config
+
+# Load configurations from the .conf file
+config = load_config()
+
+# Extract metrics endpoint settings from the configuration
+METRICS_ENABLED = config.getboolean("metrics", "enabled", fallback=False)
+METRICS_HOST = config.get("metrics", "host", fallback="127.0.0.1")
+METRICS_PORT = config.getint("metrics", "port", fallback=9108)
+
+# Prometheus text exposition format 0.0.4
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REQUEST_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CYCLE_BUCKETS = (1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1200.0)
+
+
+def format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """A metric family with a fixed set of label names; samples are kept per label values."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.values: Dict[Tuple, object] = {}
+
+    def key(self, labels: Dict) -> Tuple:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def remove(self, **labels):
+        """Drops the sample of these label values, so it is no longer exported."""
+        self.values.pop(self.key(labels), None)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{format_labels(self.label_names, key)} {format_value(value)}"
+                for key, value in self.values.items()]
+
+    def render(self) -> List[str]:
+        return self.header() + self.samples()
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self.key(labels)
+        self.values[key] = self.values.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = ()):
+        super().__init__(name, help_text, labels)
+        self.function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels):
+        self.values[self.key(labels)] = value
+
+    def set_function(self, function: Optional[Callable[[], float]]):
+        """Reads the unlabelled value from `function` at scrape time."""
+        self.function = function
+
+    def samples(self) -> List[str]:
+        if self.function is not None:
+            return [f"{self.name} {format_value(self.function())}"]
+        return super().samples()
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = (), buckets=REQUEST_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self.key(labels)
+        state = self.values.get(key)
+        if state is None:
+            # Per-bucket counts, then sum and count
+            state = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                state[0][index] += 1
+                break
+        state[1] += value
+        state[2] += 1
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = 'le="%s"' % format_value(bound)
+                lines.append(f"{self.name}_bucket{format_labels(self.label_names, key, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{format_labels(self.label_names, key, le)} {count}")
+            labels = format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class FarmMetrics:
+    """Request, cycle and account metrics of this process, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self.request_duration = Histogram("qlyuker_request_duration_seconds",
+                                          "Time until the response headers of a game server request arrived.",
+                                          ["endpoint"])
+        self.request_errors = Counter("qlyuker_request_errors_total",
+                                      "Game server requests that did not return 200, by status.",
+                                      ["endpoint", "status"])
+        self.cycle_duration = Histogram("qlyuker_cycle_duration_seconds",
+                                        "Duration of farming cycles, including waits between actions.",
+                                        buckets=CYCLE_BUCKETS)
+        self.cycles = Counter("qlyuker_cycles_total", "Finished farming cycles by result.", ["result"])
+        self.coins_earned = Counter("qlyuker_coins_earned_total", "Coins earned by source.", ["source"])
+        self.active_accounts = Gauge("qlyuker_active_accounts", "Accounts scheduled in this process.")
+        self.running_accounts = Gauge("qlyuker_running_accounts", "Accounts currently running a farming cycle.")
+        self.account_coins = Gauge("qlyuker_account_coins", "Current coins of an account.", ["account"])
+        self.account_mine_per_hour = Gauge("qlyuker_account_mine_per_hour", "Passive income of an account per hour.",
+                                           ["account"])
+        self.account_energy = Gauge("qlyuker_account_energy", "Current energy of an account.", ["account"])
+        self.metrics: List[Metric] = [
+            self.request_duration, self.request_errors, self.cycle_duration, self.cycles, self.coins_earned,
+            self.active_accounts, self.running_accounts, self.account_coins, self.account_mine_per_hour,
+            self.account_energy,
+        ]
+        self.runner: Optional[web.AppRunner] = None
+
+    def observe_request(self, endpoint: str, started: float, status):
+        """Records one request started at `started` (time.perf_counter()); `status` is the code or "exception"."""
+        self.request_duration.observe(time.perf_counter() - started, endpoint=endpoint)
+        if status != 200:
+            self.request_errors.inc(endpoint=endpoint, status=status)
+
+    def observe_cycle(self, started: float, result: str):
+        self.cycle_duration.observe(time.perf_counter() - started)
+        self.cycles.inc(result=result)
+
+    def set_account(self, account: str, game: Dict):
+        """Updates the gauges of an account from a game state with currentCoins, minePerHour and currentEnergy."""
+        for gauge, field in ((self.account_coins, "currentCoins"), (self.account_mine_per_hour, "minePerHour"),
+                             (self.account_energy, "currentEnergy")):
+            if field in game:
+                gauge.set(float(game[field]), account=account)
+
+    def remove_account(self, account: str):
+        """Drops the gauges of an account that is no longer farmed."""
+        for gauge in (self.account_coins, self.account_mine_per_hour, self.account_energy):
+            gauge.remove(account=account)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(body=self.render().encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
+
+    async def start(self, host: str = METRICS_HOST, port: int = METRICS_PORT):
+        """Serves GET /metrics in the running loop."""
+        app = web.Application()
+        app.add_routes([web.get("/metrics", self.handle_metrics)])
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, host, port).start()
+        logger.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+
+_metrics = None
+
+
+def get_metrics() -> FarmMetrics:
+    """Returns the process-wide metrics."""
+    global _metrics
+    if _metrics is None:
+        _metrics = FarmMetrics()
+    return _metrics
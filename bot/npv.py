@@ -0,0 +1,94 @@
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# Simulation parameters of the NPV engine
+SIMULATION_HOURS = 24  # Look ahead 24 hours
+TIME_STEP_MINUTES = 30  # Calculate every 30 minutes
+DISCOUNT_RATE = 0.01  # 1% per hour discount rate for time value
+
+
+def pack_scenarios(scenarios: Sequence[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+    """Packs scenario sequences into padded (S, L) price and income-increase arrays.
+
+    Padding uses an infinite price, so a padded slot can never be bought.
+    """
+    length = max((len(s['sequence']) for s in scenarios), default=0)
+    prices = np.full((len(scenarios), length + 1), np.inf)
+    increments = np.zeros((len(scenarios), length + 1))
+    for i, scenario in enumerate(scenarios):
+        sequence = scenario['sequence']
+        prices[i, :len(sequence)] = [item['upgrade']['price'] for item in sequence]
+        increments[i, :len(sequence)] = [item['upgrade']['income_increase'] for item in sequence]
+    return prices, increments
+
+
+def batch_scenario_npv(prices: np.ndarray, increments: np.ndarray, balances: Sequence[float],
+                       incomes: Sequence[float], min_save_balance: float = 0,
+                       simulation_hours: int = SIMULATION_HOURS, time_step_minutes: int = TIME_STEP_MINUTES,
+                       discount_rate: float = DISCOUNT_RATE) -> np.ndarray:
+    """Evaluates S packed scenarios against K starting (balance, income) pairs at once.
+
+    Matches the scalar per-purchase simulation in benchmarks/bench_npv.py up to float rounding and returns an (S, K) array of NPVs.
+    """
+    balances = np.asarray(balances, dtype=float)
+    incomes = np.asarray(incomes, dtype=float)
+    n_scenarios = prices.shape[0]
+
+    # Prefix sums turn "buy while affordable" into one search per step: after buying items
+    # idx..j-1 the balance check for each of them holds exactly when cum_price[j] - cum_price[idx]
+    # <= balance - min_save_balance, because prices are non-negative.
+    cum_price = np.zeros((n_scenarios, prices.shape[1] + 1))
+    np.cumsum(prices, axis=1, out=cum_price[:, 1:])
+    cum_increment = np.zeros_like(cum_price)
+    np.cumsum(increments, axis=1, out=cum_increment[:, 1:])
+
+    # One searchsorted over all scenarios on exact integer keys: every prefix sum is replaced by
+    # its rank among all distinct prefix sums, and rows are laid end to end by adding row * span
+    # to the ranks. A limit's rank is the number of distinct sums at or below it, so a prefix sum
+    # fits under the limit exactly when its rank is below the limit's. Infinite padding ranks
+    # last and never fits. Float offsets would round limits of large prices across a boundary.
+    width = cum_price.shape[1]
+    distinct = np.unique(cum_price[np.isfinite(cum_price)])
+    span = distinct.size + 1
+    row_offsets = (np.arange(n_scenarios, dtype=np.int64) * span)[:, None]
+    flat_ranks = (np.searchsorted(distinct, cum_price) + row_offsets).ravel()
+    row_starts = (np.arange(n_scenarios) * width)[:, None]
+
+    balance = np.broadcast_to(balances, (n_scenarios, balances.size)).copy()
+    income = np.broadcast_to(incomes, (n_scenarios, incomes.size)).copy()
+    npv = np.zeros_like(balance)
+    index = np.zeros(balance.shape, dtype=np.intp)
+    new_index = np.empty_like(index)
+
+    time_step_hours = time_step_minutes / 60
+    for step in range(int(simulation_hours / time_step_hours)):
+        discount = 1 + discount_rate * (step * time_step_hours)
+
+        income_this_step = income * time_step_hours
+        balance += income_this_step
+        npv += income_this_step / discount
+
+        spent_before = np.take_along_axis(cum_price, index, axis=1)
+        limit = spent_before + balance - min_save_balance
+        keys = np.searchsorted(distinct, limit, side="right") + row_offsets
+        new_index[:] = np.searchsorted(flat_ranks, keys.ravel()).reshape(keys.shape) - row_starts - 1
+        np.maximum(new_index, index, out=new_index)
+
+        spent = np.take_along_axis(cum_price, new_index, axis=1) - spent_before
+        balance -= spent
+        income += (np.take_along_axis(cum_increment, new_index, axis=1)
+                   - np.take_along_axis(cum_increment, index, axis=1))
+        npv -= spent / discount
+        index, new_index = new_index, index
+
+    return npv
+
+
+def best_scenario(scenarios: List[Dict], balance: float, income: float,
+                  min_save_balance: float = 0) -> Tuple[int, float]:
+    """Returns (index, NPV) of the best scenario for one account; ties keep the first one."""
+    prices, increments = pack_scenarios(scenarios)
+    npv = batch_scenario_npv(prices, increments, [balance], [income], min_save_balance)[:, 0]
+    best = int(np.argmax(npv))
+    return best, float(npv[best])
@@ -0,0 +1,224 @@
+import heapq
+import math
+import time
+from itertools import islice
+from typing import Dict, List, Optional, Sequence
+
+from bot.catalog import UpgradeCatalog, UpgradeRecord, purchase_delta
+from bot.npv import SIMULATION_HOURS, batch_scenario_npv, pack_scenarios
+
+
+def upgrade_value(price: float, income_boost: float, balance: float, income: float) -> float:
+    """Value of buying an upgrade next, as in the original dynamic scenario; -1 when it is unreachable.
+
+    The float operations are kept in the original order so both planners pick identical sequences.
+    """
+    if price <= balance:
+        wait_time = 0
+    else:
+        if income <= 0:
+            return -1.0
+        wait_time = (price - balance) / (income / 3600)
+    time_discount = math.exp(-0.01 * (wait_time / 3600))
+    return income_boost * time_discount / (wait_time / 3600 + 1)
+
+
+class HeapPlanner:
+    """Greedy dynamic planner built on a max-heap of income boosts.
+
+    An upgrade's value is its boost discounted by the wait until it is affordable, so the boost is
+    an upper bound that never goes stale however balance and income change. Each pick pops
+    candidates in boost order, re-keys them lazily against the current simulated state and stops
+    as soon as the next bound cannot beat the best value found.
+    """
+
+    def __init__(self, available_upgrades: Sequence[Dict]):
+        self.upgrades = list(available_upgrades)
+        self.heap = [(-u['income_increase'], i) for i, u in enumerate(self.upgrades)]
+        heapq.heapify(self.heap)
+
+    def push(self, upgrade) -> int:
+        """Adds an upgrade to the planner and returns its index."""
+        self.upgrades.append(upgrade)
+        index = len(self.upgrades) - 1
+        heapq.heappush(self.heap, (-upgrade['income_increase'], index))
+        return index
+
+    def pick(self, balance: float, income: float, remove: bool = True):
+        """Returns (index, wait_seconds) of the best next upgrade, or None; removes it unless told not to."""
+        best_value = -1
+        best_index = None
+        scanned = []
+        while self.heap:
+            neg_boost, index = self.heap[0]
+            # Equal bounds may still tie with the best value and win on list order
+            if -neg_boost < best_value:
+                break
+            heapq.heappop(self.heap)
+            scanned.append((neg_boost, index))
+            upgrade = self.upgrades[index]
+            value = upgrade_value(upgrade['price'], upgrade['income_increase'], balance, income)
+            if value < 0:
+                continue
+            if value > best_value or (value == best_value and index < best_index):
+                best_value = value
+                best_index = index
+
+        for entry in scanned:
+            if entry[1] != best_index or not remove:
+                heapq.heappush(self.heap, entry)
+        if best_index is None:
+            return None
+
+        price = self.upgrades[best_index]['price']
+        wait_time = 0 if price <= balance else (price - balance) / (income / 3600)
+        return best_index, wait_time
+
+    def plan(self, balance: float, income: float, horizon_hours: float = SIMULATION_HOURS,
+             elapsed_hours: float = 0) -> List[Dict]:
+        """Simulates purchases until the horizon and returns the sequence in scenario format."""
+        sequence = []
+        simulated_time = elapsed_hours
+        while self.heap and simulated_time < horizon_hours:
+            picked = self.pick(balance, income)
+            if picked is None:
+                break
+            index, wait_time = picked
+            upgrade = self.upgrades[index]
+
+            simulated_time += wait_time / 3600
+            balance += income * (wait_time / 3600)
+            balance -= upgrade['price']
+            income += upgrade['income_increase']
+
+            sequence.append({
+                'upgrade': upgrade,
+                'wait_hours': wait_time / 3600,
+                'purchase_time': simulated_time
+            })
+        return sequence
+
+
+def dynamic_optimal_sequence(available_upgrades: Sequence[Dict], current_balance: float,
+                             current_income: float, horizon_hours: float = SIMULATION_HOURS) -> List[Dict]:
+    """Heap-based equivalent of FarmBot.create_dynamic_optimal_scenario."""
+    return HeapPlanner(available_upgrades).plan(current_balance, current_income, horizon_hours)
+
+
+def ranked_candidates(available_upgrades: Sequence[Dict], balance: float, income: float,
+                      limit: int) -> List[int]:
+    """Indexes of the `limit` most valuable next upgrades, best first."""
+    values = ((upgrade_value(u['price'], u['income_increase'], balance, income), i)
+              for i, u in enumerate(available_upgrades))
+    ranked = sorted((v for v in values if v[0] >= 0), key=lambda v: (-v[0], v[1]))
+    return [i for _, i in islice(ranked, limit)]
+
+
+def search_sequence(available_upgrades: Sequence[Dict], current_balance: float, current_income: float,
+                    branching: int = 3, depth: int = 2, min_save_balance: float = 0,
+                    max_nodes: int = 256, horizon_hours: float = SIMULATION_HOURS) -> List[Dict]:
+    """Bounded branch search over purchase orderings within the horizon.
+
+    The first `depth` purchases branch over the `branching` most valuable candidates, each branch
+    is completed with the heap planner, and all completed orderings are scored in one batch NPV
+    pass. Branches past the horizon are cut and at most `max_nodes` orderings are evaluated.
+    """
+    available_upgrades = list(available_upgrades)
+    sequences = []
+    stack = [([], current_balance, current_income, 0.0)]
+    while stack and len(sequences) < max_nodes:
+        prefix, balance, income, elapsed = stack.pop()
+        used = {id(item['upgrade']) for item in prefix}
+        remaining = [u for u in available_upgrades if id(u) not in used]
+
+        children = []
+        if len(prefix) < depth and elapsed < horizon_hours:
+            for index in ranked_candidates(remaining, balance, income, branching):
+                upgrade = remaining[index]
+                price = upgrade['price']
+                wait_time = 0 if price <= balance else (price - balance) / (income / 3600)
+                purchase_time = elapsed + wait_time / 3600
+                if purchase_time >= horizon_hours:
+                    continue
+                item = {'upgrade': upgrade, 'wait_hours': wait_time / 3600, 'purchase_time': purchase_time}
+                children.append((prefix + [item],
+                                 balance + income * (wait_time / 3600) - price,
+                                 income + upgrade['income_increase'],
+                                 purchase_time))
+        if children:
+            stack.extend(reversed(children))
+            continue
+
+        planner = HeapPlanner(remaining)
+        sequences.append(prefix + planner.plan(balance, income, horizon_hours, elapsed))
+
+    if not sequences:
+        return []
+    prices, increments = pack_scenarios([{'sequence': s} for s in sequences])
+    npv = batch_scenario_npv(prices, increments, [current_balance], [current_income], min_save_balance)[:, 0]
+    return sequences[int(npv.argmax())]
+
+
+class IncrementalPlan:
+    """One cycle's purchase plan that absorbs purchase deltas instead of re-planning from scratch.
+
+    Iterating yields the planned upgrades in order. After each purchase, apply_purchase() updates
+    the catalog and re-checks only the upgrades that depend on the bought one: newly unlocked ones
+    join a heap planner, and each step yields whichever of the plan head and the heap's best is
+    worth more at the current balance and income. Every upgrade is yielded at most once per cycle.
+    """
+
+    def __init__(self, catalog: UpgradeCatalog, sequence: Sequence[UpgradeRecord], friends_count: int,
+                 balance: float, income: float):
+        self.catalog = catalog
+        self.friends_count = friends_count
+        self.balance = balance
+        self.income = income
+        self.base = list(sequence)
+        self.position = 0
+        self.extra = HeapPlanner([])
+        # Ids already planned this cycle, including ones yielded and bought
+        self.planned = {record.id for record in self.base}
+
+    def __iter__(self):
+        while True:
+            record = self.next()
+            if record is None:
+                return
+            yield record.upgrade
+
+    def _is_due(self, record: UpgradeRecord, now: int) -> bool:
+        return now >= record.cooldown_until and self.catalog.is_unlocked(record, self.friends_count)
+
+    def next(self) -> Optional[UpgradeRecord]:
+        """Returns the next upgrade to try, or None when the plan is exhausted."""
+        now = int(time.time())
+        while self.position < len(self.base) and not self._is_due(self.base[self.position], now):
+            self.position += 1
+        head = self.base[self.position] if self.position < len(self.base) else None
+
+        picked = self.extra.pick(self.balance, self.income, remove=False)
+        if picked is not None:
+            candidate = self.extra.upgrades[picked[0]]
+            if head is None or (upgrade_value(candidate.price, candidate.income_increase, self.balance, self.income)
+                                > upgrade_value(head.price, head.income_increase, self.balance, self.income)):
+                self.extra.pick(self.balance, self.income)
+                return candidate
+
+        if head is not None:
+            self.position += 1
+        return head
+
+    def apply_purchase(self, upgrade_id: str, r_updates: Dict):
+        """Applies an upgrades/buy response: new level, next price and increment, balance and income."""
+        self.balance = r_updates.get('currentCoins', self.balance)
+        self.income = r_updates.get('minePerHour', self.income)
+        record = self.catalog.by_id.get(upgrade_id)
+        if record is None:
+            return
+
+        now = int(time.time())
+        for affected in self.catalog.apply_purchase(upgrade_id, **purchase_delta(record, r_updates, now)):
+            if affected.id not in self.planned and self._is_due(affected, now):
+                self.extra.push(affected)
+                self.planned.add(affected.id)
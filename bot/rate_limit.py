@@ -0,0 +1,219 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Hashable, Optional, Tuple
+from urllib.parse import urlparse
+
+from loguru import logger
+from bot.utils import load_config
+
+# Load configurations from the .conf file
+config = load_config()
+
+# Extract rate limit settings from the configuration; each endpoint is "requests per second, burst"
+RATE_LIMIT_ENABLED = config.getboolean("rate_limit", "enabled", fallback=True)
+DEFAULT_LIMITS = {
+    "auth/start": "5, 10",
+    "game/sync": "20, 40",
+    "upgrades/buy": "10, 20",
+    "tasks": "5, 10",
+    "cdn": "2, 4",
+    "default": "10, 20",
+}
+
+
+def parse_limit(value: str, key: str = "rate_limit") -> Tuple[float, float]:
+    """Parses "rate, burst" into floats; the burst defaults to the rate.
+
+    Raises ValueError naming the .conf `key` when the rate is not positive.
+    """
+    try:
+        parts = [float(part) for part in value.replace(" ", "").split(",") if part]
+    except ValueError:
+        raise ValueError(f"{key} = {value!r}: expected \"requests per second, burst\"") from None
+    if not parts or parts[0] <= 0:
+        raise ValueError(f"{key} = {value!r}: the rate must be a positive number of requests per second")
+    rate = parts[0]
+    burst = parts[1] if len(parts) > 1 else max(1.0, rate)
+    return rate, burst
+
+
+def endpoint_for(url: str) -> str:
+    """Maps a request URL to its rate limit bucket."""
+    path = urlparse(url).path.strip("/")
+    if path.startswith("tasks/"):
+        return "tasks"
+    if path in DEFAULT_LIMITS:
+        return path
+    # The web page and the JS bundle come from the website and its CDN
+    if not path or path.startswith("assets/") or path.endswith(".js"):
+        return "cdn"
+    return "default"
+
+
+class TokenBucket:
+    """Token bucket refilled at `rate` tokens per second up to `burst` tokens."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def refill(self, now: float):
+        if now < self.paused_until:
+            self.updated = now
+            return
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, now: float) -> bool:
+        self.refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until the next token is available."""
+        if now < self.paused_until:
+            return self.paused_until - now + 1 / self.rate
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class EndpointLimiter:
+    """Rate limit of one endpoint with a per-account round-robin queue of waiters.
+
+    Waiters are queued per account and accounts are served in turn, so one account sending a
+    burst of purchases cannot starve the others.
+    """
+
+    def __init__(self, name: str, rate: float, burst: float):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.queues: "OrderedDict[Hashable, deque]" = OrderedDict()
+        self.depth = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.granted = 0
+        self.waited = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.throttled = 0
+
+    async def acquire(self, account: Hashable = None):
+        """Waits for a token of this endpoint."""
+        now = time.monotonic()
+        if not self.queues and self.bucket.try_take(now):
+            self.granted += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self.queues.setdefault(account, deque()).append((future, now))
+        self.depth += 1
+        self._schedule()
+        await future
+
+    def _schedule(self):
+        if self._timer is None and self.queues:
+            delay = self.bucket.wait_time(time.monotonic())
+            self._timer = asyncio.get_running_loop().call_later(delay, self._release)
+
+    def _release(self):
+        self._timer = None
+        now = time.monotonic()
+        while self.queues:
+            account, queue = next(iter(self.queues.items()))
+            future, enqueued_at = queue[0]
+            if not future.done() and not self.bucket.try_take(now):
+                break
+            queue.popleft()
+            self.depth -= 1
+            if queue:
+                self.queues.move_to_end(account)
+            else:
+                del self.queues[account]
+            # Cancelled waiters are dropped without using a token
+            if future.done():
+                continue
+            future.set_result(None)
+            wait = now - enqueued_at
+            self.granted += 1
+            self.waited += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+        self._schedule()
+
+    def throttle(self, retry_after: float):
+        """Pauses the endpoint after the server answered 429."""
+        now = time.monotonic()
+        self.throttled += 1
+        self.bucket.tokens = 0
+        self.bucket.paused_until = max(self.bucket.paused_until, now + retry_after)
+        logger.warning(f"Rate limit | {self.name} throttled by the server for {retry_after:.1f}s")
+
+    def stats(self) -> dict:
+        return {
+            "rate": self.bucket.rate,
+            "burst": self.bucket.burst,
+            "queue_depth": self.depth,
+            "granted": self.granted,
+            "waited": self.waited,
+            "wait_avg": self.wait_total / self.waited if self.waited else 0.0,
+            "wait_max": self.wait_max,
+            "throttled": self.throttled,
+        }
+
+
+class RateLimiter:
+    """Process-wide rate limits shared by all accounts, one token bucket per endpoint."""
+
+    def __init__(self, limits: Dict[str, Tuple[float, float]] = None, enabled: bool = RATE_LIMIT_ENABLED):
+        self.enabled = enabled
+        if limits is None:
+            limits = {name: parse_limit(config.get("rate_limit", name.replace("/", "_"), fallback=default),
+                                        f"[rate_limit] {name.replace('/', '_')}")
+                      for name, default in DEFAULT_LIMITS.items()}
+        self.limiters = {name: EndpointLimiter(name, rate, burst) for name, (rate, burst) in limits.items()}
+
+    def scale(self, factor: float):
+        """Scales every endpoint's rate and burst, e.g. to split the farm's limits between worker processes."""
+        for limiter in self.limiters.values():
+            bucket = limiter.bucket
+            bucket.rate *= factor
+            bucket.burst = max(1.0, bucket.burst * factor)
+            bucket.tokens = min(bucket.tokens, bucket.burst)
+
+    def limiter(self, url: str) -> EndpointLimiter:
+        endpoint = endpoint_for(url)
+        return self.limiters.get(endpoint) or self.limiters["default"]
+
+    async def acquire(self, url: str, account: Hashable = None):
+        """Waits until a request to `url` may be sent on behalf of `account`."""
+        if self.enabled:
+            await self.limiter(url).acquire(account)
+
+    def throttle(self, url: str, retry_after: Optional[str] = None):
+        """Backs the endpoint of `url` off after a 429, honouring Retry-After when it is given in seconds."""
+        if not self.enabled:
+            return
+        try:
+            delay = float(retry_after) if retry_after else 1.0
+        except ValueError:
+            delay = 1.0
+        self.limiter(url).throttle(delay)
+
+    def stats(self) -> dict:
+        """Returns queue depth and wait time counters per endpoint."""
+        return {name: limiter.stats() for name, limiter in self.limiters.items()}
+
+
+_limiter = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Returns the process-wide rate limiter."""
+    global _limiter
+    if _limiter is None:
+        _limiter = RateLimiter()
+    return _limiter
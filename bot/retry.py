@@ -0,0 +1,226 @@
+import asyncio
+import random
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import aiohttp
+from loguru import logger
+from bot.utils import load_config
+from bot.rate_limit import endpoint_for, get_rate_limiter
+
+# Load configurations from the .conf file
+config = load_config()
+
+# Extract retry and circuit breaker settings from the configuration
+RETRY_ENABLED = config.getboolean("retry", "enabled", fallback=True)
+BACKOFF_BASE = config.getfloat("retry", "backoff_base", fallback=0.5)
+BACKOFF_MAX = config.getfloat("retry", "backoff_max", fallback=8.0)
+# Consecutive failed requests to one host that open its breaker, and seconds before it is probed
+BREAKER_THRESHOLD = config.getint("retry", "breaker_threshold", fallback=10)
+BREAKER_RESET = config.getfloat("retry", "breaker_reset", fallback=30.0)
+# Each endpoint is "attempts, timeout in seconds"; a purchase is sent once, since a lost response
+# may still have bought the level
+DEFAULT_POLICIES = {
+    "auth/start": "3, 15",
+    "game/sync": "3, 10",
+    "upgrades/buy": "1, 10",
+    "tasks": "2, 10",
+    "cdn": "3, 20",
+    "default": "2, 15",
+}
+
+# Statuses worth sending again; 429 waits for the rate limiter's pause first
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request while the breaker of its host is open."""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"circuit breaker of {name} is open, next probe in {retry_in:.0f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+def parse_policy(value: str) -> Tuple[int, float]:
+    """Parses "attempts, timeout" into an int and a float; the timeout defaults to 15 seconds."""
+    parts = [part for part in value.replace(" ", "").split(",") if part]
+    attempts = max(1, int(parts[0]))
+    timeout = float(parts[1]) if len(parts) > 1 else 15.0
+    return attempts, timeout
+
+
+class RetryPolicy:
+    """Attempts, per-attempt timeout and jittered exponential backoff of one endpoint."""
+
+    def __init__(self, attempts: int, timeout: float, backoff_base: float = BACKOFF_BASE,
+                 backoff_max: float = BACKOFF_MAX):
+        self.attempts = attempts
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before retry number `attempt + 1`, drawn uniformly below the exponential cap."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Failure state of one host shared by every account of the process.
+
+    `threshold` consecutive failures (connection errors, timeouts and 5xx) open the breaker, and
+    requests fail fast with CircuitOpenError. After `reset_timeout` seconds a single request is let
+    through as a probe: its success closes the breaker, its failure opens it again. A probe that
+    never reports back is replaced after another `reset_timeout`.
+    """
+
+    def __init__(self, name: str, threshold: int = BREAKER_THRESHOLD, reset_timeout: float = BREAKER_RESET):
+        self.name = name
+        self.threshold = max(1, threshold)
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_started: Optional[float] = None
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def allow(self):
+        """Returns when a request may be sent, or raises CircuitOpenError."""
+        if self.opened_at is None:
+            return
+        now = time.monotonic()
+        waited = now - self.opened_at
+        if waited < self.reset_timeout:
+            self.rejected += 1
+            raise CircuitOpenError(self.name, self.reset_timeout - waited)
+        if self.probe_started is not None and now - self.probe_started < self.reset_timeout:
+            self.rejected += 1
+            raise CircuitOpenError(self.name, self.reset_timeout - (now - self.probe_started))
+        self.probe_started = now
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.success(f"Circuit breaker | {self.name} answered the probe, letting requests through again")
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.opened_at is not None:
+            # The probe failed, or a request sent before the breaker opened did
+            if self.probe_started is not None:
+                self.opened_at = time.monotonic()
+                self.probe_started = None
+                logger.warning(f"Circuit breaker | {self.name} probe failed, staying open for {self.reset_timeout:.0f}s")
+            return
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+            self.opened += 1
+            logger.warning(f"Circuit breaker | {self.name} opened after {self.failures} consecutive failures, "
+                           f"probing in {self.reset_timeout:.0f}s")
+
+    def stats(self) -> dict:
+        return {"state": self.state, "failures": self.failures, "opened": self.opened, "rejected": self.rejected}
+
+
+class RetryRegistry:
+    """Process-wide retry policies per endpoint and circuit breakers per host."""
+
+    def __init__(self, policies: Dict[str, Tuple[int, float]] = None, enabled: bool = RETRY_ENABLED,
+                 threshold: int = BREAKER_THRESHOLD, reset_timeout: float = BREAKER_RESET):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        if policies is None:
+            policies = {name: parse_policy(config.get("retry", name.replace("/", "_"), fallback=default))
+                        for name, default in DEFAULT_POLICIES.items()}
+        self.policies = {name: RetryPolicy(attempts if enabled else 1, timeout)
+                         for name, (attempts, timeout) in policies.items()}
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.retries = 0
+
+    def policy(self, endpoint: str) -> RetryPolicy:
+        return self.policies.get(endpoint) or self.policies["default"]
+
+    def breaker(self, url: str) -> CircuitBreaker:
+        host = urlparse(url).netloc
+        breaker = self.breakers.get(host)
+        if breaker is None:
+            breaker = self.breakers[host] = CircuitBreaker(host, self.threshold, self.reset_timeout)
+        return breaker
+
+    def stats(self) -> dict:
+        return {"retries": self.retries, "breakers": {host: breaker.stats() for host, breaker in self.breakers.items()}}
+
+
+_registry = None
+
+
+def get_retry_registry() -> RetryRegistry:
+    """Returns the process-wide retry registry."""
+    global _registry
+    if _registry is None:
+        _registry = RetryRegistry()
+    return _registry
+
+
+async def send_request(session: aiohttp.ClientSession, method: str, url: str, account=None,
+                       **kwargs) -> aiohttp.ClientResponse:
+    """Sends a request within the shared rate limits, the retry policy of its endpoint and its host's breaker.
+
+    Connection errors, timeouts, 429 and 5xx are retried after a jittered exponential backoff
+    until the endpoint's attempts are used up; then the last response is returned, whatever its
+    status, or the last error raised. Raises CircuitOpenError without sending while the breaker
+    is open.
+    """
+    from bot.metrics import get_metrics
+    from bot.tracing import get_tracer
+    registry = get_retry_registry()
+    endpoint = endpoint_for(url)
+    policy = registry.policy(endpoint)
+    breaker = registry.breaker(url)
+    attempt = 0
+    while True:
+        if registry.enabled:
+            breaker.allow()
+        await get_rate_limiter().acquire(url, account)
+        started = time.perf_counter()
+        try:
+            with get_tracer().span("http", account, cat="http", endpoint=endpoint, attempt=attempt) as span:
+                response = await session.request(method, url, timeout=policy.timeout, **kwargs)
+                span.set(status=response.status)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            get_metrics().observe_request(endpoint, started, "exception")
+            if registry.enabled:
+                breaker.record_failure()
+            if attempt + 1 >= policy.attempts:
+                raise
+        else:
+            status = response.status
+            get_metrics().observe_request(endpoint, started, status)
+            if status == 429:
+                get_rate_limiter().throttle(url, response.headers.get("Retry-After"))
+            if registry.enabled:
+                if status >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+            if status not in RETRY_STATUSES or attempt + 1 >= policy.attempts:
+                return response
+            response.release()
+
+        delay = policy.backoff(attempt)
+        attempt += 1
+        registry.retries += 1
+        logger.debug(f"{account} | retrying {endpoint} in {delay:.2f}s (attempt {attempt + 1}/{policy.attempts})")
+        await asyncio.sleep(delay)
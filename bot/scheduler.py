@@ -0,0 +1,131 @@
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from typing import Awaitable, Callable, Hashable, Optional
+
+from loguru import logger
+from bot.utils import load_config
+
+# Load configurations from the .conf file
+config = load_config()
+
+# Extract scheduler settings from the configuration
+SCHEDULER_WORKERS = config.getint("scheduler", "workers", fallback=50)
+START_DELAY_MIN = config.getint("scheduler", "start_delay_min", fallback=12)
+START_DELAY_MAX = config.getint("scheduler", "start_delay_max", fallback=120)
+
+
+class WakeScheduler:
+    """Central scheduler that wakes accounts at their next due time on a bounded worker pool.
+
+    Only the next wake time of each account is kept, in a heap. One dispatcher sleeps until the
+    earliest one and hands due accounts to `workers` worker tasks, which run one cycle and
+    reschedule the account with the delay it returns. The number of coroutines follows the
+    worker count, not the account count.
+    """
+
+    def __init__(self, run_cycle: Callable[[Hashable], Awaitable[float]], workers: int = SCHEDULER_WORKERS):
+        self.run_cycle = run_cycle
+        self.workers = max(1, workers)
+        self.accounts = set()
+        self.heap = []
+        # Latest wake entry per account; older heap entries for the same account are skipped
+        self.entries = {}
+        self._counter = itertools.count()
+        self._changed: Optional[asyncio.Event] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self.running = 0
+        self.cycles = 0
+        self.failures = 0
+
+    def schedule(self, account: Hashable, delay: float = 0.0):
+        """Sets the next wake time of an account, replacing any earlier one."""
+        self.accounts.add(account)
+        wake_at = time.monotonic() + max(0.0, delay)
+        entry = (wake_at, next(self._counter), account)
+        self.entries[account] = entry
+        heapq.heappush(self.heap, entry)
+        if self._changed is not None:
+            self._changed.set()
+
+    def add(self, account: Hashable, start_delay: float = None):
+        """Adds an account with a random start delay, spreading the first cycles out."""
+        if start_delay is None:
+            start_delay = random.randint(START_DELAY_MIN, max(START_DELAY_MIN, START_DELAY_MAX))
+        self.schedule(account, start_delay)
+
+    def remove(self, account: Hashable):
+        """Stops scheduling an account; a cycle already running finishes first."""
+        self.accounts.discard(account)
+        self.entries.pop(account, None)
+
+    def __len__(self):
+        return len(self.accounts)
+
+    def next_wake(self) -> Optional[float]:
+        """Seconds until the earliest due account, or None when nothing is scheduled."""
+        self._drop_stale()
+        return max(0.0, self.heap[0][0] - time.monotonic()) if self.heap else None
+
+    def _drop_stale(self):
+        while self.heap and self.entries.get(self.heap[0][2]) is not self.heap[0]:
+            heapq.heappop(self.heap)
+
+    async def _dispatch(self):
+        while True:
+            self._changed.clear()
+            delay = self.next_wake()
+            if delay is None or delay > 0:
+                try:
+                    await asyncio.wait_for(self._changed.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            _, _, account = heapq.heappop(self.heap)
+            # Not due again until its cycle reschedules it
+            del self.entries[account]
+            # Blocks while all workers are busy, so due accounts wait in the heap
+            await self._queue.put(account)
+
+    async def _worker(self):
+        while True:
+            account = await self._queue.get()
+            self.running += 1
+            delay = None
+            try:
+                delay = await self.run_cycle(account)
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                self.failures += 1
+                logger.exception(f"Scheduler | cycle of {account} failed: {error}")
+            finally:
+                self.running -= 1
+                self.cycles += 1
+                self._queue.task_done()
+            # A cycle that crashed is retried after the default error pause
+            if account in self.accounts and account not in self.entries:
+                self.schedule(account, 300 if delay is None else delay)
+
+    async def run(self):
+        """Dispatches due accounts until cancelled."""
+        self._changed = asyncio.Event()
+        # One slot: at most one due account is taken off the heap ahead of a free worker
+        self._queue = asyncio.Queue(maxsize=1)
+        tasks = [asyncio.create_task(self._dispatch())]
+        tasks += [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"Scheduler started with {len(self)} accounts and {self.workers} workers")
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        """Returns counters of the scheduler."""
+        return {"accounts": len(self), "running": self.running, "cycles": self.cycles,
+                "failures": self.failures, "next_wake": self.next_wake()}
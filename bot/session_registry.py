@@ -0,0 +1,147 @@
+import asyncio
+import glob
+import os
+import sys
+from typing import Callable, Dict, Optional, Set, Tuple
+
+from loguru import logger
+from bot.utils import load_config
+from bot.metrics import get_metrics
+from bot.scheduler import WakeScheduler
+from bot.state_store import StateStore, resume_delays
+
+# Load configurations from the .conf file
+config = load_config()
+
+# Extract session registry settings from the configuration
+SESSIONS_DIR = config.get("sessions", "directory", fallback="sessions")
+# Seconds between scans of the sessions directory; 0 only reads it at startup
+WATCH_INTERVAL = config.getfloat("sessions", "watch_interval", fallback=10.0)
+
+
+def list_session_names(directory: str = SESSIONS_DIR) -> Set[str]:
+    """Names of the .session files in `directory`."""
+    return {os.path.splitext(os.path.basename(file))[0] for file in glob.glob(os.path.join(directory, "*.session"))}
+
+
+class SessionRegistry:
+    """Farm bots of the session files, kept in step with the sessions directory while the farm runs.
+
+    New session files are picked up by the next scan and scheduled like sessions found at startup;
+    deleted ones are retired after any cycle they are running. Bots are cheap until their first
+    cycle: the Pyrogram client of a session is only created when it needs to log in.
+    """
+
+    def __init__(self, create_bot: Callable[[str], object], directory: str = SESSIONS_DIR,
+                 accept: Callable[[str], bool] = None, watch_interval: float = WATCH_INTERVAL,
+                 store: Optional[StateStore] = None):
+        self.create_bot = create_bot
+        self.directory = directory
+        self.accept = accept
+        self.watch_interval = watch_interval
+        self.store = store
+        self.bots: Dict[str, object] = {}
+        self.scheduler = WakeScheduler(self.run_cycle)
+        self.added = 0
+        self.retired = 0
+        # Disconnects of retired sessions' Telegram clients still running
+        self._disconnects = set()
+
+    def __len__(self):
+        return len(self.bots)
+
+    async def run_cycle(self, session_name: str) -> float:
+        bot = self.bots.get(session_name)
+        if bot is None:
+            # Retired after it became due; the scheduler no longer reschedules it
+            return 0.0
+        sleep_time = await bot.run_cycle()
+        if session_name not in self.bots:
+            # Retired while this cycle ran, which updated its gauges again
+            get_metrics().remove_account(session_name)
+        return sleep_time
+
+    def session_names(self) -> Set[str]:
+        """Session files of this registry's directory that it accepts."""
+        names = list_session_names(self.directory)
+        return {name for name in names if self.accept(name)} if self.accept is not None else names
+
+    def sync(self, session_names: Set[str]) -> Tuple[list, list]:
+        """Starts sessions missing from the registry and retires those no longer in `session_names`."""
+        added = sorted(set(session_names) - self.bots.keys())
+        removed = sorted(self.bots.keys() - set(session_names))
+
+        # Sessions saved by an earlier run resume their kept login and wake when their next cycle was due
+        states = {}
+        if self.store is not None and added:
+            if not self.bots:
+                states = self.store.load_all()
+            else:
+                for session_name in added:
+                    state = self.store.load(session_name)
+                    if state is not None:
+                        states[session_name] = state
+        start_delays = resume_delays(states, added)
+        for session_name in added:
+            bot = self.create_bot(session_name)
+            bot.restore_state(states.get(session_name))
+            self.bots[session_name] = bot
+            self.scheduler.add(session_name, start_delays.get(session_name))
+        if start_delays:
+            logger.info("Restored state of {} sessions with a planned wake time", len(start_delays))
+
+        for session_name in removed:
+            self.scheduler.remove(session_name)
+            del self.bots[session_name]
+            get_metrics().remove_account(session_name)
+            self._disconnect_client(session_name)
+
+        self.added += len(added)
+        self.retired += len(removed)
+        return added, removed
+
+    def _disconnect_client(self, session_name: str):
+        """Schedules the disconnect of a retired session's pooled Telegram client, if it has one."""
+        # Telegram clients only exist when a session needed one
+        telegram_handler = sys.modules.get("bot.telegram_handler")
+        if telegram_handler is None:
+            return
+        task = asyncio.get_running_loop().create_task(self._disconnect(telegram_handler.client_pool, session_name))
+        self._disconnects.add(task)
+        task.add_done_callback(self._disconnects.discard)
+
+    async def _disconnect(self, client_pool, session_name: str):
+        try:
+            await client_pool.remove(session_name)
+        except Exception as error:
+            logger.warning("{} | Failed to disconnect the retired session's client: {}", session_name, error)
+
+    def load(self):
+        """Reads the sessions directory once and schedules every session found."""
+        self.sync(self.session_names())
+
+    async def watch(self):
+        """Rescans the sessions directory every watch interval until cancelled."""
+        while True:
+            await asyncio.sleep(self.watch_interval)
+            session_names = await asyncio.to_thread(self.session_names)
+            added, removed = self.sync(session_names)
+            if added:
+                logger.success("Started {} new sessions: {}", len(added), ", ".join(added))
+            if removed:
+                logger.warning("Retired {} deleted sessions: {}", len(removed), ", ".join(removed))
+
+    async def run(self):
+        """Runs the scheduler, and the directory watcher when enabled, until cancelled."""
+        tasks = [asyncio.create_task(self.scheduler.run())]
+        if self.watch_interval > 0:
+            tasks.append(asyncio.create_task(self.watch()))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {"sessions": len(self), "added": self.added, "retired": self.retired}
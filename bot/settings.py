@@ -0,0 +1,159 @@
+import configparser
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from loguru import logger
+from pydantic import ValidationError, field_validator
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from bot.utils import load_config
+
+# Load configurations from the .conf file
+config = load_config()
+
+# Extract settings reload options from the configuration
+CONFIG_FILE = ".conf"
+OVERRIDES_DIR = config.get("sessions", "directory", fallback="sessions")
+# Seconds between checks whether .conf or an account's override file changed
+RELOAD_INTERVAL = config.getfloat("settings", "reload_interval", fallback=5.0)
+
+
+def parse_range(value) -> Optional[Tuple[int, int]]:
+    """Parses "min-max" into an ordered pair of ints; anything else (such as TRUE/FALSE) turns the range off."""
+    if value is None or isinstance(value, tuple):
+        return value
+    parts = str(value).replace(" ", "").split("-")
+    if len(parts) != 2 or not all(part.isdigit() for part in parts):
+        return None
+    low, high = int(parts[0]), int(parts[1])
+    return (low, high) if low <= high else (high, low)
+
+
+class BotSettings(BaseSettings):
+    """[bot] settings of one account, validated and precomputed once per change of the config files.
+
+    Values come from the [bot] section of .conf, overridden by the [bot] section of
+    sessions/<name>.conf; empty values keep the defaults. QLYUKER_<NAME> environment variables
+    fill in what neither file sets.
+    """
+
+    model_config = SettingsConfigDict(env_prefix="QLYUKER_", frozen=True, extra="ignore")
+
+    tap_count: int = 0
+    random_tap_count: Optional[Tuple[int, int]] = None
+    sleep_per_tap: int = 0
+    random_sleep_per_tap: Optional[Tuple[int, int]] = None
+    min_save_energy: int = 0
+    min_save_balance: int = 0
+    use_auto_upgrades: bool = True
+    max_upgrade_lvl: int = 0
+    max_upgrade_cost: int = 0
+    min_upgrade_profit: int = 0
+    use_daily_energy: bool = True
+    use_max_energy_taps: bool = False
+
+    @field_validator("random_tap_count", "random_sleep_per_tap", mode="before")
+    @classmethod
+    def _parse_range(cls, value):
+        return parse_range(value)
+
+
+def read_section(path: str, section: str = "bot") -> Dict[str, str]:
+    """Non-empty values of one section of an INI file; a missing file or section gives {}."""
+    parser = configparser.ConfigParser()
+    parser.read(path, encoding="utf-8")
+    if not parser.has_section(section):
+        return {}
+    return {key: value for key, value in parser.items(section) if value.strip() != ""}
+
+
+def file_mtime(path: str) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+class SettingsRegistry:
+    """Per-account BotSettings, rebuilt only when .conf or the account's override file changes.
+
+    Files are checked at most once per `reload_interval`, on the next lookup, so running sessions
+    pick up new values at their next cycle without a restart. A file that fails validation is
+    reported and the previous settings stay in use.
+    """
+
+    def __init__(self, config_file: str = CONFIG_FILE, overrides_dir: str = OVERRIDES_DIR,
+                 reload_interval: float = RELOAD_INTERVAL):
+        self.config_file = config_file
+        self.overrides_dir = overrides_dir
+        self.reload_interval = reload_interval
+        self.base: Dict[str, str] = {}
+        self.base_mtime = None
+        self.version = 0
+        self.checked_at = float("-inf")
+        # name -> [base version, override mtime, checked at, settings]
+        self.accounts: Dict[str, list] = {}
+        self.reloads = 0
+        self._check_base(time.monotonic())
+
+    def override_path(self, name: str) -> str:
+        return os.path.join(self.overrides_dir, f"{name}.conf")
+
+    def _check_base(self, now: float):
+        self.checked_at = now
+        mtime = file_mtime(self.config_file)
+        if mtime == self.base_mtime:
+            return
+        base = read_section(self.config_file)
+        try:
+            BotSettings(**base)
+        except ValidationError as error:
+            logger.error(f"Settings | invalid [bot] section in {self.config_file}, keeping the previous values: {error}")
+            self.base_mtime = mtime
+            return
+        if self.base_mtime is not None:
+            self.reloads += 1
+            logger.info(f"Settings | reloaded [bot] section of {self.config_file}")
+        self.base = base
+        self.base_mtime = mtime
+        self.version += 1
+
+    def for_account(self, name: str) -> BotSettings:
+        """Current settings of an account."""
+        now = time.monotonic()
+        if now - self.checked_at >= self.reload_interval:
+            self._check_base(now)
+
+        entry = self.accounts.get(name)
+        if entry is not None and entry[0] == self.version and now - entry[2] < self.reload_interval:
+            return entry[3]
+
+        path = self.override_path(name)
+        mtime = file_mtime(path)
+        if entry is not None and entry[0] == self.version and entry[1] == mtime:
+            entry[2] = now
+            return entry[3]
+
+        try:
+            settings = BotSettings(**dict(self.base, **read_section(path)))
+        except ValidationError as error:
+            logger.error(f"Settings | invalid [bot] section in {path}, keeping the previous values: {error}")
+            settings = entry[3] if entry is not None else BotSettings(**self.base)
+        self.accounts[name] = [self.version, mtime, now, settings]
+        return settings
+
+
+_registry = None
+
+
+def get_settings_registry() -> SettingsRegistry:
+    """Returns the process-wide settings registry."""
+    global _registry
+    if _registry is None:
+        _registry = SettingsRegistry()
+    return _registry
+
+
+def settings_for(name: str) -> BotSettings:
+    """Current settings of the account `name`."""
+    return get_settings_registry().for_account(name)
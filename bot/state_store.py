@@ -0,0 +1,185 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from loguru import logger
+from bot.utils import load_config
+
+# Load configurations from the .conf file
+config = load_config()
+
+# Extract state store settings from the configuration
+STATE_ENABLED = config.getboolean("state", "enabled", fallback=True)
+STATE_FILE = config.get("state", "file", fallback="cache/state.sqlite3")
+STATE_FLUSH_INTERVAL = config.getfloat("state", "flush_interval", fallback=5.0)
+# Accounts whose wake time passed while the bot was down are resumed at this many per second
+RESUME_RATE = config.getfloat("state", "resume_rate", fallback=5.0)
+
+COLUMNS = ("auth", "next_wake_at", "last_error", "last_error_at", "updated_at")
+JSON_COLUMNS = ("auth",)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    name TEXT PRIMARY KEY,
+    auth TEXT,
+    next_wake_at REAL,
+    last_error TEXT,
+    last_error_at REAL,
+    updated_at REAL
+)
+"""
+
+
+class StateStore:
+    """SQLite (WAL) store of per-account state, so restarts resume where the last run stopped.
+
+    Each account keeps its last auth snapshot, next planned wake time and last error; upgrade
+    cooldowns come back with the snapshot's upgrades. update() only records the latest values in memory; flush() writes every
+    account changed since the previous flush in one transaction, so thousands of accounts cost
+    one commit per flush interval instead of one per cycle.
+    """
+
+    def __init__(self, path: str = STATE_FILE, flush_interval: float = STATE_FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.pending: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self.flushes = 0
+        self.rows_written = 0
+
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Flushes run in a worker thread; the write lock keeps them serialized
+            self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            # WAL with NORMAL only syncs at checkpoints; a crash loses at most the last flushes
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(SCHEMA)
+            self._connection.commit()
+        return self._connection
+
+    def load_all(self) -> Dict[str, Dict]:
+        """Returns the stored state of every account."""
+        return self._select("")
+
+    def load(self, name: str) -> Optional[Dict]:
+        """Returns the stored state of one account, or None."""
+        return self._select(" WHERE name = ?", (name,)).get(name)
+
+    def _select(self, where: str, params: tuple = ()) -> Dict[str, Dict]:
+        try:
+            with self._write_lock:
+                cursor = self.connection().execute(f"SELECT name, {', '.join(COLUMNS)} FROM accounts{where}", params)
+                rows = cursor.fetchall()
+        except sqlite3.Error as error:
+            logger.warning(f"Failed to load account state from {self.path}: {error}")
+            return {}
+
+        states = {}
+        for row in rows:
+            state = dict(zip(COLUMNS, row[1:]))
+            for column in JSON_COLUMNS:
+                try:
+                    state[column] = json.loads(state[column]) if state[column] else None
+                except ValueError:
+                    state[column] = None
+            states[row[0]] = state
+        return states
+
+    def update(self, name: str, **fields):
+        """Records new values of an account; they are written on the next flush."""
+        # Serialized now, while the caller's dicts cannot change underneath the flush thread
+        for column in JSON_COLUMNS:
+            if column in fields:
+                fields[column] = json.dumps(fields[column])
+        fields["updated_at"] = time.time()
+        with self._lock:
+            self.pending.setdefault(name, {}).update(fields)
+
+    def flush(self):
+        """Writes all pending account updates in one transaction."""
+        with self._lock:
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return
+        # Only the swap holds the pending lock, so update() never waits for the disk
+        with self._write_lock:
+            try:
+                connection = self.connection()
+                with connection:
+                    for name, fields in pending.items():
+                        connection.execute(
+                            f"INSERT INTO accounts (name, {', '.join(fields)}) "
+                            f"VALUES (?{', ?' * len(fields)}) "
+                            f"ON CONFLICT(name) DO UPDATE SET "
+                            f"{', '.join(f'{column} = excluded.{column}' for column in fields)}",
+                            [name] + list(fields.values()))
+                self.flushes += 1
+                self.rows_written += len(pending)
+            except sqlite3.Error as error:
+                # Keep the updates for the next flush; newer values win
+                with self._lock:
+                    for name, fields in pending.items():
+                        self.pending[name] = dict(fields, **self.pending.get(name, {}))
+                logger.warning(f"Failed to save account state to {self.path}: {error}")
+
+    async def run(self):
+        """Flushes pending updates every flush interval until cancelled."""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await asyncio.to_thread(self.flush)
+
+    def close(self):
+        """Flushes pending updates and closes the database."""
+        self.flush()
+        with self._write_lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def stats(self) -> dict:
+        return {"pending": len(self.pending), "flushes": self.flushes, "rows_written": self.rows_written}
+
+
+def resume_delays(states: Dict[str, Dict], session_names, now: float = None,
+                  resume_rate: float = RESUME_RATE) -> Dict[str, float]:
+    """Start delays of sessions with a stored wake time.
+
+    Sessions wake at their planned time. Those whose time passed while the bot was down are
+    resumed in order of how overdue they are, `resume_rate` per second. Sessions without a
+    stored wake time are left out and get the usual random start delay.
+    """
+    now = time.time() if now is None else now
+    delays = {}
+    overdue = []
+    for session_name in session_names:
+        wake_at = (states.get(session_name) or {}).get("next_wake_at")
+        if wake_at is None:
+            continue
+        if wake_at > now:
+            delays[session_name] = wake_at - now
+        else:
+            overdue.append((wake_at, session_name))
+    for position, (_, session_name) in enumerate(sorted(overdue)):
+        delays[session_name] = position / resume_rate if resume_rate > 0 else 0.0
+    return delays
+
+
+_store = None
+
+
+def get_state_store() -> StateStore:
+    """Returns the process-wide state store."""
+    global _store
+    if _store is None:
+        _store = StateStore()
+    return _store
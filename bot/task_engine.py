@@ -0,0 +1,138 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from loguru import logger
+from bot.utils import load_config
+from bot.game_state import Task
+from bot.retry import CircuitOpenError
+
+# Load configurations from the .conf file
+config = load_config()
+
+# Extract task engine settings from the configuration
+TASK_CONCURRENCY = config.getint("tasks", "concurrency", fallback=2)
+# Tasks due within this many seconds are awaited in the running cycle instead of a later wake-up
+TASK_WAIT_HORIZON = config.getfloat("tasks", "wait_horizon", fallback=30.0)
+TASK_RETRY_INTERVAL = config.getfloat("tasks", "retry_interval", fallback=300.0)
+TASK_MAX_ATTEMPTS = config.getint("tasks", "max_attempts", fallback=3)
+
+
+class PendingTask:
+    """A started task of an account with the time its check becomes allowed."""
+    __slots__ = ("task", "due_at", "checked", "attempts")
+
+    def __init__(self, task: Task):
+        self.task = task
+        self.due_at = task.time + task.check_delay
+        self.checked = False
+        self.attempts = 0
+
+
+class TaskEngine:
+    """Due times of an account's unfinished tasks; checks and claims run when each becomes eligible.
+
+    A task is due `meta.checkDelay` seconds after its `time`. Every cycle hands the fresh task list
+    to `update`, then `run` checks and claims the tasks due within the wait horizon, each as soon
+    as it is due and at most `concurrency` at a time. Later due times shorten the account's next
+    sleep through `wake_delay`. Tasks without a start time are never started by the bot and are
+    not tracked.
+    """
+
+    def __init__(self, account: str, concurrency: int = TASK_CONCURRENCY, wait_horizon: float = TASK_WAIT_HORIZON,
+                 retry_interval: float = TASK_RETRY_INTERVAL, max_attempts: int = TASK_MAX_ATTEMPTS):
+        self.account = account
+        self.concurrency = max(1, concurrency)
+        self.wait_horizon = wait_horizon
+        self.retry_interval = retry_interval
+        self.max_attempts = max(1, max_attempts)
+        self.pending: Dict[str, PendingTask] = {}
+        # Claimed or abandoned tasks, ignored until the server stops listing them
+        self.finished: Set[str] = set()
+        self.checked = 0
+        self.claimed = 0
+        self.abandoned = 0
+
+    def __len__(self):
+        return len(self.pending)
+
+    def update(self, tasks: List[Task]):
+        """Tracks the unfinished tasks of a fresh payload and forgets those the server no longer lists."""
+        listed = set()
+        for task in tasks:
+            if task.id is None or task.time is None or task.check_delay is None:
+                continue
+            listed.add(task.id)
+            if task.id in self.finished:
+                continue
+            entry = self.pending.get(task.id)
+            if task.completed and (entry is None or not entry.checked):
+                # Completed outside this engine, or before it was tracked
+                self.pending.pop(task.id, None)
+                continue
+            if entry is None:
+                self.pending[task.id] = PendingTask(task)
+            else:
+                entry.task = task
+        for task_id in self.pending.keys() - listed:
+            del self.pending[task_id]
+        self.finished &= listed
+
+    def next_due(self) -> Optional[float]:
+        """Earliest due time of a tracked task, as a Unix timestamp."""
+        return min((entry.due_at for entry in self.pending.values()), default=None)
+
+    def wake_delay(self, sleep_time: float, now: float = None) -> float:
+        """Shortens the sleep before the next cycle so it starts when the next task becomes due."""
+        due_at = self.next_due()
+        if due_at is None:
+            return sleep_time
+        now = time.time() if now is None else now
+        return min(sleep_time, max(1, int(due_at - now) + 1))
+
+    async def run(self, check: Callable[[Task], Awaitable], claim: Callable[[Task], Awaitable]) -> int:
+        """Checks and claims every task due within the wait horizon and returns how many were claimed."""
+        horizon = time.time() + self.wait_horizon
+        due = sorted((entry for entry in self.pending.values() if entry.due_at <= horizon), key=lambda e: e.due_at)
+        if not due:
+            return 0
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results = await asyncio.gather(*(self._finish(entry, check, claim, semaphore) for entry in due))
+        return sum(results)
+
+    async def _finish(self, entry: PendingTask, check, claim, semaphore: asyncio.Semaphore) -> bool:
+        delay = entry.due_at - time.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        async with semaphore:
+            try:
+                if not entry.checked:
+                    if not await check(entry.task):
+                        self._retry(entry)
+                        return False
+                    entry.checked = True
+                    self.checked += 1
+                if not await claim(entry.task):
+                    self._retry(entry)
+                    return False
+            except CircuitOpenError as error:
+                # Not the task's fault; try again once the API is probed
+                entry.due_at = time.time() + error.retry_in
+                return False
+        self.pending.pop(entry.task.id, None)
+        self.finished.add(entry.task.id)
+        self.claimed += 1
+        return True
+
+    def _retry(self, entry: PendingTask):
+        entry.attempts += 1
+        if entry.attempts >= self.max_attempts:
+            logger.warning(f"{self.account} | Giving up on task {entry.task.id} after {entry.attempts} attempts")
+            self.pending.pop(entry.task.id, None)
+            self.finished.add(entry.task.id)
+            self.abandoned += 1
+            return
+        entry.due_at = time.time() + self.retry_interval
+
+    def stats(self) -> dict:
+        return {"pending": len(self), "checked": self.checked, "claimed": self.claimed, "abandoned": self.abandoned}
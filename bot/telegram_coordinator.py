@@ -0,0 +1,173 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Awaitable, Callable, Dict, Tuple
+
+from loguru import logger
+from bot.utils import load_config
+from bot.rate_limit import TokenBucket, parse_limit
+
+# Load configurations from the .conf file
+config = load_config()
+
+# Extract Telegram call limits from the configuration; all sessions share one api_id, so the
+# limits apply to the whole farm. Each method is "calls per second, burst"
+DEFAULT_TELEGRAM_LIMITS = {
+    "connect": "2, 4",
+    "resolve_peer": "0.5, 2",
+    "web_view": "1, 3",
+}
+# FloodWaits up to this many seconds are waited out in the queue; longer ones fail the login
+FLOOD_MAX_WAIT = config.getfloat("telegram", "flood_max_wait", fallback=300.0)
+# Longest pause of a method for every session after one of them got a FloodWait
+FLOOD_PAUSE_MAX = config.getfloat("telegram", "flood_pause_max", fallback=30.0)
+
+
+class MethodGate:
+    """Shared limit of one MTProto method with its waiting sessions ordered by the time they may call.
+
+    A session that got a FloodWait queues with its deadline, everyone else with the time they
+    arrived, so the earliest caller that is allowed goes next. A FloodWait halves the rate and
+    briefly pauses the method for all sessions; every successful call restores a twentieth of the
+    configured rate.
+    """
+
+    def __init__(self, name: str, rate: float, burst: float):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.max_rate = rate
+        self.min_rate = rate / 16
+        self.heap = []
+        self._counter = itertools.count()
+        self._timer = None
+        self.granted = 0
+        self.waited = 0
+        self.floods = 0
+
+    async def acquire(self, ready_at: float = 0.0):
+        """Waits until this method may be called, not before `ready_at` (monotonic time)."""
+        now = time.monotonic()
+        if not self.heap and ready_at <= now and self.bucket.try_take(now):
+            self.granted += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.heap, (max(ready_at, now), next(self._counter), future))
+        self._reschedule()
+        await future
+
+    def _reschedule(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self.heap:
+            now = time.monotonic()
+            delay = max(self.heap[0][0] - now, self.bucket.wait_time(now))
+            self._timer = asyncio.get_running_loop().call_later(delay, self._release)
+
+    def _release(self):
+        self._timer = None
+        now = time.monotonic()
+        while self.heap:
+            ready_at, _, future = self.heap[0]
+            # Cancelled waiters are dropped without using a token
+            if future.done():
+                heapq.heappop(self.heap)
+                continue
+            if ready_at > now or not self.bucket.try_take(now):
+                break
+            heapq.heappop(self.heap)
+            future.set_result(None)
+            self.granted += 1
+            self.waited += 1
+        self._reschedule()
+
+    def flood(self, seconds: float):
+        """Slows the method down after Telegram answered FloodWait."""
+        now = time.monotonic()
+        self.floods += 1
+        self.bucket.refill(now)
+        self.bucket.rate = max(self.min_rate, self.bucket.rate / 2)
+        self.bucket.tokens = 0
+        self.bucket.paused_until = max(self.bucket.paused_until, now + min(seconds, FLOOD_PAUSE_MAX))
+        if self.heap:
+            self._reschedule()
+
+    def success(self):
+        if self.bucket.rate < self.max_rate:
+            self.bucket.refill(time.monotonic())
+            self.bucket.rate = min(self.max_rate, self.bucket.rate + self.max_rate / 20)
+
+    def stats(self) -> dict:
+        return {"rate": self.bucket.rate, "queue_depth": len(self.heap), "granted": self.granted,
+                "waited": self.waited, "floods": self.floods}
+
+
+class TelegramCoordinator:
+    """Process-wide gate for the MTProto calls of every session: connect, resolve_peer and the web view.
+
+    Remembers the FloodWait deadline of each session and method, so a session is not sent to
+    Telegram again before its deadline, and waiting sessions are served in deadline order.
+    """
+
+    def __init__(self, limits: Dict[str, Tuple[float, float]] = None, max_wait: float = FLOOD_MAX_WAIT):
+        if limits is None:
+            limits = {name: parse_limit(config.get("telegram", name, fallback=default), f"[telegram] {name}")
+                      for name, default in DEFAULT_TELEGRAM_LIMITS.items()}
+        self.gates = {name: MethodGate(name, rate, burst) for name, (rate, burst) in limits.items()}
+        self.max_wait = max_wait
+        # (session, method) -> monotonic time its FloodWait ends
+        self.deadlines: Dict[Tuple[str, str], float] = {}
+
+    def scale(self, factor: float):
+        """Scales every method's rate and burst, e.g. to split the api_id's limits between worker processes."""
+        for gate in self.gates.values():
+            bucket = gate.bucket
+            gate.max_rate *= factor
+            gate.min_rate *= factor
+            bucket.rate *= factor
+            bucket.burst = max(1.0, bucket.burst * factor)
+            bucket.tokens = min(bucket.tokens, bucket.burst)
+
+    def ready_in(self, session: str) -> float:
+        """Seconds until every FloodWait of `session` has ended."""
+        now = time.monotonic()
+        return max([deadline - now for (name, _), deadline in self.deadlines.items() if name == session] + [0.0])
+
+    async def call(self, session: str, method: str, func: Callable[[], Awaitable]):
+        """Runs `func` as a `method` call of `session` within the shared limits, waiting out FloodWaits.
+
+        A FloodWait longer than the maximum wait is raised to the caller; its deadline is kept.
+        """
+        from pyrogram.errors import FloodWait
+        gate = self.gates[method]
+        key = (session, method)
+        while True:
+            deadline = self.deadlines.get(key, 0.0)
+            if deadline - time.monotonic() > self.max_wait:
+                raise FloodWait(value=int(deadline - time.monotonic()))
+            await gate.acquire(deadline)
+            try:
+                result = await func()
+            except FloodWait as fl:
+                self.deadlines[key] = time.monotonic() + fl.value
+                gate.flood(fl.value)
+                logger.warning(f"{session} | FloodWait of {fl.value}s on {method}")
+                continue
+            self.deadlines.pop(key, None)
+            gate.success()
+            return result
+
+    def stats(self) -> dict:
+        return {name: gate.stats() for name, gate in self.gates.items()}
+
+
+_coordinator = None
+
+
+def get_telegram_coordinator() -> TelegramCoordinator:
+    """Returns the process-wide Telegram coordinator."""
+    global _coordinator
+    if _coordinator is None:
+        _coordinator = TelegramCoordinator()
+    return _coordinator
@@ -1,9 +1,130 @@
 import asyncio
-from pyrogram import Client
+import json
+import os
+from collections import OrderedDict
+from pyrogram import Client, raw
 from pyrogram.raw.functions.messages import RequestWebView
 from pyrogram.errors import FloodWait, Unauthorized, UserDeactivated, AuthKeyUnregistered
 from urllib.parse import unquote, urlparse, parse_qs
 from loguru import logger
+from bot.utils import load_config
+from bot.endpoints import web_url
+from bot.telegram_coordinator import get_telegram_coordinator
+
+# Load configurations from the .conf file
+config = load_config()
+
+# Extract Telegram connection settings from the configuration
+KEEP_CONNECTED = config.getint("telegram", "keep_connected", fallback=0)
+PEER_CACHE = config.getboolean("telegram", "peer_cache", fallback=True)
+
+BOT_USERNAME = "qlyukerbot"
+
+# Input peer types that can be rebuilt from a cached (id, access_hash) pair
+PEER_TYPES = {
+    "InputPeerUser": (raw.types.InputPeerUser, "user_id"),
+    "InputPeerChannel": (raw.types.InputPeerChannel, "channel_id"),
+}
+
+
+class PeerCache:
+    """Resolved peers of one session, stored next to its .session file."""
+
+    def __init__(self, client: Client):
+        self.path = os.path.join(str(client.workdir), f"{client.name}.peers.json")
+        self._peers = None
+
+    def _load(self) -> dict:
+        if self._peers is None:
+            self._peers = {}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        self._peers = json.load(f)
+                except (OSError, ValueError) as error:
+                    logger.warning(f"Failed to load peer cache {self.path}: {error}")
+        return self._peers
+
+    def get(self, username: str):
+        """Returns the cached input peer for `username`, or None."""
+        entry = self._load().get(username)
+        if not entry or entry.get("type") not in PEER_TYPES:
+            return None
+        peer_type, id_field = PEER_TYPES[entry["type"]]
+        return peer_type(**{id_field: entry["id"], "access_hash": entry["access_hash"]})
+
+    def put(self, username: str, peer):
+        """Stores a resolved input peer for `username`."""
+        peer_name = type(peer).__name__
+        if peer_name not in PEER_TYPES:
+            return
+        _, id_field = PEER_TYPES[peer_name]
+        self._load()[username] = {"type": peer_name, "id": getattr(peer, id_field), "access_hash": peer.access_hash}
+        self._save()
+
+    def drop(self, username: str):
+        """Forgets a cached peer that Telegram no longer accepts."""
+        if self._load().pop(username, None) is not None:
+            self._save()
+
+    def _save(self):
+        try:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._peers, f)
+            os.replace(tmp_path, self.path)
+        except OSError as error:
+            logger.warning(f"Failed to save peer cache {self.path}: {error}")
+
+
+class ClientPool:
+    """Keeps up to `capacity` Pyrogram clients connected, disconnecting the least recently used."""
+
+    def __init__(self, capacity: int = KEEP_CONNECTED):
+        self.capacity = capacity
+        self._idle = OrderedDict()
+        self._in_use = set()
+        # Retired sessions whose client was busy; it is disconnected on release instead of pooled
+        self._retired = set()
+
+    def acquire(self, client: Client):
+        """Marks a client as busy so it is never evicted mid-request."""
+        self._in_use.add(client.name)
+        self._idle.pop(client.name, None)
+
+    async def release(self, client: Client):
+        """Returns a client to the pool, or disconnects it when pooling is disabled."""
+        self._in_use.discard(client.name)
+        if self.capacity <= 0 or client.name in self._retired:
+            self._retired.discard(client.name)
+            if client.is_connected:
+                await client.disconnect()
+            return
+
+        self._idle[client.name] = client
+        self._idle.move_to_end(client.name)
+        while len(self._idle) + len(self._in_use) > self.capacity and self._idle:
+            _, evicted = self._idle.popitem(last=False)
+            if evicted.is_connected:
+                await evicted.disconnect()
+
+    async def remove(self, name: str):
+        """Disconnects the client of a retired session, now if it is idle or once it is released."""
+        if name in self._in_use:
+            self._retired.add(name)
+        client = self._idle.pop(name, None)
+        if client is not None and client.is_connected:
+            await client.disconnect()
+
+    async def close(self):
+        """Disconnects every pooled client."""
+        while self._idle:
+            _, client = self._idle.popitem(last=False)
+            if client.is_connected:
+                await client.disconnect()
+
+
+client_pool = ClientPool()
 
 
 class TelegramHandler:
@@ -11,34 +132,48 @@ class TelegramHandler:
         self.client = client
         self.session_name = session_name
         self.platform = platform
+        self.peer_cache = PeerCache(client) if PEER_CACHE else None
+
+    async def resolve_bot_peer(self):
+        """Resolves the game bot, using the on-disk peer cache before asking Telegram."""
+        if self.peer_cache is not None:
+            peer = self.peer_cache.get(BOT_USERNAME)
+            if peer is not None:
+                return peer
+
+        peer = await get_telegram_coordinator().call(self.session_name, "resolve_peer",
+                                                     lambda: self.client.resolve_peer(BOT_USERNAME))
+
+        if self.peer_cache is not None:
+            self.peer_cache.put(BOT_USERNAME, peer)
+        return peer
 
     async def get_tg_web_data(self):
         """Fetches Telegram web data needed for authentication."""
+        client_pool.acquire(self.client)
         try:
             if not self.client.is_connected:
                 try:
-                    await self.client.connect()
+                    await get_telegram_coordinator().call(self.session_name, "connect", self.client.connect)
                 except (Unauthorized, UserDeactivated, AuthKeyUnregistered):
                     logger.error(f"{self.session_name} | Authorization failed")
                     return None, None
 
-            while True:
-                try:
-                    peer = await self.client.resolve_peer("qlyukerbot")
-                    break
-                except FloodWait as fl:
-                    logger.warning(f"{self.session_name} | FloodWait {fl}")
-                    await asyncio.sleep(fl.value * 2)
-
-            web_view = await self.client.invoke(
-                RequestWebView(
-                    peer=peer,
-                    bot=peer,
-                    platform=self.platform,
-                    from_bot_menu=False,
-                    url="https://qlyuker.io/",
-                )
-            )
+            from_cache = self.peer_cache is not None and self.peer_cache.get(BOT_USERNAME) is not None
+            peer = await self.resolve_bot_peer()
+
+            try:
+                web_view = await self.invoke_web_view(peer)
+            except FloodWait:
+                raise
+            except Exception as error:
+                if not from_cache:
+                    raise
+                # A stale cached access_hash is rejected by Telegram; resolve again once
+                logger.warning(f"{self.session_name} | Cached peer rejected, resolving again: {error}")
+                self.peer_cache.drop(BOT_USERNAME)
+                peer = await self.resolve_bot_peer()
+                web_view = await self.invoke_web_view(peer)
 
             auth_url = web_view.url
             tg_web_data = unquote(
@@ -46,16 +181,33 @@ class TelegramHandler:
             )
             query_id = parse_qs(urlparse(web_view.url).fragment).get("tgWebAppData", [None])[0]
 
-            if self.client.is_connected:
-                await self.client.disconnect()
-
             return tg_web_data, query_id
 
         except FloodWait as fl:
-            logger.warning(f"{self.session_name} | FloodWait {fl}")
-            await asyncio.sleep(fl.value * 2)
+            # Longer than the coordinator waits; the session retries once ready_in() has passed
+            logger.warning(f"{self.session_name} | FloodWait {fl}, next attempt in {self.ready_in():.0f}s")
+            return None, None
 
         except Exception as error:
             logger.error(f"{self.session_name} | Unknown error while getting Tg Web Data: {error}")
             await asyncio.sleep(3)
-            return None, None
\ No newline at end of file
+            return None, None
+
+        finally:
+            await client_pool.release(self.client)
+
+    async def invoke_web_view(self, peer):
+        """Requests the game web view for the resolved bot peer."""
+        return await get_telegram_coordinator().call(self.session_name, "web_view", lambda: self.client.invoke(
+            RequestWebView(
+                peer=peer,
+                bot=peer,
+                platform=self.platform,
+                from_bot_menu=False,
+                url=web_url(),
+            )
+        ))
+
+    def ready_in(self) -> float:
+        """Seconds until Telegram accepts calls of this session again after a FloodWait."""
+        return get_telegram_coordinator().ready_in(self.session_name)
@@ -0,0 +1,216 @@
+import asyncio
+import atexit
+import json
+import os
+import time
+from collections import deque
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from bot.utils import load_config
+
+# Load configurations from the .conf file
+config = load_config()
+
+# Extract tracing settings from the configuration
+TRACING_ENABLED = config.getboolean("tracing", "enabled", fallback=False)
+# "chrome" writes one trace-event JSON file on exit, "jsonl" appends events to a rolling file as they finish
+TRACE_FORMAT = config.get("tracing", "format", fallback="chrome")
+TRACE_FILE = config.get("tracing", "file", fallback="logs/trace-{pid}.json")
+TRACE_MAX_EVENTS = config.getint("tracing", "max_events", fallback=200000)
+TRACE_MAX_BYTES = config.getint("tracing", "max_bytes", fallback=50 * 1024 * 1024)
+# JSONL events are written in batches of this many lines
+TRACE_FLUSH_EVENTS = 1000
+
+
+class NullSpan:
+    """Span returned while tracing is off; entering, leaving and tagging it do nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    """A timed phase of one account, recorded as a Chrome "complete" event when it ends."""
+
+    __slots__ = ("tracer", "name", "cat", "account", "args", "start", "lane")
+
+    def __init__(self, tracer: "Tracer", name: str, cat: str, account: Hashable, args: Dict):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.account = account
+        self.args = args
+        self.start = 0.0
+        self.lane = 0
+
+    def __enter__(self):
+        self.lane = self.tracer.acquire_lane(self.account)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer.record(self, time.perf_counter())
+        self.tracer.release_lane(self.account, self.lane)
+        return False
+
+    def set(self, **args):
+        """Adds arguments shown with the span, e.g. the status of a request."""
+        self.args.update(args)
+
+
+class Tracer:
+    """Collects per-phase spans of farming cycles and exports them as Chrome trace events.
+
+    Each account is shown as its own thread in chrome://tracing or Perfetto. Spans of one asyncio
+    task nest, but those of concurrent tasks (e.g. the checks of several tasks) may overlap, so
+    every task that opens a span while another of the account's tasks has one open gets its own
+    lane, shown as a further thread "<account> #2", "#3" and so on. In "chrome" format
+    the latest `max_events` events are kept in memory and written on close; in "jsonl" format
+    events are appended to `path` in batches, and the file is rolled over to `path`.1 when it
+    grows beyond `max_bytes`.
+    """
+
+    def __init__(self, enabled: bool = TRACING_ENABLED, path: str = TRACE_FILE, fmt: str = TRACE_FORMAT,
+                 max_events: int = TRACE_MAX_EVENTS, max_bytes: int = TRACE_MAX_BYTES):
+        self.enabled = enabled
+        self.path = path.format(pid=os.getpid())
+        self.format = fmt
+        self.max_bytes = max_bytes
+        self.pid = os.getpid()
+        self.events = deque(maxlen=max_events)
+        self.pending: List[str] = []
+        # (account, lane) -> tid
+        self.threads: Dict[Tuple[Hashable, int], int] = {}
+        # account -> [task, open spans] of each lane
+        self.lanes: Dict[Hashable, List[list]] = {}
+        # Maps perf_counter() readings to wall-clock microseconds
+        self.origin = time.time() * 1e6 - time.perf_counter() * 1e6
+
+    def span(self, name: str, account: Hashable = None, cat: str = "phase", **args):
+        """Returns a context manager timing `name` for `account`; a shared no-op span when tracing is off."""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, cat, account, args)
+
+    def thread_name_event(self, key: Tuple[Hashable, int], tid: int) -> Dict:
+        account, lane = key
+        name = str(account) if account is not None else "main"
+        if lane:
+            name = f"{name} #{lane + 1}"
+        return {"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}}
+
+    def thread_id(self, account: Hashable, lane: int = 0) -> int:
+        key = (account, lane)
+        tid = self.threads.get(key)
+        if tid is None:
+            tid = self.threads[key] = len(self.threads) + 1
+            # Chrome exports add all thread names on close
+            if self.format == "jsonl":
+                self.emit(self.thread_name_event(key, tid))
+        return tid
+
+    def acquire_lane(self, account: Hashable) -> int:
+        """Lane of a span opened now: the one the current task already has open, else the first free one."""
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        lanes = self.lanes.setdefault(account, [])
+        free = None
+        for index, lane in enumerate(lanes):
+            if lane[1] and lane[0] is task:
+                lane[1] += 1
+                return index
+            if free is None and not lane[1]:
+                free = index
+        if free is None:
+            free = len(lanes)
+            lanes.append([None, 0])
+            # Reserved now, so an account's lanes get consecutive thread ids in the order they open
+            self.thread_id(account, free)
+        lanes[free][:] = [task, 1]
+        return free
+
+    def release_lane(self, account: Hashable, lane: int):
+        self.lanes[account][lane][1] -= 1
+
+    def record(self, span: Span, end: float):
+        start_us = self.origin + span.start * 1e6
+        self.emit({"name": span.name, "cat": span.cat, "ph": "X", "ts": round(start_us, 1),
+                   "dur": round((end - span.start) * 1e6, 1), "pid": self.pid,
+                   "tid": self.thread_id(span.account, span.lane), "args": span.args})
+
+    def emit(self, event: Dict):
+        if self.format == "jsonl":
+            self.pending.append(json.dumps(event, default=str))
+            if len(self.pending) >= TRACE_FLUSH_EVENTS:
+                self.flush()
+        else:
+            self.events.append(event)
+
+    def flush(self):
+        """Appends pending JSONL events to the trace file, rolling it over when it is too large."""
+        if not self.pending:
+            return
+        self._ensure_directory()
+        if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+            os.replace(self.path, f"{self.path}.1")
+            # The new file starts without thread names; repeat them
+            self.pending[:0] = [json.dumps(self.thread_name_event(key, tid))
+                                for key, tid in self.threads.items()]
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write("\n".join(self.pending) + "\n")
+        self.pending.clear()
+
+    def _ensure_directory(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def close(self):
+        """Writes out the collected events."""
+        if not self.enabled:
+            return
+        if self.format == "jsonl":
+            self.flush()
+            return
+        if not self.events:
+            return
+        self._ensure_directory()
+        events = [self.thread_name_event(key, tid) for key, tid in self.threads.items()]
+        events += self.events
+        with open(self.path, "w", encoding="utf-8") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file, default=str)
+
+
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Tracer:
+    """Returns the process-wide tracer."""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+    return _tracer
+
+
+def close_tracer():
+    """Writes out the process-wide tracer's events; called on exit."""
+    if _tracer is not None:
+        _tracer.close()
+
+
+atexit.register(close_tracer)
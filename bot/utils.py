@@ -1,7 +1,6 @@
 import asyncio
 import aiohttp
 import configparser
-import json
 from loguru import logger
 
 def load_config(config_file=".conf"):
@@ -27,22 +26,19 @@ async def handle_error(error: Exception, response_text: str, context: str):
     """Handles errors during requests."""
     logger.error(f"Unknown error while {context}: <lr>{error}</lr> | Response text: {response_text}...")
     await asyncio.sleep(3)
-def is_json(myjson):
-    """Verify if a String is JSON."""
-    try:
-        json.loads(myjson)
-    except ValueError as e:
-        return False
-    return True
-async def make_request(http_client: aiohttp.ClientSession, method: str, url: str, json_data: dict, error_context: str, headers: dict = None):
-    """Makes an HTTP request and handles errors."""
-    response_text = ""
+async def make_request(http_client: aiohttp.ClientSession, method: str, url: str, json_data: dict, error_context: str, headers: dict = None, account=None):
+    """Makes an HTTP request within the shared rate limits, retry policy and circuit breaker. Falls back to the shared pool when no session is given.
+
+    Returns None when the request failed; CircuitOpenError is raised to the caller.
+    """
+    from bot.retry import CircuitOpenError, send_request
+    if http_client is None:
+        from bot.http_client import get_http_pool
+        http_client = get_http_pool().session()
     try:
-        response = await http_client.request(
-            method=method, url=url, json=json_data, ssl=False, headers=headers
-        )
-        return response
+        return await send_request(http_client, method, url, account, json=json_data, ssl=False, headers=headers)
+    except CircuitOpenError:
+        raise
     except Exception as error:
-        await handle_error(error, response_text, error_context)
-        return {}
-
+        await handle_error(error, "", error_context)
+        return None
@@ -0,0 +1,179 @@
+import asyncio
+import multiprocessing
+import os
+import queue
+import time
+import zlib
+from typing import Dict, List
+
+from loguru import logger
+from bot.utils import load_config
+
+# Load configurations from the .conf file
+config = load_config()
+
+# Extract worker process settings from the configuration
+WORKER_PROCESSES = config.getint("workers", "processes", fallback=1)
+USE_UVLOOP = config.getboolean("workers", "uvloop", fallback=True)
+WORKER_STATS_INTERVAL = config.getint("workers", "stats_interval", fallback=60)
+# Longest pause before restarting a worker that keeps crashing
+MAX_RESTART_DELAY = 60
+
+
+def shard_for(session_name: str, workers: int) -> int:
+    """Worker index of a session; stable across runs and processes, unlike hash()."""
+    return zlib.crc32(session_name.encode("utf-8")) % workers
+
+
+def shard_sessions(session_names: List[str], index: int, workers: int) -> List[str]:
+    """Sessions handled by worker `index` of `workers`."""
+    return [name for name in session_names if shard_for(name, workers) == index]
+
+
+def install_event_loop():
+    """Switches asyncio to uvloop when it is enabled and installed."""
+    if not USE_UVLOOP:
+        return False
+    try:
+        import uvloop
+    except ImportError:
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
+
+
+def worker_main(index: int, workers: int, stats_queue):
+    """Entry point of one worker process: farms its shard of the sessions in its own event loop."""
+    from bot.launcher import get_session_names, run_sessions
+    from bot.log import LOG_FILE, setup_logging, worker_log_file
+    from bot.metrics import METRICS_PORT
+    from bot.rate_limit import get_rate_limiter
+    from bot.telegram_coordinator import get_telegram_coordinator
+
+    # Rotation renames the file, so processes must not share one; each worker writes its own
+    setup_logging(log_file=worker_log_file(LOG_FILE, index))
+    uvloop_used = install_event_loop()
+    session_names = shard_sessions(get_session_names(), index, workers)
+    logger.info(f"Worker {index} | pid {os.getpid()} | {len(session_names)} sessions | uvloop={uvloop_used}")
+    # Rate limits are configured for the whole farm; each worker gets its share
+    get_rate_limiter().scale(1 / workers)
+    get_telegram_coordinator().scale(1 / workers)
+
+    def report_stats(stats: Dict):
+        try:
+            stats_queue.put_nowait(dict(stats, worker=index, pid=os.getpid()))
+        except queue.Full:
+            pass
+
+    async def run_until_orphaned():
+        # Each worker serves its own metrics on the ports after the configured one
+        # Sessions added to the directory later go to the worker their name is sharded to
+        farm = asyncio.create_task(run_sessions(lambda name: shard_for(name, workers) == index, report_stats,
+                                                METRICS_PORT + 1 + index))
+        parent = multiprocessing.parent_process()
+        # A parent killed without cleanup cannot terminate its workers, so they stop on their own
+        while not farm.done():
+            await asyncio.wait([farm], timeout=5)
+            if parent is not None and not parent.is_alive():
+                logger.warning(f"Worker {index} | parent process exited, stopping")
+                farm.cancel()
+        await asyncio.gather(farm, return_exceptions=True)
+
+    try:
+        asyncio.run(run_until_orphaned())
+    except KeyboardInterrupt:
+        pass
+
+
+class WorkerSupervisor:
+    """Starts the worker processes, collects their stats and restarts the ones that crash."""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.context = multiprocessing.get_context("spawn")
+        self.stats_queue = self.context.Queue(maxsize=workers * 100)
+        self.processes: Dict[int, multiprocessing.Process] = {}
+        self.restarts = {index: 0 for index in range(workers)}
+        # Crashes in a row per worker; a worker that ran long enough starts over at a short delay
+        self.crash_streak = {index: 0 for index in range(workers)}
+        self.started_at: Dict[int, float] = {}
+        self.restart_at: Dict[int, float] = {}
+        self.stats: Dict[int, Dict] = {}
+
+    def start_worker(self, index: int):
+        process = self.context.Process(target=worker_main, args=(index, self.workers, self.stats_queue),
+                                       name=f"qlyuker-worker-{index}", daemon=True)
+        process.start()
+        self.processes[index] = process
+        self.started_at[index] = time.monotonic()
+        logger.success("Worker {} started (pid {})", index, process.pid)
+
+    def check_workers(self):
+        """Schedules restarts of exited workers, with a growing delay for repeated crashes."""
+        now = time.monotonic()
+        for index, process in list(self.processes.items()):
+            if process.is_alive() or index in self.restart_at:
+                continue
+            self.restarts[index] += 1
+            if now - self.started_at[index] >= 10 * MAX_RESTART_DELAY:
+                self.crash_streak[index] = 0
+            self.crash_streak[index] += 1
+            delay = min(MAX_RESTART_DELAY, 2 ** (self.crash_streak[index] - 1))
+            self.restart_at[index] = now + delay
+            logger.error("Worker {} exited with code {}, restarting in {}s", index, process.exitcode, delay)
+
+        for index, restart_at in list(self.restart_at.items()):
+            if now >= restart_at:
+                del self.restart_at[index]
+                self.start_worker(index)
+
+    def collect_stats(self):
+        while True:
+            try:
+                stats = self.stats_queue.get_nowait()
+            except queue.Empty:
+                return
+            self.stats[stats["worker"]] = stats
+
+    def summary(self) -> Dict:
+        """Totals over the latest stats of every worker."""
+        totals = {"workers": self.workers, "alive": sum(p.is_alive() for p in self.processes.values()),
+                  "restarts": sum(self.restarts.values()), "sessions": 0, "running": 0, "cycles": 0,
+                  "failures": 0, "requests": 0}
+        for stats in self.stats.values():
+            totals["sessions"] += stats["sessions"]
+            totals["running"] += stats["scheduler"]["running"]
+            totals["cycles"] += stats["scheduler"]["cycles"]
+            totals["failures"] += stats["scheduler"]["failures"]
+            totals["requests"] += stats["http"]["requests"]
+        return totals
+
+    async def run(self):
+        for index in range(self.workers):
+            self.start_worker(index)
+        last_report = time.monotonic()
+        try:
+            while True:
+                await asyncio.sleep(1)
+                self.collect_stats()
+                self.check_workers()
+                if time.monotonic() - last_report >= WORKER_STATS_INTERVAL:
+                    last_report = time.monotonic()
+                    summary = self.summary()
+                    logger.info("Workers {alive}/{workers} | Sessions: {sessions} | Running: {running} | "
+                                "Cycles: {cycles} | Requests: {requests} | Restarts: {restarts}", **summary)
+                    logger.debug("Workers | per worker: {}", self.stats)
+        finally:
+            self.stop()
+
+    def stop(self):
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes.values():
+            process.join(timeout=10)
+
+
+async def supervise_workers(workers: int = WORKER_PROCESSES):
+    """Runs the sessions sharded across `workers` processes until cancelled."""
+    await WorkerSupervisor(workers).run()
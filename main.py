@@ -1,6 +1,15 @@
+import argparse
 import asyncio
-from bot.launcher import launch_process
+from bot.launcher import HEADLESS, launch_process
+from bot.workers import WORKER_PROCESSES
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="qlyuker_bot")
+    parser.add_argument("--workers", type=int, default=WORKER_PROCESSES,
+                        help="number of worker processes the sessions are split across")
+    parser.add_argument("--headless", action="store_true", default=HEADLESS,
+                        help="skip the banner and console title and start scheduling sessions right away")
+    args = parser.parse_args()
+
     # Run the main launch process asynchronously
-    asyncio.run(launch_process())
\ No newline at end of file
+    asyncio.run(launch_process(args.workers, args.headless))